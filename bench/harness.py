@@ -0,0 +1,161 @@
+import json
+import os
+import resource
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# Bare-mode AppTest logs a ScriptRunContext warning per thread; keep the report readable
+os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+for path in (ROOT, BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from mock_upstream import MockUpstreams, Profile  # noqa: E402
+
+# BENCH HARNESS
+# Shared setup for run_bench.py and load_test.py: mock upstreams on a local
+# port, a scratch directory for every file the app writes, and
+# the secrets that point main.py at all of it. Everything runs in-process, so
+# the app's metrics registry and the mock's request counters can be read
+# directly. No network access needed.
+
+MAIN = os.path.join(ROOT, "main.py")
+REPO = "bench/swiss-gold-live"
+
+
+def add_profile_args(parser):
+    parser.add_argument("--backend", choices=("sqlite", "github"), default="sqlite",
+                        help="storage backend; github runs against the mock contents API")
+    parser.add_argument("--latency-ms", type=float, default=80, help="mean HTTP upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--yahoo-latency-ms", type=float, default=300)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 5xx answers")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of 429 / quota refusals")
+    parser.add_argument("--history-rows", type=int, default=2000, help="history records seeded into storage")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--shops", type=int, default=1, help="shops served by the process (multi-shop mode)")
+
+
+def seed_history(rows, now=None):
+    now = now or datetime.now()
+    records = []
+    for i in range(rows):
+        ts = now - timedelta(minutes=15 * (rows - i))
+        gold = 2400 + (i % 97) - 48
+        records.append({"date": ts.strftime("%Y-%m-%d %H:%M:%S"), "gold_pk": round(gold / 31.1035 * 11.66 * 280),
+                        "silver_pk": 3150, "gold_ounce": gold, "silver_ounce": 30.0, "usd": 280.0})
+    return records
+
+
+class Environment:
+    def __init__(self, args):
+        self.args = args
+        self.tmp = tempfile.mkdtemp(prefix="swissgold-bench-")
+        jitter = args.jitter_ms / 1000
+        http = Profile(args.latency_ms / 1000, jitter, args.error_rate, args.throttle_rate)
+        history = seed_history(args.history_rows)
+        files = {"manual.json": json.dumps({"gold_premium": 0, "silver_premium": 0, "last_update": 0}),
+                 "history.json": "[]"}
+        for record in history:
+            path = f"history/{record['date'][:7]}.jsonl"
+            files[path] = files.get(path, "") + json.dumps(record) + "\n"
+        yahoo = Profile(args.yahoo_latency_ms / 1000, args.yahoo_latency_ms / 4000, args.error_rate, args.throttle_rate)
+        self.mock = MockUpstreams({"twelvedata": http, "exchangerate": http, "yahoo": yahoo, "github": http},
+                                  github_files=files, seed=args.seed).start()
+        os.environ["UPSTREAM_MOCK_URL"] = self.mock.url
+        self.secrets = {
+            "TWELVE_DATA_KEY": "bench", "CURR_KEY": "bench", "ADMIN_PASSWORD": "bench",
+            "API_PORT": 0, "STORAGE_BACKEND": args.backend,
+            "SQLITE_PATH": os.path.join(self.tmp, "swiss_gold.db"),
+            "TICKS_DIR": os.path.join(self.tmp, "ticks"),
+            "LAST_GOOD_PATH": os.path.join(self.tmp, "last_good.json"),
+            "SNAPSHOT_DIR": os.path.join(self.tmp, "public"),
+        }
+        self.shops = ["main"] + [f"shop{i}" for i in range(1, args.shops)]
+        if args.shops > 1:
+            self.secrets["shops"] = {slug: {"name": f"Bench {slug}", "phone": "0300", "admin_password": "bench"} for slug in self.shops[1:]}
+        if args.backend == "github":
+            self.secrets["GIT_TOKEN"] = "bench"
+        else:
+            self._seed_sqlite(history)
+
+    def _seed_sqlite(self, history):
+        from storage import SQLiteStorage
+        store = SQLiteStorage(self.secrets["SQLITE_PATH"])
+        for record in history:
+            store.append_history(record)
+
+    def app(self, admin=False, timeout=60, shop=None):
+        from streamlit.testing.v1 import AppTest
+        at = AppTest.from_file(MAIN, default_timeout=timeout)
+        for key, value in self.secrets.items():
+            at.secrets[key] = value
+        if shop and shop != "main":
+            at.query_params["shop"] = shop
+        if admin:
+            at.session_state.admin_auth = True
+        return at
+
+    def upstream_calls(self):
+        """Requests per provider so far."""
+        return self.mock.totals()
+
+
+def allow_concurrent_runs(secrets):
+    """AppTest installs a mock Runtime for each run and clears it when the run ends,
+    so overlapping runs from several threads find no Runtime half way through.
+    Keep the most recent one reachable instead. It also swaps st.secrets in and
+    out around each run; make the process-wide value the same secrets so a
+    restore in one thread does not blank them for another. And AppTest recompiles
+    main.py on every run, where concurrent ast.parse calls trip a CPython 3.11
+    bug; share one ScriptCache the way a real server does (bench processes only)."""
+    import streamlit as st
+    from streamlit.runtime.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.runtime.secrets import Secrets
+
+    st.secrets = Secrets()
+    st.secrets._secrets = dict(secrets)
+
+    shared = ScriptCache()
+    ScriptCache.__init__ = lambda self: self.__dict__.update(_cache=shared._cache, _lock=shared._lock)
+    original = Runtime.instance.__func__
+    last = []
+
+    def instance(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+            return cls._instance
+        return last[0] if last else original(cls)
+
+    def exists(cls):
+        return cls._instance is not None or bool(last)
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+
+
+def click(at, label_prefix=None, key=None):
+    """Click a button by key or label prefix; returns the AppTest, ready for run()."""
+    for button in at.button:
+        if (key and button.key == key) or (label_prefix and button.label.startswith(label_prefix)):
+            return button.click()
+    raise LookupError(f"button {key or label_prefix!r} not found")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
@@ -0,0 +1,237 @@
+"""Concurrent-session load generator: N browser sessions against one app process.
+
+    python bench/load_test.py --sessions 100 --duration 120
+    python bench/load_test.py --sessions 500 --mix viewer=0.9,refresher=0.09,admin=0.01 --workers 16
+    python bench/load_test.py --sessions 200 --max-p95-ms 1500 --max-github-per-min 60   # capacity gate
+    python bench/load_test.py --sessions 100 --shops 5      # sessions spread over five shops
+
+Every session is its own AppTest (own session_state) sharing one process, so
+the quote poller, st.cache_data, the storage client and the metrics registry
+are shared exactly as they are between real visitors. With --shops N the
+sessions are spread round-robin over N shops (?shop=...); quotes are still
+fetched once per process. Roles:
+
+  viewer     reruns every LIVE_REFRESH seconds (the price-card autorefresh)
+  refresher  does the same, and clicks "Refresh Rates" every --refresh-every s
+  admin      logged in; bumps the gold premium and publishes every --publish-every s
+
+Sessions start staggered over one refresh period and are served by a pool of
+--workers threads, like Streamlit's script threads. A viewer rerun is a full
+script run here (AppTest cannot run a fragment on its own), so page latency is
+an upper bound on what a fragment refresh costs.
+
+Reported: reruns/s, upstream fetches per minute per provider, GitHub API calls
+per minute, p50/p95 page latency per role and schedule lag (how late actions
+started: the sign that the workers are saturated). With any --max-* limit set,
+the exit status is 1 when a limit is exceeded.
+"""
+import argparse
+import heapq
+import json
+import random
+import sys
+import threading
+import time
+
+from harness import Environment, add_profile_args, allow_concurrent_runs, click, peak_rss_mb, percentile
+
+ROLES = ("viewer", "refresher", "admin")
+LIVE_REFRESH = 20         # matches main.py
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        role, _, share = part.partition("=")
+        if role.strip() not in ROLES:
+            raise argparse.ArgumentTypeError(f"unknown role {role!r}; expected one of {', '.join(ROLES)}")
+        mix[role.strip()] = float(share)
+    total = sum(mix.values())
+    return {role: share / total for role, share in mix.items()}
+
+
+def assign_roles(sessions, mix):
+    """Deterministic role split; every role with a share gets at least one session when possible."""
+    largest = max(mix, key=mix.get)
+    counts = {role: max(1, round(sessions * share)) for role, share in mix.items() if share and role != largest}
+    counts[largest] = max(0, sessions - sum(counts.values()))
+    roles = [role for role, n in counts.items() for _ in range(n)]
+    return roles[:sessions]
+
+
+class Session:
+    def __init__(self, env, sid, role, args):
+        self.sid = sid
+        self.role = role
+        self.shop = env.shops[sid % len(env.shops)]
+        self.at = env.app(admin=role == "admin", timeout=args.timeout, shop=self.shop)
+        self.refresh_every = args.refresh_every
+        self.publish_every = args.publish_every
+        self.next_action = 0.0
+        self.started = False
+
+    def step(self, now):
+        """One scheduled action; returns (kind, seconds, error message or None)."""
+        kind = "rerun"
+        start = time.perf_counter()
+        try:
+            if not self.started:
+                self.started = True   # first visit: there are no buttons to click yet
+            elif self.role == "refresher" and now >= self.next_action:
+                kind = "refresh"
+                click(self.at, label_prefix="🔄 Refresh")
+                self.next_action = now + self.refresh_every
+            elif self.role == "admin" and now >= self.next_action:
+                kind = "publish"
+                click(self.at, key="g_plus").run()
+                click(self.at, label_prefix="🚀 PUBLISH")
+                self.next_action = now + self.publish_every
+            self.at.run()
+            error = self.at.exception[0].message if self.at.exception else None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        return kind, time.perf_counter() - start, error
+
+
+class LoadTest:
+    def __init__(self, env, args):
+        self.env = env
+        self.args = args
+        roles = assign_roles(args.sessions, args.mix)
+        self.sessions = [Session(env, i, role, args) for i, role in enumerate(roles)]
+        rng = random.Random(args.seed)
+        for s in self.sessions:
+            # first refresh / publish lands somewhere inside its period, not all at once
+            s.next_action = rng.uniform(0, s.refresh_every if s.role == "refresher" else s.publish_every)
+        self.queue = [(rng.uniform(0, LIVE_REFRESH), s.sid) for s in self.sessions]
+        heapq.heapify(self.queue)
+        self.cond = threading.Condition()
+        self.samples = []         # (role, kind, seconds, error, lag)
+        self.t0 = None
+
+    def _worker(self, deadline):
+        while True:
+            with self.cond:
+                while True:
+                    now = time.monotonic() - self.t0
+                    if now >= deadline:
+                        return
+                    if self.queue and self.queue[0][0] <= now:
+                        due, sid = heapq.heappop(self.queue)
+                        break
+                    wait = (self.queue[0][0] - now) if self.queue else deadline - now
+                    self.cond.wait(min(wait, deadline - now))
+            session = self.sessions[sid]
+            kind, seconds, error = session.step(due)
+            with self.cond:
+                self.samples.append((session.role, kind, seconds, error, max(0.0, now - due)))
+                heapq.heappush(self.queue, (due + LIVE_REFRESH, sid))
+                self.cond.notify()
+
+    def run(self):
+        # The first session pays the cold start; keep it out of the measured window
+        self.sessions[0].step(0.0)
+        self.env.mock.reset_counts()
+        base = self.env.upstream_calls()
+        self.t0 = time.monotonic()
+        workers = [threading.Thread(target=self._worker, args=(self.args.duration,), daemon=True)
+                   for _ in range(self.args.workers)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.monotonic() - self.t0
+        calls = self.env.upstream_calls()
+        calls = {k: v - base.get(k, 0) for k, v in calls.items()}
+        return self.report(elapsed, calls)
+
+    def report(self, elapsed, calls):
+        minutes = elapsed / 60
+        by_role = {}
+        for role, kind, seconds, error, lag in self.samples:
+            by_role.setdefault(role, []).append(seconds)
+        seconds = [s[2] for s in self.samples]
+        lags = [s[4] for s in self.samples]
+        providers = {k: round(v / minutes, 1) for k, v in sorted(calls.items()) if k != "github"}
+        return {
+            "sessions": {role: sum(1 for s in self.sessions if s.role == role) for role in ROLES},
+            "shops": len(self.env.shops),
+            "duration_s": round(elapsed, 1),
+            "workers": self.args.workers,
+            "reruns": len(self.samples),
+            "reruns_per_s": round(len(self.samples) / elapsed, 2),
+            "errors": sum(1 for s in self.samples if s[3]),
+            "error_messages": sorted({s[3] for s in self.samples if s[3]})[:5],
+            "actions": {kind: sum(1 for s in self.samples if s[1] == kind) for kind in ("rerun", "refresh", "publish")},
+            "upstream_per_min": providers,
+            "github_per_min": round(calls.get("github", 0) / minutes, 1),
+            "p50_ms": round(1000 * percentile(seconds, 0.5), 1),
+            "p95_ms": round(1000 * percentile(seconds, 0.95), 1),
+            "p95_ms_by_role": {role: round(1000 * percentile(v, 0.95), 1) for role, v in sorted(by_role.items())},
+            "lag_p95_ms": round(1000 * percentile(lags, 0.95), 1),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+
+
+def check_limits(report, args):
+    breaches = []
+    if args.max_p95_ms is not None and report["p95_ms"] > args.max_p95_ms:
+        breaches.append(f"p95 {report['p95_ms']} ms > {args.max_p95_ms} ms")
+    if args.max_github_per_min is not None and report["github_per_min"] > args.max_github_per_min:
+        breaches.append(f"GitHub {report['github_per_min']}/min > {args.max_github_per_min}/min")
+    if args.max_upstream_per_min is not None:
+        for provider, rate in report["upstream_per_min"].items():
+            if rate > args.max_upstream_per_min:
+                breaches.append(f"{provider} {rate}/min > {args.max_upstream_per_min}/min")
+    if args.max_lag_ms is not None and report["lag_p95_ms"] > args.max_lag_ms:
+        breaches.append(f"schedule lag p95 {report['lag_p95_ms']} ms > {args.max_lag_ms} ms")
+    return breaches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_profile_args(parser)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("viewer=0.85,refresher=0.13,admin=0.02"),
+                        help="role shares, e.g. viewer=0.85,refresher=0.13,admin=0.02")
+    parser.add_argument("--duration", type=float, default=120, help="measured seconds")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent script runs")
+    parser.add_argument("--refresh-every", type=float, default=30, help="seconds between a refresher's clicks")
+    parser.add_argument("--publish-every", type=float, default=60, help="seconds between an admin's publishes")
+    parser.add_argument("--timeout", type=float, default=60, help="per-run AppTest timeout")
+    parser.add_argument("--max-p95-ms", type=float)
+    parser.add_argument("--max-github-per-min", type=float)
+    parser.add_argument("--max-upstream-per-min", type=float, help="limit for each quote provider")
+    parser.add_argument("--max-lag-ms", type=float)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    env = Environment(args)
+    allow_concurrent_runs(env.secrets)
+    import metrics
+    metrics.reset()
+
+    report = LoadTest(env, args).run()
+    sessions = ", ".join(f"{n} {role}" for role, n in report["sessions"].items() if n)
+    print(f"{sessions} in {report['shops']} shop(s) over {report['duration_s']} s on {report['workers']} workers")
+    print(f"reruns {report['reruns']} ({report['reruns_per_s']}/s)  actions {report['actions']}  "
+          f"errors {report['errors']}")
+    for message in report["error_messages"]:
+        print(f"  error: {message[:200]}")
+    print(f"page latency p50 {report['p50_ms']} ms  p95 {report['p95_ms']} ms  by role {report['p95_ms_by_role']}  "
+          f"schedule lag p95 {report['lag_p95_ms']} ms")
+    print(f"upstream/min {report['upstream_per_min']}  GitHub API/min {report['github_per_min']}  "
+          f"peak rss {report['peak_rss_mb']:.0f} MB")
+
+    breaches = check_limits(report, args)
+    report["breaches"] = breaches
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    for breach in breaches:
+        print(f"LIMIT EXCEEDED: {breach}")
+    sys.exit(1 if breaches else 0)
+
+
+if __name__ == "__main__":
+    main()
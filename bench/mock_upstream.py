@@ -0,0 +1,379 @@
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# MOCK UPSTREAMS
+# One local HTTP server that stands in for every upstream the app talks to, in
+# the layout http_client expects from UPSTREAM_MOCK_URL:
+#   /twelvedata/price?symbol=XAU/USD,XAG/USD      TwelveData price endpoint
+#   /exchangerate/v6/<key>/latest/USD             ExchangeRate-API
+#   /yahoo/v8/finance/spark?symbols=XAUUSD=X,...   Yahoo spark (every symbol in one request)
+#   /github/repos/<owner>/<repo>/...              GitHub contents + Git Data API (in memory)
+# Each service has a Profile: latency (mean + jitter), a share of 5xx errors and
+# a share of 429 / quota refusals. Prices follow a seeded random walk so runs are
+# repeatable. Every request is counted per service and route.
+
+BASE_PRICES = {"XAU/USD": 2400.0, "XAG/USD": 30.0, "USD/PKR": 280.0, "USD/AED": 3.6725}
+YAHOO_SYMBOLS = {"XAUUSD=X": "XAU/USD", "XAGUSD=X": "XAG/USD", "PKR=X": "USD/PKR"}
+
+
+class Profile:
+    def __init__(self, latency=0.05, jitter=0.02, error_rate=0.0, throttle_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+
+    def __repr__(self):
+        return (f"Profile(latency={self.latency}, jitter={self.jitter}, "
+                f"error_rate={self.error_rate}, throttle_rate={self.throttle_rate})")
+
+
+def blob_sha(data):
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class Market:
+    """Seeded random walk; each read moves the price a little."""
+
+    def __init__(self, seed=7, volatility=0.0005):
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.volatility = volatility
+        self.prices = dict(BASE_PRICES)
+
+    def quote(self, symbol):
+        with self._lock:
+            price = self.prices[symbol] * (1 + self._rng.gauss(0, self.volatility))
+            self.prices[symbol] = price
+            return price
+
+
+class GitHubRepo:
+    """Just enough of a repository for the contents, blob and Git Data endpoints.
+
+    Trees are flat {path: bytes} snapshots; every contents write or ref update
+    moves the single branch head, so concurrent writers see real conflicts."""
+
+    def __init__(self, files=None, branch="main"):
+        self.branch = branch
+        self.lock = threading.Lock()
+        self.trees = {}
+        self.commits = {}
+        self._serial = 0
+        tree = self.put_tree({path: data.encode() if isinstance(data, str) else data
+                              for path, data in (files or {}).items()})
+        self.head = self.put_commit("Initial", tree, [])
+
+    # --- object store ---------------------------------------------------------
+    def put_tree(self, files):
+        listing = "".join(f"{path}\0{blob_sha(data)}\n" for path, data in sorted(files.items()))
+        sha = hashlib.sha1(b"tree " + listing.encode()).hexdigest()
+        self.trees[sha] = dict(files)
+        return sha
+
+    def put_commit(self, message, tree, parents):
+        self._serial += 1
+        sha = hashlib.sha1(f"commit {tree} {parents} {message} {self._serial}".encode()).hexdigest()
+        self.commits[sha] = {"tree": tree, "parents": list(parents), "message": message}
+        return sha
+
+    def ancestors(self, sha):
+        seen, stack = set(), [sha]
+        while stack:
+            sha = stack.pop()
+            if sha in self.commits and sha not in seen:
+                seen.add(sha)
+                stack.extend(self.commits[sha]["parents"])
+        return seen
+
+    @property
+    def files(self):
+        return self.trees[self.commits[self.head]["tree"]]
+
+    def files_at(self, ref=None):
+        commit = self.commits.get(ref or self.head)
+        return self.trees[commit["tree"]] if commit else None
+
+    def commit_files(self, message, files):
+        """Contents API write: new tree + commit straight on the branch head."""
+        self.head = self.put_commit(message, self.put_tree(files), [self.head])
+        return self.head
+
+    # --- JSON views -------------------------------------------------------------
+    def entry(self, base, path, files=None):
+        data = (files or self.files)[path]
+        sha = blob_sha(data)
+        return {"type": "file", "name": path.rsplit("/", 1)[-1], "path": path, "sha": sha, "size": len(data),
+                "url": f"{base}/contents/{path}", "git_url": f"{base}/git/blobs/{sha}",
+                "encoding": "base64", "content": base64.b64encode(data).decode()}
+
+    def listing(self, base, directory, files=None):
+        files = files or self.files
+        prefix = directory.rstrip("/") + "/"
+        items = []
+        for path in sorted(files):
+            if path.startswith(prefix) and "/" not in path[len(prefix):]:
+                item = self.entry(base, path, files)
+                del item["content"], item["encoding"]
+                items.append(item)
+        return items
+
+    def tree_json(self, base, sha):
+        return {"sha": sha, "url": f"{base}/git/trees/{sha}", "truncated": False,
+                "tree": [{"path": path, "mode": "100644", "type": "blob", "sha": blob_sha(data), "size": len(data),
+                          "url": f"{base}/git/blobs/{blob_sha(data)}"} for path, data in sorted(self.trees[sha].items())]}
+
+    def commit_json(self, base, sha):
+        commit = self.commits[sha]
+        return {"sha": sha, "url": f"{base}/git/commits/{sha}", "message": commit["message"],
+                "tree": {"sha": commit["tree"], "url": f"{base}/git/trees/{commit['tree']}"},
+                "parents": [{"sha": p, "url": f"{base}/git/commits/{p}"} for p in commit["parents"]]}
+
+    def ref_json(self, base):
+        return {"ref": f"refs/heads/{self.branch}", "url": f"{base}/git/refs/heads/{self.branch}",
+                "object": {"type": "commit", "sha": self.head, "url": f"{base}/git/commits/{self.head}"}}
+
+    def blob(self, sha):
+        for files in [self.files] + list(self.trees.values()):
+            for data in files.values():
+                if blob_sha(data) == sha:
+                    return data
+        return None
+
+
+class MockUpstreams:
+    def __init__(self, profiles=None, github_files=None, seed=7, host="127.0.0.1", port=0,
+                 retry_after=1):
+        self.profiles = {"twelvedata": Profile(), "exchangerate": Profile(), "yahoo": Profile(latency=0.3, jitter=0.1),
+                         "github": Profile(latency=0.08)}
+        self.profiles.update(profiles or {})
+        self.market = Market(seed)
+        self.repo = GitHubRepo(github_files)
+        self.calls = {}
+        self.retry_after = retry_after   # GitHub's client sleeps this long before retrying a 429
+        self._rng = random.Random(seed + 1)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="mock-upstreams", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def count(self, service, route):
+        with self._lock:
+            key = (service, route)
+            self.calls[key] = self.calls.get(key, 0) + 1
+
+    def totals(self):
+        """Requests per service."""
+        with self._lock:
+            out = {}
+            for (service, _), n in self.calls.items():
+                out[service] = out.get(service, 0) + n
+            return out
+
+    def reset_counts(self):
+        with self._lock:
+            self.calls.clear()
+
+    def _roll(self):
+        with self._lock:
+            return self._rng.random(), self._rng.uniform(-1, 1)
+
+    # --- routes -------------------------------------------------------------
+    def _twelvedata(self, query):
+        symbols = [s for s in query.get("symbol", [""])[0].split(",") if s]
+        if len(symbols) == 1:
+            return 200, {"price": f"{self.market.quote(symbols[0]):.4f}"}
+        return 200, {s: {"price": f"{self.market.quote(s):.4f}"} for s in symbols}
+
+    def _exchangerate(self):
+        return 200, {"result": "success", "base_code": "USD",
+                     "conversion_rates": {"PKR": self.market.quote("USD/PKR"), "AED": BASE_PRICES["USD/AED"]}}
+
+    def _yahoo(self, rest, query):
+        if rest != ["v8", "finance", "spark"]:
+            return 404, {"finance": {"error": {"code": "Not Found"}}}
+        now = int(time.time())
+        symbols = [s for s in query.get("symbols", [""])[0].split(",") if s in YAHOO_SYMBOLS]
+        return 200, {s: {"symbol": s, "timestamp": [now], "close": [round(self.market.quote(YAHOO_SYMBOLS[s]), 4)]}
+                     for s in symbols}
+
+    def _github(self, method, parts, query, body, base):
+        # parts: ["repos", owner, repo, ...]
+        if len(parts) < 3 or parts[0] != "repos":
+            return 404, {"message": "Not Found"}
+        owner, name, rest = parts[1], parts[2], parts[3:]
+        repo_url = f"{base}/repos/{owner}/{name}"
+        repo = self.repo
+        with repo.lock:
+            if not rest:
+                return 200, {"name": name, "full_name": f"{owner}/{name}", "url": repo_url,
+                             "owner": {"login": owner}, "default_branch": repo.branch}
+            if rest[0] == "git":
+                return self._git_data(repo, method, rest[1:], json.loads(body or b"{}"), repo_url)
+            if rest[0] == "contents":
+                return self._contents(repo, method, "/".join(rest[1:]), query, body, repo_url)
+        return 404, {"message": "Not Found"}
+
+    def _git_data(self, repo, method, rest, payload, repo_url):
+        kind, sha = rest[0], "/".join(rest[1:])
+        if kind == "blobs" and method == "GET":
+            data = repo.blob(sha)
+            if data is None:
+                return 404, {"message": "Not Found"}
+            return 200, {"sha": sha, "size": len(data), "url": f"{repo_url}/git/blobs/{sha}",
+                         "encoding": "base64", "content": base64.b64encode(data).decode()}
+        if kind in ("ref", "refs") and sha == f"heads/{repo.branch}":
+            if method == "GET":
+                return 200, repo.ref_json(repo_url)
+            if method == "PATCH":
+                target = payload.get("sha")
+                if target not in repo.commits:
+                    return 422, {"message": "Object does not exist"}
+                if not payload.get("force") and repo.head not in repo.ancestors(target):
+                    return 422, {"message": "Update is not a fast forward"}
+                repo.head = target
+                return 200, repo.ref_json(repo_url)
+        if kind == "commits":
+            if method == "GET":
+                return (200, repo.commit_json(repo_url, sha)) if sha in repo.commits else (404, {"message": "Not Found"})
+            if method == "POST":
+                if payload.get("tree") not in repo.trees:
+                    return 422, {"message": "Tree SHA does not exist"}
+                new = repo.put_commit(payload.get("message", ""), payload["tree"], payload.get("parents", []))
+                return 201, repo.commit_json(repo_url, new)
+        if kind == "trees" and method == "POST":
+            base_tree = payload.get("base_tree")
+            files = dict(repo.trees.get(base_tree, {})) if base_tree else {}
+            for item in payload.get("tree", []):
+                if "content" in item:
+                    files[item["path"]] = item["content"].encode()
+                elif item.get("sha") is None:
+                    files.pop(item["path"], None)
+                else:
+                    files[item["path"]] = repo.blob(item["sha"])
+            return 201, repo.tree_json(repo_url, repo.put_tree(files))
+        return 404, {"message": "Not Found"}
+
+    def _contents(self, repo, method, path, query, body, repo_url):
+        if method == "GET":
+            files = repo.files_at(query.get("ref", [None])[0])
+            if files is None:
+                return 404, {"message": "No commit found for the ref"}
+            if path in files:
+                return 200, repo.entry(repo_url, path, files)
+            items = repo.listing(repo_url, path, files)
+            return (200, items) if items else (404, {"message": "Not Found"})
+        payload = json.loads(body or b"{}")
+        files = dict(repo.files)
+        current = blob_sha(files[path]) if path in files else None
+        if method == "PUT":
+            if current and payload.get("sha") != current:
+                return 409, {"message": f"{path} does not match {payload.get('sha')}"}
+            if not current and payload.get("sha"):
+                return 404, {"message": "Not Found"}
+            files[path] = base64.b64decode(payload["content"])
+            commit = repo.commit_files(payload.get("message", ""), files)
+            return (200 if current else 201), {"content": repo.entry(repo_url, path),
+                                               "commit": repo.commit_json(repo_url, commit)}
+        if method == "DELETE":
+            if not current:
+                return 404, {"message": "Not Found"}
+            if payload.get("sha") != current:
+                return 409, {"message": "sha mismatch"}
+            del files[path]
+            commit = repo.commit_files(payload.get("message", ""), files)
+            return 200, {"content": None, "commit": repo.commit_json(repo_url, commit)}
+        return 405, {"message": "Method Not Allowed"}
+
+    def handle(self, method, raw_path, headers, body):
+        url = urlparse(raw_path)
+        parts = [p for p in url.path.split("/") if p]
+        if not parts or parts[0] not in self.profiles:
+            return 404, {}, {"message": "unknown service"}
+        service, rest = parts[0], parts[1:]
+        self.count(service, f"{method} {'/'.join(rest[:4])}")
+        profile = self.profiles[service]
+        roll, jitter = self._roll()
+        time.sleep(max(0.0, profile.latency + jitter * profile.jitter))
+        if roll < profile.error_rate:
+            return 503, {}, {"message": "mock outage"}
+        if roll < profile.error_rate + profile.throttle_rate:
+            if service == "twelvedata":
+                # TwelveData reports quota exhaustion in a 200 body
+                return 200, {}, {"status": "error", "code": 429,
+                                 "message": "You have run out of API credits for the current minute."}
+            return 429, {"Retry-After": str(self.retry_after)}, {"message": "API rate limit exceeded"}
+        if service == "twelvedata":
+            status, data = self._twelvedata(parse_qs(url.query))
+        elif service == "exchangerate":
+            status, data = self._exchangerate()
+        elif service == "yahoo":
+            status, data = self._yahoo(rest, parse_qs(url.query))
+        else:
+            status, data = self._github(method, rest, parse_qs(url.query), body, f"{self.url}/github")
+        extra = {}
+        if service == "github" and method == "GET" and status == 200:
+            etag = '"' + hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest() + '"'
+            if headers.get("If-None-Match") == etag:
+                return 304, {"ETag": etag}, None
+            extra["ETag"] = etag
+        return status, extra, data
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _serve(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else None
+                status, headers, data = mock.handle(self.command, self.path, self.headers, body)
+                payload = b"" if data is None else json.dumps(data).encode()
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                if data is not None:
+                    self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_PUT = do_DELETE = do_POST = do_PATCH = _serve
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve mock upstreams until interrupted.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    profile = Profile(args.latency_ms / 1000, args.latency_ms / 4000, args.error_rate, args.throttle_rate)
+    mock = MockUpstreams({name: profile for name in ("twelvedata", "exchangerate", "yahoo", "github")},
+                         github_files={"manual.json": json.dumps({"gold_premium": 0, "silver_premium": 0,
+                                                                  "last_update": 0})},
+                         port=args.port)
+    print(f"UPSTREAM_MOCK_URL={mock.url}")
+    mock.server.serve_forever()
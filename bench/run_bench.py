@@ -0,0 +1,95 @@
+"""Offline benchmark: drive main.py headlessly against local mock upstreams.
+
+    python bench/run_bench.py                       # defaults: sqlite, 80 ms upstreams
+    python bench/run_bench.py --backend github --reruns 50 --error-rate 0.1
+    python bench/run_bench.py --json bench_output.json
+
+Scenarios run in order in one process (so the first is the true cold start):
+cold, public, refresh, admin, publish. For each: rerun latency percentiles,
+upstream requests per rerun by provider, and resident memory. Publishing is
+queued, so the publish scenario times the admin's click; the background write
+itself shows up as the publish_queue span.
+"""
+import argparse
+import json
+import time
+
+from harness import Environment, add_profile_args, click, peak_rss_mb, percentile, rss_mb
+
+SCENARIOS = ("cold", "public", "refresh", "admin", "publish")
+
+
+def run_scenario(env, name, reruns):
+    at = env.app(admin=name in ("admin", "publish"))
+    if name != "cold":
+        at.run()        # settle the session before measuring
+    steps = 1 if name == "cold" else reruns
+    before = env.upstream_calls()
+    timings = []
+    errors = 0
+    for _ in range(steps):
+        if name == "refresh":
+            click(at, label_prefix="🔄 Refresh")
+        elif name == "publish":
+            click(at, key="g_plus").run()
+            click(at, label_prefix="🚀 PUBLISH")
+        start = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - start)
+        errors += len(at.exception)
+    after = env.upstream_calls()
+    calls = {k: after.get(k, 0) - before.get(k, 0) for k in after}
+    return {
+        "scenario": name,
+        "reruns": steps,
+        "exceptions": errors,
+        "p50_ms": round(1000 * percentile(timings, 0.5), 1),
+        "p95_ms": round(1000 * percentile(timings, 0.95), 1),
+        "p99_ms": round(1000 * percentile(timings, 0.99), 1),
+        "max_ms": round(1000 * max(timings), 1),
+        "upstream_per_rerun": {k: round(v / steps, 2) for k, v in sorted(calls.items()) if v},
+        "rss_mb": round(rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_profile_args(parser)
+    parser.add_argument("--reruns", type=int, default=30)
+    parser.add_argument("--publishes", type=int, default=3)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    env = Environment(args)
+    import metrics
+    metrics.reset()
+
+    results = []
+    for name in args.scenarios.split(","):
+        result = run_scenario(env, name, args.publishes if name == "publish" else args.reruns)
+        results.append(result)
+        calls = " ".join(f"{k}={v}" for k, v in result["upstream_per_rerun"].items()) or "-"
+        print(f"{name:<8} n={result['reruns']:<4} p50={result['p50_ms']:>7.1f}ms p95={result['p95_ms']:>7.1f}ms "
+              f"p99={result['p99_ms']:>7.1f}ms max={result['max_ms']:>7.1f}ms exc={result['exceptions']} "
+              f"rss={result['rss_mb']:.0f}MB upstream/rerun: {calls}")
+
+    report = {
+        "profile": {k: v for k, v in vars(args).items() if k not in ("json", "scenarios")},
+        "scenarios": results,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "upstream_total": env.upstream_calls(),
+        "slowest_spans": metrics.summary()[:10],
+    }
+    print(f"peak rss {report['peak_rss_mb']:.0f} MB, upstream total {report['upstream_total']}")
+    print("slowest spans (p95):")
+    for row in report["slowest_spans"]:
+        print(f"  {row['operation']:<14} {row['labels']:<40} n={row['calls']:<5} "
+              f"p50={row['p50 ms']:>7.1f}ms p95={row['p95 ms']:>7.1f}ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+# CHART AGGREGATION
+# The Charts tab never ships raw history to the browser. Line/area charts get an
+# LTTB (largest-triangle-three-buckets) downsample capped at PIXEL_BUDGET points,
+# candles get one OHLC bar per interval. Both are plain NumPy/pandas, so the
+# payload stays the same size whether history has 60 rows or 60,000.
+
+PIXEL_BUDGET = 600
+INTERVALS = {"1m": "1min", "15m": "15min", "1h": "1h", "1d": "1D"}
+
+
+def history_frame(records):
+    """Typed frame from history records: date as datetime64, prices as float64."""
+    df = pd.DataFrame(records)
+    df['date'] = pd.to_datetime(df.get('date'), errors='coerce')
+    for col in ('gold_pk', 'silver_pk', 'gold_ounce', 'silver_ounce', 'usd'):
+        # to_numeric keeps int64 for whole-rupee values; LTTB and OHLC always get floats
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64') if col in df else np.nan
+    return df.dropna(subset=['date']).sort_values('date').reset_index(drop=True)
+
+
+def tick_frame(ticks):
+    """Frame from TickRecorder rows: Karachi wall-clock date, USD prices (NaN when offline)
+    and the source of each quote."""
+    from tick_recorder import SOURCE_NAMES
+    date = pd.to_datetime(ticks['ts'], unit='s', utc=True).tz_convert('Asia/Karachi').tz_localize(None)
+    df = pd.DataFrame({'date': date})
+    for col, field in (('gold_ounce', 'gold'), ('silver_ounce', 'silver'), ('usd', 'usd')):
+        df[col] = np.where(ticks[field] > 0, ticks[field], np.nan)
+        df[f'src_{field}'] = pd.Series(ticks[f'src_{field}']).map(SOURCE_NAMES).fillna("OFFLINE").to_numpy()
+    return df
+
+
+def lttb_indices(x, y, threshold):
+    """Row positions kept by LTTB. x, y are float arrays sorted by x."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    # threshold-2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:nxt_hi].mean()
+        avg_y = y[hi:nxt_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def downsample(df, y_col, budget=PIXEL_BUDGET):
+    df = df.dropna(subset=[y_col])
+    if len(df) <= budget:
+        return df
+    x = df['date'].to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(np.float64)
+    y = df[y_col].to_numpy(dtype=np.float64)
+    return df.iloc[lttb_indices(x, y, budget)]
+
+
+def ohlc(df, y_col, interval):
+    """One candle per interval bucket: date, open, high, low, close, count."""
+    series = df.dropna(subset=[y_col]).set_index('date')[y_col]
+    candles = series.resample(INTERVALS[interval]).agg(['first', 'max', 'min', 'last', 'count'])
+    candles = candles[candles['count'] > 0]
+    candles.columns = ['open', 'high', 'low', 'close', 'count']
+    # Keep the newest buckets if a tiny interval over a long range would overflow the budget
+    return candles.tail(PIXEL_BUDGET).reset_index()
@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import observe
+
+# SHARED HTTP CLIENT
+# One keep-alive session per upstream service for the whole process, so TLS
+# handshakes happen once instead of on every refresh. Retries are bounded with
+# jittered exponential backoff on 429/5xx (reads only; writes are never replayed),
+# and a semaphore caps how many calls can be in flight against each host at the
+# same time.
+#
+# Quote services are never retried here: the hedged race in quote_engine.py is
+# their retry (it fires the next source), a retried call could hold its per-host
+# slot well past CHAIN_DEADLINE, and on the metered APIs every retry would spend
+# a credit the quota scheduler never counted. One call is one attempt, bounded by
+# the caller's timeout.
+#
+# For tests/benchmarks set UPSTREAM_MOCK_URL=http://127.0.0.1:8765 and every
+# service is served from <mock>/<service>/... (e.g. /twelvedata/price).
+
+MOCK_ENV = "UPSTREAM_MOCK_URL"
+BASE_URLS = {
+    "twelvedata": "https://api.twelvedata.com",
+    "exchangerate": "https://v6.exchangerate-api.com",
+    "yahoo": "https://query1.finance.yahoo.com",
+    "github": "https://api.github.com",
+}
+MAX_PER_HOST = 4
+NO_RETRY = frozenset({"twelvedata", "exchangerate", "yahoo"})
+RETRY = Retry(
+    total=2,
+    backoff_factor=0.3,
+    backoff_jitter=0.2,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset({"GET", "HEAD"}),
+    # Upstreams send Retry-After values of a minute; the hedged race handles those
+    respect_retry_after_header=False,
+    raise_on_status=False,
+)
+
+# Fake Browser Header to prevent 429 Errors
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+}
+
+_overrides = {}
+_sessions = {}
+_limits = {}
+_lock = threading.Lock()
+
+
+def set_base_url(service, url=None):
+    """Point one service somewhere else (None restores the default)."""
+    if url:
+        _overrides[service] = url.rstrip("/")
+    else:
+        _overrides.pop(service, None)
+
+
+def base_url(service):
+    if service in _overrides:
+        return _overrides[service]
+    mock = os.environ.get(MOCK_ENV)
+    if mock:
+        return f"{mock.rstrip('/')}/{service}"
+    return BASE_URLS[service]
+
+
+def session(service):
+    with _lock:
+        if service not in _sessions:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_PER_HOST,
+                                  max_retries=0 if service in NO_RETRY else RETRY)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            s.headers.update(HEADERS)
+            _sessions[service] = s
+            _limits[service] = threading.BoundedSemaphore(MAX_PER_HOST)
+        return _sessions[service]
+
+
+def request(service, method, path, **kwargs):
+    s = session(service)
+    with _limits[service]:
+        start = time.perf_counter()
+        status = "error"
+        try:
+            res = s.request(method, base_url(service) + path, **kwargs)
+            status = str(res.status_code)
+            return res
+        finally:
+            # Timed from after the per-host slot is acquired, retries included
+            observe("http", time.perf_counter() - start, error=not status.isdigit() or int(status) >= 500,
+                    service=service, status=status)
+
+
+def get(service, path, **kwargs):
+    return request(service, "GET", path, **kwargs)
+
+
+def close_all():
+    with _lock:
+        for s in _sessions.values():
+            s.close()
+        _sessions.clear()
+        _limits.clear()
@@ -0,0 +1,125 @@
+import atexit
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from quote_poller import offline_snapshot
+
+# LAST KNOWN GOOD QUOTES (stale-while-revalidate)
+# The newest successful quote of each instrument is kept on local disk. A fresh
+# process serves it straight away (seeded from the Sync Data workflow's
+# prices.json when there is no local copy yet) while the poller revalidates in
+# the background, and a fetch where every source of an instrument failed falls
+# back to it instead of zeros. Cached values carry src "Cached" and their quote
+# time in snap["stale"], so the page can label them with their age.
+
+MAX_STALE = 3 * 24 * 3600     # older quotes are not served, the card goes offline instead
+SAVE_EVERY = 60               # seconds between disk writes while quotes keep changing
+INSTRUMENTS = {"gold": ("gold",), "silver": ("silver",), "usd": ("usd", "aed")}
+LABELS = {"gold": "Gold", "silver": "Silver", "usd": "USD"}
+
+
+def age_label(seconds):
+    seconds = max(0, int(seconds))
+    if seconds < 90:
+        return f"{seconds}s"
+    if seconds < 90 * 60:
+        return f"{seconds // 60}m"
+    if seconds < 48 * 3600:
+        return f"{seconds // 3600}h"
+    return f"{seconds // 86400}d"
+
+
+def seed_from_prices(path):
+    """Entries from prices.json ({"timestamp": "22 Aug | 16:18 UTC", price_ounce_usd, usd_to_pkr, usd_to_aed})."""
+    with open(path) as f:
+        data = json.load(f)
+    now = datetime.now(timezone.utc)
+    # The workflow writes no year: take the latest one that is not in the future
+    stamp = datetime.strptime(f"{now.year} {data['timestamp']}", "%Y %d %b | %H:%M UTC").replace(tzinfo=timezone.utc)
+    if stamp > now:
+        stamp = stamp.replace(year=now.year - 1)
+    ts = stamp.timestamp()
+    entries = {}
+    if float(data.get("price_ounce_usd", 0)) > 0:
+        entries["gold"] = {"values": {"gold": float(data["price_ounce_usd"])}, "src": "prices.json", "ts": ts}
+    if float(data.get("usd_to_pkr", 0)) > 0:
+        entries["usd"] = {"values": {"usd": float(data["usd_to_pkr"]), "aed": float(data.get("usd_to_aed", 0))},
+                          "src": "prices.json", "ts": ts}
+    return entries
+
+
+class LastGood:
+    def __init__(self, path="data/last_good.json", seed_path="prices.json", max_stale=MAX_STALE):
+        self.path = path
+        self.max_stale = max_stale
+        self._saved_at = 0
+        self._dirty = False
+        self.entries = {}
+        for loader in (self._load, lambda: seed_from_prices(seed_path)):
+            try:
+                self.entries = loader()
+                break
+            except (OSError, ValueError, KeyError):
+                continue
+        atexit.register(self.flush)
+
+    def _load(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+        self._saved_at, self._dirty = time.time(), False
+
+    def flush(self):
+        if self._dirty:
+            try:
+                self._save()
+            except OSError:
+                pass
+
+    def remember(self, snap):
+        """Poller listener: keep every instrument that came from a live source."""
+        for inst, fields in INSTRUMENTS.items():
+            src = snap.get(f"src_{inst}")
+            if float(snap.get(fields[0], 0) or 0) > 0 and src not in ("Cached", "OFFLINE", "ERR"):
+                self.entries[inst] = {"values": {f: float(snap.get(f, 0) or 0) for f in fields},
+                                      "src": src, "ts": snap.get("fetched_at", time.time())}
+                self._dirty = True
+        if time.time() - self._saved_at >= SAVE_EVERY:
+            self.flush()
+
+    def fill(self, data):
+        """Copy of a fetch result with failed instruments served from the last good quote."""
+        data = dict(data)
+        stale = {}
+        debug = list(data.get("debug", ()))
+        now = time.time()
+        for inst, fields in INSTRUMENTS.items():
+            entry = self.entries.get(inst)
+            if float(data.get(fields[0], 0) or 0) > 0 or not entry or now - entry["ts"] > self.max_stale:
+                continue
+            data.update(entry["values"])
+            data[f"src_{inst}"] = "Cached"
+            stale[inst] = entry["ts"]
+            debug.append(f"{LABELS[inst]} Cached: last good {entry['src']} quote, {age_label(now - entry['ts'])} old")
+        data["stale"] = stale
+        data["debug"] = debug
+        return data
+
+    def snapshot(self):
+        """Boot snapshot served before the first fetch, or None when nothing recent is cached.
+
+        fetched_at is the oldest cached quote, so it never counts as fresh for refresh_now().
+        """
+        data = self.fill(offline_snapshot("Serving last good quotes while the first fetch runs"))
+        if not data["stale"]:
+            return None
+        data["fetched_at"] = min(data["stale"].values())
+        return data
@@ -1,37 +1,151 @@
+import time
+_T0 = time.perf_counter()  # cold-start profile (imports, first paint), see STARTUP BUDGET in section 4
+import html
+import os
+import threading
 import streamlit as st
-import requests
-import json
-from datetime import datetime
+import streamlit.components.v1 as components
+from datetime import datetime, timedelta
 import pytz
-import pandas as pd
-import altair as alt
-from github import Github
-import time
-import yfinance as yf
-from streamlit_autorefresh import st_autorefresh
+from quote_engine import fetch_live_rates, HEALTH as SOURCE_HEALTH, QUOTA
+from quote_poller import QuotePoller
+from last_good import LastGood, age_label
+from settings_sync import DEFAULT_SETTINGS
+from storage import open_storage
+from tick_recorder import TickRecorder
+from pricing import tola_rate, rate_card
+from rate_api import RateFeed, make_api_app, metrics_app, serve_in_background
+from snapshot_publisher import SnapshotPublisher, render_html
+from shops import DEFAULT_SHOP, load_shops, resolve as resolve_shop
+from publish_queue import PublishQueue, DEBOUNCE as PUBLISH_DEBOUNCE
+from metrics import observe, span, timed, summary as latency_summary
+# pandas, altair, chart_data (admin tabs) and PyGithub (GitHub writes)
+# are imported where they are first needed, so anonymous visitors never pay for them
+_T_IMPORTS = time.perf_counter()
 
 # 1. PAGE CONFIG
-st.set_page_config(page_title="Islam Jewellery v51.0", page_icon="💎", layout="centered")
+def get_secret(name, default=None):
+    try:
+        return st.secrets[name] if name in st.secrets else default
+    except Exception:
+        return default
+
+# SHOP for this page (multi-shop mode, see shops.py): ?shop=<slug>, the default shop without it.
+# Resolved first so the one set_page_config call already carries the shop's name.
+SHOPS = load_shops(get_secret("shops"))
+shop = resolve_shop(SHOPS, st.query_params.get("shop"))
+st.set_page_config(page_title=f"{(shop or SHOPS[DEFAULT_SHOP]).name} v51.0", page_icon="💎", layout="centered")
+if shop is None:
+    st.error("Unknown shop.")
+    st.stop()
 
-# 2. AUTO-REFRESH LOGIC (20 SECONDS AS REQUESTED)
-st_autorefresh(interval=20000, limit=None, key="gold_sync")
+# 2. LIVE UPDATES: rates are pushed over SSE (/api/stream) into the price-card fragment,
+# which falls back to a 20 s fragment refresh until the session's stream is confirmed.
+rate_listener = components.declare_component(
+    "rate_listener", path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "rate_listener"))
 
 # 3. SESSION STATE
 if "admin_auth" not in st.session_state: st.session_state.admin_auth = False
 if "selected_metal" not in st.session_state: st.session_state.selected_metal = "Gold"
-if "publishing" not in st.session_state: st.session_state.publishing = False
+if "publish_ticket" not in st.session_state: st.session_state.publish_ticket = None
+if "shop" not in st.session_state: st.session_state.shop = None
 if "confirm_reset_history" not in st.session_state: st.session_state.confirm_reset_history = False
 if "confirm_reset_chart" not in st.session_state: st.session_state.confirm_reset_chart = False
 if "last_api_call" not in st.session_state: st.session_state.last_api_call = 0
 if "last_seen_update" not in st.session_state: st.session_state.last_seen_update = 0
 if "new_gold" not in st.session_state: st.session_state.new_gold = 0
 if "new_silver" not in st.session_state: st.session_state.new_silver = 0
+if "push_live" not in st.session_state: st.session_state.push_live = False
 
 # 4. HELPER FUNCTIONS
+if st.session_state.shop not in (None, shop.slug):
+    # An admin login belongs to one shop
+    st.session_state.admin_auth = False
+    st.session_state.publish_ticket = None
+st.session_state.shop = shop.slug
+
 def clear_all_caches():
+    # Quotes live in the shared poller and are deliberately not wiped here
     st.cache_data.clear()
-    get_live_rates.clear()
-    load_settings.clear()
+
+API_PORT = int(get_secret("API_PORT", 8502) or 0)
+# Where browsers reach the API for the SSE push, e.g. "https://rates.example.com" (the
+# /api/stream path is added when missing). Without it pages connect to plain http on
+# API_PORT of the page's host, which only works when the page itself is served over http:
+# an https page needs a TLS-terminating proxy in front of API_PORT and its URL here, or
+# every session stays on the 20 s poll.
+API_PUBLIC_URL = get_secret("API_PUBLIC_URL")
+# Prometheus /metrics, off by default and bound to localhost: scrape it from the same host
+# (or through an authenticated proxy), it is never served on the public API_PORT
+METRICS_PORT = int(get_secret("METRICS_PORT", 0) or 0)
+
+# STARTUP BUDGET (ms): module imports and script start -> price cards on screen.
+# The first run of a process is the cold start; later runs only show rerun cost.
+IMPORT_BUDGET_MS = 1200
+FIRST_PAINT_BUDGET_MS = 2500
+
+@st.cache_resource(show_spinner=False)
+def startup_profile():
+    return {}
+
+def record_paint():
+    profile = startup_profile()
+    paint_ms = (time.perf_counter() - _T0) * 1000
+    if "cold_paint_ms" not in profile:
+        profile["cold_imports_ms"] = (_T_IMPORTS - _T0) * 1000
+        profile["cold_paint_ms"] = paint_ms
+    profile["last_paint_ms"] = paint_ms
+
+# Render timing: each mark() files the time since the previous one as render{section},
+# so the phases of a rerun add up to the whole (see the admin Latency panel and /metrics)
+_MARK = [_T_IMPORTS]
+
+def mark(section):
+    now = time.perf_counter()
+    observe("render", now - _MARK[0], section=section)
+    _MARK[0] = now
+
+# History windows offered by the History and Charts tabs: (days back, newest N records)
+HISTORY_WINDOWS = {
+    "Last 60 records": (None, 60),
+    "Last 24 hours": (1, None),
+    "Last 7 days": (7, None),
+    "Last 30 days": (30, None),
+    "All": (None, None),
+}
+
+def history_cutoff(days):
+    return datetime.now(pytz.timezone("Asia/Karachi")).replace(tzinfo=None) - timedelta(days=days)
+
+# Parsed once per (history version, window, day) and shared by the History and Charts tabs.
+# cache_resource hands out the same object every time: treat the frame as read-only.
+@st.cache_resource(max_entries=8, show_spinner=False)
+def history_table(shop_slug, version, window, day):
+    days, limit = HISTORY_WINDOWS[window]
+    # Fetch from the start of the day so the key only changes daily; the exact cut is done in memory
+    start = history_cutoff(days).strftime("%Y-%m-%d 00:00:00") if days else None
+    from chart_data import history_frame
+    records = get_storage(shop_slug).load_history(start=start, limit=limit)
+    with span("render", section="history_frame"):
+        return history_frame(records)
+
+def load_history_view(window):
+    version = store.history_version()
+    df = history_table(shop.slug, version, window, datetime.now(pytz.timezone("Asia/Karachi")).date())
+    days = HISTORY_WINDOWS[window][0]
+    if days:
+        df = df[df['date'] >= history_cutoff(days)]
+    return df, (shop.slug, version, window, len(df))
+
+# Chart payload: LTTB line or OHLC candles, cached per (metal, type, interval, history version)
+@st.cache_data(max_entries=32, show_spinner=False)
+def chart_series(_df, version, y_col, chart_type, interval):
+    from chart_data import downsample, ohlc
+    values = _df[y_col].dropna()
+    stats = {"high": values.max(), "low": values.min(), "avg": values.mean(), "count": int(values.count())}
+    if chart_type == "Candles":
+        return ohlc(_df, y_col, interval), stats
+    return downsample(_df[['date', y_col]], y_col), stats
 
 # 5. CSS STYLES
 st.markdown("""
@@ -67,6 +181,7 @@ header[data-testid="stHeader"] {background-color: transparent;}
 .price-card {background:#ffffff; border-radius:16px; padding:15px; text-align:center; box-shadow:0 4px 6px rgba(0,0,0,0.04); border:1px solid #eef0f2; margin-bottom:8px;}
 .live-badge {background-color:#e6f4ea; color:#1e8e3e; padding:3px 10px; border-radius:30px; font-weight:700; font-size:0.6rem; letter-spacing:0.5px; display:inline-block; margin-bottom:4px;}
 .sleep-badge {background-color:#eef2f6; color:#555; padding:3px 10px; border-radius:30px; font-weight:700; font-size:0.6rem; letter-spacing:0.5px; display:inline-block; margin-bottom:4px;}
+.stale-badge {background-color:#fff3cd; color:#856404; padding:3px 10px; border-radius:30px; font-weight:700; font-size:0.6rem; letter-spacing:0.5px; display:inline-block; margin-bottom:4px;}
 .error-badge {background-color:#f8d7da; color:#721c24; padding:3px 10px; border-radius:30px; font-weight:700; font-size:0.6rem; letter-spacing:0.5px; display:inline-block; margin-bottom:4px;}
 .big-price {font-size:2.6rem; font-weight:800; color:#222; line-height:1; margin:4px 0; letter-spacing:-1px;}
 .price-label {font-size:0.85rem; color:#666; font-weight:500; margin-bottom: 10px;}
@@ -94,151 +209,148 @@ header[data-testid="stHeader"] {background-color: transparent;}
 </style>
 """, unsafe_allow_html=True)
 
-# 6. GITHUB CONNECTION
-repo = None 
+# 6. DATA ENGINE (one background poller per process, reruns only read its snapshot)
+@st.cache_resource(show_spinner=False)
+def get_tick_recorder():
+    return TickRecorder(get_secret("TICKS_DIR", "data/ticks"))
+
+@st.cache_resource(show_spinner=False)
+def get_quote_poller():
+    keys = {name: get_secret(name) for name in ("TWELVE_DATA_KEY", "CURR_KEY")}
+    # Daily credit budgets of the metered providers (see quota.py), overridable per plan
+    for provider, secret in (("TwelveData", "TD_DAILY_CREDITS"), ("ExchangeRate-API", "CURR_DAILY_CREDITS")):
+        credits = get_secret(secret)
+        if credits is not None:
+            QUOTA.set_budget(provider, int(credits))
+    # Last good quotes on disk (seeded from the workflow's prices.json): served at boot and
+    # whenever every source of an instrument fails, labelled with their age
+    last_good = LastGood(get_secret("LAST_GOOD_PATH", "data/last_good.json"),
+                         seed_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "prices.json"))
+    # Fast during Karachi market hours, slow at night
+    poller = QuotePoller(lambda: last_good.fill(fetch_live_rates(keys)), interval=QUOTA.poll_interval,
+                         initial=last_good.snapshot())
+    # Every fetched quote is kept for intraday charts and audit, not just admin publishes
+    poller.subscribe(get_tick_recorder().record)
+    poller.subscribe(last_good.remember)
+    return poller.start()
+
+def get_live_rates():
+    return get_quote_poller().snapshot()
+
+# Pre-warm: the first session of a fresh process starts the poller before storage connects,
+# so the cold-start upstream fetch overlaps the storage handshake instead of following it.
+try:
+    get_quote_poller()
+except Exception:
+    pass
+
+# 7. STORAGE CONNECTION (GitHub repo or local SQLite, see storage.py)
+REPO_NAME = "MohammadHasnainAI/swiss-gold-live"
+
+# One per shop, kept for the life of the process: settings live in memory (GitHub keeps them
+# fresh with conditional polls), so serving another shop costs no per-rerun reads
+@st.cache_resource(show_spinner=False)
+def get_storage(shop_slug):
+    profile = SHOPS[shop_slug]
+    return open_storage(get_secret("STORAGE_BACKEND"), token=get_secret("GIT_TOKEN"), repo_name=REPO_NAME,
+                        sqlite_path=profile.sqlite_path(get_secret("SQLITE_PATH", "data/swiss_gold.db")),
+                        prefix=profile.prefix)
+
+store = None
 try:
-    if "GIT_TOKEN" in st.secrets:
-        g = Github(st.secrets["GIT_TOKEN"])
-        repo = g.get_repo("MohammadHasnainAI/swiss-gold-live")
+    store = get_storage(shop.slug)
 except Exception as e:
-    st.error(f"GitHub Connection Failed: {e}")
+    st.error(f"Storage Connection Failed: {e}")
+
+mark("setup")
 
-# 7. SETTINGS ENGINE
-@st.cache_data(ttl=10, show_spinner=False)
+# 8. SETTINGS ENGINE (GitHub: conditional polling, unchanged polls are free 304s; SQLite: local read)
 def load_settings():
-    default_settings = {"gold_premium": 0, "silver_premium": 0, "last_update": 0}
-    if repo:
-        try:
-            content = repo.get_contents("manual.json")
-            data = json.loads(content.decoded_content.decode())
-            for key in default_settings:
-                data.setdefault(key, default_settings[key])
-            return data
-        except Exception:
-            return default_settings
-    return default_settings
+    if store:
+        return store.load_settings()
+    return dict(DEFAULT_SETTINGS)
 
-# 8. DATA ENGINE (HIGH SPEED 15s Cache)
-@st.cache_data(ttl=15, show_spinner=False)
-def get_live_rates():
-    tz_khi = pytz.timezone("Asia/Karachi")
-    now_khi = datetime.now(tz_khi)
-    current_hour = now_khi.hour
-    is_active_hours = 7 <= current_hour <= 23
-    debug_logs = []
-    
-    # Fake Browser Header to prevent 429 Errors
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    }
-    
-    # Initialize Variables
-    gold_price = 0.0
-    silver_price = 0.0
-    usd_rate = 0.0
-    aed_rate = 0.0
-    
-    # Source Trackers
-    src_gold = "OFFLINE"
-    src_silver = "OFFLINE"
-    src_usd = "OFFLINE"
-    
-    # --- 1. GOLD STRATEGY (Priority: TwelveData -> Yahoo) ---
-    try:
-        if "TWELVE_DATA_KEY" in st.secrets:
-            TD_KEY = st.secrets["TWELVE_DATA_KEY"]
-            url_gold = f"https://api.twelvedata.com/price?symbol=XAU/USD&apikey={TD_KEY}"
-            gold_res = requests.get(url_gold, headers=headers, timeout=5) # Added headers
-            if gold_res.status_code == 200:
-                data = gold_res.json()
-                if 'price' in data:
-                    gold_price = float(data['price'])
-                    src_gold = "TwelveData"
-                else:
-                    debug_logs.append(f"TD Gold Limit: {data.get('message')}")
-    except Exception as e:
-        debug_logs.append(f"TD Gold Error: {str(e)}")
+# Read-only JSON API (GET /api/rates on API_PORT, 0 disables) fed by the same poller and settings.
+# One feed per configured shop, all created up front so every shop's API and static snapshot
+# follow the quotes even when nobody has its page open; ?shop=<slug> selects one.
+# A shop whose storage cannot be opened gets no feed (its API answers 404) rather than
+# publishing prices without its premiums; add_rate_feed() retries once its storage is up.
+_FEEDS_LOCK = threading.Lock()
 
-    if gold_price == 0:
-        try:
-            g_tick = yf.Ticker("XAUUSD=X")
-            g_hist = g_tick.history(period="1d")
-            if not g_hist.empty:
-                gold_price = float(g_hist['Close'].iloc[-1])
-                src_gold = "Yahoo Finance"
-        except Exception as e:
-            debug_logs.append(f"Yahoo Gold Error: {str(e)}")
+def add_rate_feed(feeds, slug):
+    with _FEEDS_LOCK:
+        if slug in feeds:
+            return feeds[slug]
+        profile = SHOPS[slug]
+        feed = RateFeed(get_storage(slug).load_settings)
+        # Static rates.json + index.html for a CDN / shop screens (SNAPSHOT_DIR empty disables)
+        snapshot_dir = get_secret("SNAPSHOT_DIR", "data/public")
+        if snapshot_dir:
+            try:
+                render = lambda payload, p=profile: render_html(payload, p.name, p.subtitle)
+                feed.subscribe(SnapshotPublisher(profile.snapshot_dir(snapshot_dir), render=render).publish)
+            except OSError:
+                pass
+        poller = get_quote_poller()
+        poller.subscribe(feed.update)
+        feed.update(poller.snapshot())
+        feeds[slug] = feed
+        return feed
 
-    # --- 2. SILVER STRATEGY (Priority: Yahoo -> TwelveData) ---
-    try:
-        s_tick = yf.Ticker("XAGUSD=X")
-        s_hist = s_tick.history(period="1d")
-        if not s_hist.empty:
-            silver_price = float(s_hist['Close'].iloc[-1])
-            src_silver = "Yahoo Finance"
-    except Exception as e:
-        debug_logs.append(f"Yahoo Silver Error: {str(e)}")
-
-    if silver_price == 0:
+@st.cache_resource(show_spinner=False)
+def get_rate_feeds():
+    feeds = {}
+    for slug in SHOPS:
         try:
-            if "TWELVE_DATA_KEY" in st.secrets:
-                TD_KEY = st.secrets["TWELVE_DATA_KEY"]
-                url_slv = f"https://api.twelvedata.com/price?symbol=XAG/USD&apikey={TD_KEY}"
-                slv_res = requests.get(url_slv, headers=headers, timeout=5) # Added headers
-                if slv_res.status_code == 200:
-                    s_data = slv_res.json()
-                    if 'price' in s_data:
-                        silver_price = float(s_data['price'])
-                        src_silver = "TwelveData"
-        except Exception as e:
-            debug_logs.append(f"TD Silver Error: {str(e)}")
-
-    # --- 3. CURRENCY STRATEGY (Priority: Yahoo -> ExchangeRateAPI) ---
-    try:
-        c_tick = yf.Ticker("PKR=X")
-        c_hist = c_tick.history(period="1d")
-        if not c_hist.empty:
-            usd_rate = float(c_hist['Close'].iloc[-1])
-            aed_rate = 3.67 
-            src_usd = "Yahoo Finance"
-    except Exception as e:
-        debug_logs.append(f"Yahoo USD Error: {str(e)}")
-
-    if usd_rate == 0:
+            add_rate_feed(feeds, slug)
+        except Exception:
+            pass
+    if API_PORT:
         try:
-            if "CURR_KEY" in st.secrets:
-                CURR_KEY = st.secrets["CURR_KEY"]
-                url_curr = f"https://v6.exchangerate-api.com/v6/{CURR_KEY}/latest/USD"
-                curr_res = requests.get(url_curr, headers=headers, timeout=5) # Added headers
-                if curr_res.status_code == 200:
-                    c_data = curr_res.json()
-                    usd_rate = float(c_data.get('conversion_rates', {}).get('PKR', 0))
-                    aed_rate = float(c_data.get('conversion_rates', {}).get('AED', 0))
-                    src_usd = "ExchangeRate-API"
-        except Exception as e:
-            debug_logs.append(f"Currency Backup Error: {str(e)}")
+            serve_in_background(make_api_app(None, feeds, default=DEFAULT_SHOP), API_PORT)
+        except OSError:
+            pass  # another app process on this host already serves the API
+    if METRICS_PORT:
+        try:
+            serve_in_background(metrics_app, METRICS_PORT, host="127.0.0.1", name="metrics")
+        except OSError:
+            pass
+    return feeds
 
-    return {
-        "gold": gold_price, "silver": silver_price, "usd": usd_rate, "aed": aed_rate,
-        "src_gold": src_gold, "src_silver": src_silver, "src_usd": src_usd,
-        "debug": debug_logs,
-        "time": datetime.now(pytz.timezone("Asia/Karachi")).strftime("%I:%M:%S %p"),
-        "full_date": datetime.now(pytz.timezone("Asia/Karachi")).strftime("%Y-%m-%d %H:%M:%S"),
-        "active_mode": is_active_hours
-    }
+# Publishes are queued and written by one background worker; clicks inside the debounce
+# window are merged into a single storage write (see publish_queue.py)
+@st.cache_resource(show_spinner=False)
+def get_publish_queue(shop_slug):
+    def history_record(settings, fresh):
+        return {
+            "date": fresh['full_date'],
+            "gold_pk": tola_rate(fresh['gold'], fresh['usd'], settings["gold_premium"]),
+            "silver_pk": tola_rate(fresh['silver'], fresh['usd'], settings["silver_premium"]),
+            "gold_ounce": fresh['gold'],
+            "silver_ounce": fresh['silver'],
+            "usd": fresh['usd']
+        }
+    feed = add_rate_feed(get_rate_feeds(), shop_slug)
+    queue = PublishQueue(get_storage(shop_slug), lambda: get_quote_poller().refresh_now(max_age=0), history_record,
+                         debounce=float(get_secret("PUBLISH_DEBOUNCE", PUBLISH_DEBOUNCE)))
+    queue.subscribe(lambda settings: feed.update())
+    return queue.start()
 
 # 9. LOAD DATA
 try:
-    current_ts = time.time()
-    tz_khi = pytz.timezone("Asia/Karachi")
-    cur_hour = datetime.now(tz_khi).hour
-    wait_time = 90 if (7 <= cur_hour <= 23) else 1800
-    
-    # In High Speed mode, we just check the cache timestamp
+    # Snapshot from the background poller, never blocks on upstream after boot
     live_data = get_live_rates()
 except:
     live_data = {"gold": 0, "silver": 0, "usd": 0, "aed": 0, "src_gold": "ERR", "src_silver": "ERR", "src_usd": "ERR", "debug": ["Crash"], "full_date": "Error", "active_mode": True}
 
+try:
+    feeds = get_rate_feeds()
+    if store:
+        # No-op once the feed exists; picks the shop up if its storage failed at boot
+        add_rate_feed(feeds, shop.slug)
+except Exception:
+    pass
+
 try:
     settings = load_settings()
 except:
@@ -255,108 +367,182 @@ if settings.get("last_update", 0) > st.session_state.last_seen_update:
         st.rerun()
 
 # 11. CALCULATIONS
-gold_ounce = float(live_data.get('gold', 0))
-silver_ounce = float(live_data.get('silver', 0))
-usd_rate = float(live_data.get('usd', 0))
-aed_rate = float(live_data.get('aed', 0))
-gold_premium = float(settings.get("gold_premium", 0))
-silver_premium = float(settings.get("silver_premium", 0))
-
-if gold_ounce > 0 and usd_rate > 0:
-    gold_tola = ((gold_ounce / 31.1035) * 11.66 * usd_rate) + gold_premium
-    gold_dubai_tola = (gold_ounce / 31.1035) * 11.66 * aed_rate
-else:
-    gold_tola = 0
-    gold_dubai_tola = 0
-
-if silver_ounce > 0 and usd_rate > 0:
-    silver_tola = ((silver_ounce / 31.1035) * 11.66 * usd_rate) + silver_premium
-else:
-    silver_tola = 0
+def calculate_rates(live_data, settings):
+    gold_ounce = float(live_data.get('gold', 0))
+    silver_ounce = float(live_data.get('silver', 0))
+    usd_rate = float(live_data.get('usd', 0))
+    aed_rate = float(live_data.get('aed', 0))
+    gold_premium = float(settings.get("gold_premium", 0))
+    silver_premium = float(settings.get("silver_premium", 0))
+
+    if gold_ounce > 0 and usd_rate > 0:
+        gold_tola = tola_rate(gold_ounce, usd_rate, gold_premium)
+        gold_dubai_tola = tola_rate(gold_ounce, aed_rate)
+    else:
+        gold_tola = 0
+        gold_dubai_tola = 0
+
+    if silver_ounce > 0 and usd_rate > 0:
+        silver_tola = tola_rate(silver_ounce, usd_rate, silver_premium)
+    else:
+        silver_tola = 0
+
+    return {"gold_ounce": gold_ounce, "silver_ounce": silver_ounce, "usd_rate": usd_rate, "aed_rate": aed_rate,
+            "gold_premium": gold_premium, "silver_premium": silver_premium,
+            "gold_tola": gold_tola, "gold_dubai_tola": gold_dubai_tola, "silver_tola": silver_tola}
+
+calc = calculate_rates(live_data, settings)
+gold_ounce, silver_ounce = calc["gold_ounce"], calc["silver_ounce"]
+usd_rate, aed_rate = calc["usd_rate"], calc["aed_rate"]
+gold_premium, silver_premium = calc["gold_premium"], calc["silver_premium"]
+gold_tola, gold_dubai_tola, silver_tola = calc["gold_tola"], calc["gold_dubai_tola"], calc["silver_tola"]
+
+mark("load_data")
 
 # 12. DISPLAY
-st.markdown("""
+st.markdown(f"""
 <div class="header-box">
-    <div class="brand-title">Islam Jewellery</div>
-    <div class="brand-subtitle">Sarafa Bazar • Premium Gold</div>
+    <div class="brand-title">{html.escape(shop.name)}</div>
+    <div class="brand-subtitle">{html.escape(shop.subtitle)}</div>
 </div>
 """, unsafe_allow_html=True)
 
-is_active = live_data.get('active_mode', True)
-status_badge = '<div class="live-badge">● GOLD LIVE</div>' if is_active else '<div class="sleep-badge">☾ NIGHT MODE</div>'
-update_time = live_data.get('time')
-
-# Gold Card
-if gold_tola > 0:
-    st.markdown(f"""
-    <div class="price-card">
-        {status_badge}
-        <div class="big-price">Rs {gold_tola:,.0f}</div>
-        <div class="price-label">24K Gold Per Tola</div>
-        <div class="stats-container">
-            <div class="stat-box">
-                <div class="stat-value">${gold_ounce:,.2f}</div>
-                <div class="stat-label">Ounce USD</div>
-                <div class="stat-time">🕒 {update_time}</div>
-            </div>
-            <div class="stat-box">
-                <div class="stat-value">Rs {usd_rate:.2f}</div>
-                <div class="stat-label">USD Rate</div>
-                <div class="stat-time">🕒 {update_time}</div>
-            </div>
-            <div class="stat-box">
-                <div class="stat-value">AED {gold_dubai_tola:,.0f}</div>
-                <div class="stat-label">Dubai/Tola</div>
-                <div class="stat-time">🕒 {update_time}</div>
+# LIVE PRICE CARDS
+# The only part of the page that refreshes on its own. It is a fragment, so a push
+# from /api/stream (or the 20 s poll when the stream is unavailable) reruns just
+# these cards; header, buttons and admin tabs stay untouched until the user acts.
+LIVE_REFRESH = 20
+
+def cached_badge(ts):
+    return f'<div class="stale-badge">⏳ CACHED · {age_label(time.time() - ts)} OLD</div>'
+
+@timed("render", section="price_cards")
+def render_price_cards():
+    live_data = get_live_rates()
+    settings = load_settings()
+    # Someone published new premiums: the whole page (admin inputs too) must resync
+    if settings.get("last_update", 0) > st.session_state.last_seen_update and not st.session_state.get("is_admin_publishing", False):
+        st.rerun(scope="app")
+    calc = calculate_rates(live_data, settings)
+    gold_tola, gold_dubai_tola, silver_tola = calc["gold_tola"], calc["gold_dubai_tola"], calc["silver_tola"]
+    gold_ounce, silver_ounce, usd_rate = calc["gold_ounce"], calc["silver_ounce"], calc["usd_rate"]
+
+    is_active = live_data.get('active_mode', True)
+    status_badge = '<div class="live-badge">● GOLD LIVE</div>' if is_active else '<div class="sleep-badge">☾ NIGHT MODE</div>'
+    silver_badge = '<div class="live-badge" style="background-color:#eef2f6; color:#555;">● SILVER LIVE</div>'
+    update_time = live_data.get('time')
+    # Instruments served from the last good quote (all sources down, or just restarted)
+    stale = live_data.get('stale') or {}
+    if 'gold' in stale or 'usd' in stale:
+        status_badge = cached_badge(min(stale[k] for k in ('gold', 'usd') if k in stale))
+    if 'silver' in stale or 'usd' in stale:
+        silver_badge = cached_badge(min(stale[k] for k in ('silver', 'usd') if k in stale))
+
+    # Gold Card
+    if gold_tola > 0:
+        st.markdown(f"""
+        <div class="price-card">
+            {status_badge}
+            <div class="big-price">Rs {gold_tola:,.0f}</div>
+            <div class="price-label">24K Gold Per Tola</div>
+            <div class="stats-container">
+                <div class="stat-box">
+                    <div class="stat-value">${gold_ounce:,.2f}</div>
+                    <div class="stat-label">Ounce USD</div>
+                    <div class="stat-time">🕒 {update_time}</div>
+                </div>
+                <div class="stat-box">
+                    <div class="stat-value">Rs {usd_rate:.2f}</div>
+                    <div class="stat-label">USD Rate</div>
+                    <div class="stat-time">🕒 {update_time}</div>
+                </div>
+                <div class="stat-box">
+                    <div class="stat-value">AED {gold_dubai_tola:,.0f}</div>
+                    <div class="stat-label">Dubai/Tola</div>
+                    <div class="stat-time">🕒 {update_time}</div>
+                </div>
             </div>
+            <div style="font-size:0.6rem; color:#aaa; margin-top:8px;">Data as of: <b>{live_data.get('full_date')}</b></div>
         </div>
-        <div style="font-size:0.6rem; color:#aaa; margin-top:8px;">Data as of: <b>{live_data.get('full_date')}</b></div>
-    </div>
-    """, unsafe_allow_html=True)
-else:
-    st.markdown(f"""
-    <div class="price-card" style="border-left: 5px solid #dc3545;">
-        <div class="error-badge">● DISCONNECTED</div>
-        <div class="big-price" style="color:#dc3545; font-size: 1.8rem;">MARKET OFFLINE</div>
-        <div class="price-label">Live data unavailable. Do not trade.</div>
-        <div style="font-size:0.6rem; color:#aaa; margin-top:8px;">Last check: <b>{live_data.get('full_date')}</b></div>
-    </div>
-    """, unsafe_allow_html=True)
-
-# Silver Card
-if silver_tola > 0:
-    st.markdown(f"""
-    <div class="price-card">
-        <div class="live-badge" style="background-color:#eef2f6; color:#555;">● SILVER LIVE</div>
-        <div class="big-price">Rs {silver_tola:,.0f}</div>
-        <div class="price-label">24K Silver Per Tola</div>
-        <div class="stats-container">
-            <div class="stat-box">
-                <div class="stat-value">${silver_ounce:.2f}</div>
-                <div class="stat-label">Ounce USD</div>
-                <div class="stat-time">🕒 {update_time}</div>
-            </div>
-            <div class="stat-box">
-                <div class="stat-value">{live_data.get('time')}</div>
-                <div class="stat-label">Time</div>
+        """, unsafe_allow_html=True)
+    else:
+        st.markdown(f"""
+        <div class="price-card" style="border-left: 5px solid #dc3545;">
+            <div class="error-badge">● DISCONNECTED</div>
+            <div class="big-price" style="color:#dc3545; font-size: 1.8rem;">MARKET OFFLINE</div>
+            <div class="price-label">Live data unavailable. Do not trade.</div>
+            <div style="font-size:0.6rem; color:#aaa; margin-top:8px;">Last check: <b>{live_data.get('full_date')}</b></div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    # Silver Card
+    if silver_tola > 0:
+        st.markdown(f"""
+        <div class="price-card">
+            {silver_badge}
+            <div class="big-price">Rs {silver_tola:,.0f}</div>
+            <div class="price-label">24K Silver Per Tola</div>
+            <div class="stats-container">
+                <div class="stat-box">
+                    <div class="stat-value">${silver_ounce:.2f}</div>
+                    <div class="stat-label">Ounce USD</div>
+                    <div class="stat-time">🕒 {update_time}</div>
+                </div>
+                <div class="stat-box">
+                    <div class="stat-value">{live_data.get('time')}</div>
+                    <div class="stat-label">Time</div>
+                </div>
             </div>
         </div>
-    </div>
-    """, unsafe_allow_html=True)
-else:
-    st.markdown(f"""
-    <div class="price-card" style="border-left: 5px solid #dc3545;">
-        <div class="error-badge">● DISCONNECTED</div>
-        <div class="big-price" style="color:#dc3545; font-size: 1.5rem;">SILVER OFFLINE</div>
-    </div>
-    """, unsafe_allow_html=True)
+        """, unsafe_allow_html=True)
+    else:
+        st.markdown(f"""
+        <div class="price-card" style="border-left: 5px solid #dc3545;">
+            <div class="error-badge">● DISCONNECTED</div>
+            <div class="big-price" style="color:#dc3545; font-size: 1.5rem;">SILVER OFFLINE</div>
+        </div>
+        """, unsafe_allow_html=True)
+def live_price_cards():
+    if API_PORT:
+        push = rate_listener(url=API_PUBLIC_URL, port=API_PORT,
+                             query="" if shop.is_default else f"?shop={shop.slug}", key="rate_listener", default=None)
+        status = (push or {}).get("status")
+        # Swap between the push-driven and the polling fragment once the stream is up / gone
+        if (status == "connected") != st.session_state.push_live and status in ("connected", "failed"):
+            st.session_state.push_live = status == "connected"
+            st.rerun(scope="app")
+    render_price_cards()
+
+@st.fragment
+def price_cards_push():
+    live_price_cards()
+
+@st.fragment(run_every=LIVE_REFRESH)
+def price_cards_poll():
+    live_price_cards()
+
+(price_cards_push if st.session_state.push_live else price_cards_poll)()
 
 # REFRESH BUTTON
 if st.button("🔄 Refresh Rates", use_container_width=True):
-    clear_all_caches()
+    get_quote_poller().refresh_now()
+    if store: store.refresh()
     st.rerun()
 
-st.markdown("""<div class="btn-grid"><a href="tel:03492114166" class="contact-btn btn-call">📞 Call Now</a><a href="https://wa.me/923492114166" class="contact-btn btn-whatsapp">💬 WhatsApp</a></div>""", unsafe_allow_html=True)
+contact = []
+if shop.phone:
+    contact.append(f'<a href="tel:{html.escape(shop.phone)}" class="contact-btn btn-call">📞 Call Now</a>')
+if shop.whatsapp:
+    contact.append(f'<a href="https://wa.me/{html.escape(shop.whatsapp)}" class="contact-btn btn-whatsapp">💬 WhatsApp</a>')
+if contact:
+    st.markdown(f"""<div class="btn-grid">{''.join(contact)}</div>""", unsafe_allow_html=True)
+
+# Public page is on screen: everything below is admin-only
+mark("public_page")
+try:
+    record_paint()
+except Exception:
+    pass
 
 # 13. ADMIN SECTION
 if not st.session_state.admin_auth:
@@ -366,7 +552,9 @@ if not st.session_state.admin_auth:
         with col2:
             password = st.text_input("Password", type="password", placeholder="Enter password...", key="admin_pass")
             if st.button("🔓 Login", use_container_width=True, type="primary"):
-                admin_pass = st.secrets.get("ADMIN_PASSWORD", "123123")
+                # Partner shops always have their own password (load_shops enforces it)
+                admin_pass = shop.admin_password if not shop.is_default else \
+                    (shop.admin_password or st.secrets.get("ADMIN_PASSWORD", "123123"))
                 if password == admin_pass:
                     st.session_state.admin_auth = True
                     clear_all_caches()
@@ -375,6 +563,11 @@ if not st.session_state.admin_auth:
                     st.markdown('<div class="error-msg">⚠️ Invalid password</div>', unsafe_allow_html=True)
 
 if st.session_state.admin_auth:
+    # Heavy analytics imports, deferred until an admin is actually logged in
+    import pandas as pd
+    import altair as alt
+    from chart_data import INTERVALS as CHART_INTERVALS
+
     st.markdown("---")
     col1, col2 = st.columns([4, 1])
     with col1:
@@ -386,21 +579,36 @@ if st.session_state.admin_auth:
             clear_all_caches()
             st.rerun()
     
-    # NEW: SOURCE MONITOR
-    with st.expander("📡 Live Source Monitor", expanded=True):
-        sc1, sc2, sc3 = st.columns(3)
-        
-        def get_color(src):
-            if "TwelveData" in src: return "#e3f2fd" # Blue
-            if "Yahoo" in src: return "#e8f5e9" # Green
-            return "#ffebee" # Red/Error
+    # NEW: SOURCE MONITOR (fragment: follows the poller without rerunning the dashboard)
+    @st.fragment(run_every=LIVE_REFRESH)
+    def source_monitor():
+        live_data = get_live_rates()
+        with st.expander("📡 Live Source Monitor", expanded=True):
+            sc1, sc2, sc3 = st.columns(3)
             
-        with sc1:
-            st.markdown(f'<div style="text-align:center; padding:10px; border-radius:8px; background:{get_color(live_data["src_gold"])};"><b>🟡 Gold</b><br>{live_data["src_gold"]}</div>', unsafe_allow_html=True)
-        with sc2:
-            st.markdown(f'<div style="text-align:center; padding:10px; border-radius:8px; background:{get_color(live_data["src_silver"])};"><b>⚪ Silver</b><br>{live_data["src_silver"]}</div>', unsafe_allow_html=True)
-        with sc3:
-            st.markdown(f'<div style="text-align:center; padding:10px; border-radius:8px; background:{get_color(live_data["src_usd"])};"><b>💵 USD</b><br>{live_data["src_usd"]}</div>', unsafe_allow_html=True)
+            def get_color(src):
+                if "TwelveData" in src: return "#e3f2fd" # Blue
+                if "Yahoo" in src: return "#e8f5e9" # Green
+                if "Cached" in src: return "#fff8e1" # Amber
+                return "#ffebee" # Red/Error
+                
+            with sc1:
+                st.markdown(f'<div style="text-align:center; padding:10px; border-radius:8px; background:{get_color(live_data["src_gold"])};"><b>🟡 Gold</b><br>{live_data["src_gold"]}</div>', unsafe_allow_html=True)
+            with sc2:
+                st.markdown(f'<div style="text-align:center; padding:10px; border-radius:8px; background:{get_color(live_data["src_silver"])};"><b>⚪ Silver</b><br>{live_data["src_silver"]}</div>', unsafe_allow_html=True)
+            with sc3:
+                st.markdown(f'<div style="text-align:center; padding:10px; border-radius:8px; background:{get_color(live_data["src_usd"])};"><b>💵 USD</b><br>{live_data["src_usd"]}</div>', unsafe_allow_html=True)
+
+            # Rolling health per source (hedged losers included); open circuits are skipped by the fetcher
+            health_rows = SOURCE_HEALTH.stats()
+            if health_rows:
+                st.dataframe(health_rows, hide_index=True, use_container_width=True)
+            # Daily credit budgets: paced by the market-hours token bucket, projected to end of day
+            quota_rows = QUOTA.report()
+            if quota_rows:
+                st.dataframe(quota_rows, hide_index=True, use_container_width=True)
+
+    source_monitor()
 
     # DEBUGGER
     with st.expander("🛠️ Debug Logs", expanded=False):
@@ -414,10 +622,32 @@ if st.session_state.admin_auth:
                     st.info(f"ℹ️ {log}")
                 elif "Used Backup" in log:
                     st.warning(f"🔄 {log}")
+                elif "Circuit Open" in log or "Paced" in log or "Cached" in log:
+                    st.info(f"⏸️ {log}")
                 else:
                     st.error(f"❌ {log}")
         else:
             st.success("✅ Clean run (No errors)")
+        profile = startup_profile()
+        if profile:
+            over = (profile["cold_imports_ms"] > IMPORT_BUDGET_MS or profile["cold_paint_ms"] > FIRST_PAINT_BUDGET_MS)
+            (st.warning if over else st.caption)(
+                f"⏱️ Cold start: imports {profile['cold_imports_ms']:.0f} ms (budget {IMPORT_BUDGET_MS}), "
+                f"first paint {profile['cold_paint_ms']:.0f} ms (budget {FIRST_PAINT_BUDGET_MS}) | "
+                f"last rerun paint {profile['last_paint_ms']:.0f} ms")
+
+    # LATENCY (process-wide timing histograms; the same data is served as /metrics on METRICS_PORT)
+    with st.expander("⏱️ Latency", expanded=False):
+        latency_rows = latency_summary()
+        if latency_rows:
+            st.dataframe(latency_rows, hide_index=True, use_container_width=True)
+        else:
+            st.info("No timings recorded yet.")
+        if METRICS_PORT:
+            st.caption(f"Prometheus scrape target: 127.0.0.1:{METRICS_PORT}/metrics (localhost only)")
+        else:
+            st.caption("Set METRICS_PORT to expose these as Prometheus /metrics on localhost.")
+    mark("admin_monitor")
 
     tabs = st.tabs(["💰 Update Rates", "📊 Statistics", "📜 History", "📈 Charts"])
     
@@ -454,7 +684,7 @@ if st.session_state.admin_auth:
             st.session_state.new_gold = int(val)
             
             # Preview
-            preview_gold = ((gold_ounce / 31.1035) * 11.66 * usd_rate) + st.session_state.new_gold
+            preview_gold = tola_rate(gold_ounce, usd_rate, st.session_state.new_gold)
             
             st.markdown(f"""
             <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 1rem; margin-top: 1.5rem;">
@@ -485,7 +715,7 @@ if st.session_state.admin_auth:
             st.session_state.new_silver = int(val)
             
             # Preview
-            preview_silver = ((silver_ounce / 31.1035) * 11.66 * usd_rate) + st.session_state.new_silver
+            preview_silver = tola_rate(silver_ounce, usd_rate, st.session_state.new_silver)
             
             st.markdown(f"""
             <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 1rem; margin-top: 1.5rem;">
@@ -496,75 +726,50 @@ if st.session_state.admin_auth:
             """, unsafe_allow_html=True)
             st.markdown('</div>', unsafe_allow_html=True)
         
-        # PUBLISH BUTTON
-        publish_disabled = st.session_state.get("publishing", False)
-        if publish_disabled:
-            st.warning("⏳ Publishing... Please wait")
-        
-        if st.button("🚀 PUBLISH RATE", type="primary", use_container_width=True, disabled=publish_disabled):
-            if repo and not publish_disabled:
-                st.session_state.publishing = True
+        # PUBLISH BUTTON (queued: returns at once, progress below follows the background write)
+        if st.button("🚀 PUBLISH RATE", type="primary", use_container_width=True):
+            if store:
+                st.session_state.publish_ticket = get_publish_queue(shop.slug).submit({
+                    "gold_premium": int(st.session_state.new_gold),
+                    "silver_premium": int(st.session_state.new_silver),
+                })
                 st.session_state.is_admin_publishing = True
-                try:
-                    # CRITICAL: Get FRESH live rates
-                    get_live_rates.clear()
-                    fresh = get_live_rates()
-                    
-                    if fresh['gold'] == 0 or fresh['usd'] == 0:
-                        st.error("❌ Cannot publish: APIs are offline.")
-                        st.session_state.publishing = False
-                    else:
-                        c_gold = ((fresh['gold'] / 31.1035) * 11.66 * fresh['usd']) + int(st.session_state.new_gold)
-                        c_silver = ((fresh['silver'] / 31.1035) * 11.66 * fresh['usd']) + int(st.session_state.new_silver)
-                        
-                        new_settings = {
-                            "gold_premium": int(st.session_state.new_gold), 
-                            "silver_premium": int(st.session_state.new_silver),
-                            "last_update": int(time.time())
-                        }
-                        
-                        try:
-                            c = repo.get_contents("manual.json")
-                            repo.update_file(c.path, "Update", json.dumps(new_settings), c.sha)
-                        except:
-                            repo.create_file("manual.json", "Init", json.dumps(new_settings))
-                            
-                        # Update History
-                        try:
-                            hc = repo.get_contents("history.json")
-                            hist_data = json.loads(hc.decoded_content.decode())
-                            hist = hist_data if isinstance(hist_data, list) else []
-                        except:
-                            hist = []
-                        
-                        hist.append({
-                            "date": fresh['full_date'],
-                            "gold_pk": c_gold,
-                            "silver_pk": c_silver,
-                            "gold_ounce": fresh['gold'],
-                            "silver_ounce": fresh['silver'],
-                            "usd": fresh['usd']
-                        })
-                        if len(hist) > 60: hist = hist[-60:]
-                        
-                        try:
-                            repo.update_file(hc.path, "Hist", json.dumps(hist), hc.sha)
-                        except:
-                            repo.create_file("history.json", "Init", json.dumps(hist))
-                            
-                        st.success("✅ Updated! Syncing all users...")
-                        time.sleep(1)
-                        st.session_state.publishing = False
-                        st.session_state.last_seen_update = new_settings["last_update"]
-                        clear_all_caches()
-                        st.rerun()
-                        
-                except Exception as e:
-                    st.session_state.publishing = False
-                    st.markdown(f'<div class="error-msg">❌ Error: {str(e)}</div>', unsafe_allow_html=True)
             else:
-                st.markdown('<div class="error-msg">❌ GitHub not connected</div>', unsafe_allow_html=True)
+                st.markdown('<div class="error-msg">❌ Storage not connected</div>', unsafe_allow_html=True)
+
+        ticket = st.session_state.publish_ticket
+
+        # Polls the queue once a second while this session has a publish in flight
+        @st.fragment(run_every=1 if ticket else None)
+        def publish_progress():
+            if not ticket:
+                return
+            status = get_publish_queue(shop.slug).status(ticket)
+            if status is None:
+                # Ticket aged out of the queue's memory (e.g. the app was idle for long)
+                st.session_state.publish_ticket = None
+                st.session_state.is_admin_publishing = False
+                return
+            merged = f" ({status['merged']} publishes merged)" if status["merged"] > 1 else ""
+            if status["state"] == "queued":
+                st.info(f"⏳ Queued{merged}, writing in {status.get('eta', 0):.0f}s...")
+            elif status["state"] == "publishing":
+                st.info(f"⏳ Publishing{merged}...")
+            else:
+                st.session_state.publish_ticket = None
+                st.session_state.is_admin_publishing = False
+                if status["state"] == "done":
+                    st.toast(f"✅ Updated{merged}! Syncing all users...")
+                    st.session_state.last_seen_update = status["last_update"]
+                    clear_all_caches()
+                else:
+                    st.toast(f"❌ Publish failed: {status['error']}")
+                st.rerun(scope="app")
+
+        publish_progress()
     
+    mark("admin_update")
+
     # TAB 2: Statistics
     with tabs[1]:
         st.markdown("### Market Overview")
@@ -585,7 +790,7 @@ if st.session_state.admin_auth:
         calc_cols = st.columns(2)
         
         with calc_cols[0]:
-            base_gold = ((gold_ounce/31.1035)*11.66*usd_rate)
+            base_gold = tola_rate(gold_ounce, usd_rate)
             st.markdown(f"""
             <div style="background: white; border-radius: 12px; padding: 1.5rem; border-left: 4px solid #d4af37; box-shadow: 0 2px 8px rgba(0,0,0,0.05);">
                 <h4 style="margin-top: 0; color: #1a1a1a; margin-bottom: 1rem;">🟡 Gold</h4>
@@ -599,7 +804,7 @@ if st.session_state.admin_auth:
             """, unsafe_allow_html=True)
             
         with calc_cols[1]:
-            base_silver = ((silver_ounce/31.1035)*11.66*usd_rate)
+            base_silver = tola_rate(silver_ounce, usd_rate)
             st.markdown(f"""
             <div style="background: white; border-radius: 12px; padding: 1.5rem; border-left: 4px solid #C0C0C0; box-shadow: 0 2px 8px rgba(0,0,0,0.05);">
                 <h4 style="margin-top: 0; color: #1a1a1a; margin-bottom: 1rem;">⚪ Silver</h4>
@@ -611,13 +816,26 @@ if st.session_state.admin_auth:
             </div>
             """, unsafe_allow_html=True)
     
+        # Rate Card (all karats and weights from the same vector pricing engine)
+        st.markdown("### Gold Rate Card")
+        card_currency = st.radio("Currency:", ["PKR", "AED"], horizontal=True, key="card_currency")
+        if gold_tola > 0:
+            card = rate_card(gold_ounce, usd_rate, aed_rate, gold_premium, currency=card_currency)
+            card_df = pd.DataFrame(card).T.round(0)
+            st.dataframe(card_df.style.format("{:,.0f}"), use_container_width=True)
+            st.caption("Premium included, scaled by weight and purity.")
+        else:
+            st.info("Rate card needs a live gold quote.")
+    
+    mark("admin_stats")
+
     # TAB 3: HISTORY
     with tabs[2]:
         st.markdown("### 📜 Rate History Log")
         
         header_cols = st.columns([3, 1])
         with header_cols[0]:
-            st.caption(f"Last 60 records")
+            hist_window = st.selectbox("Show:", list(HISTORY_WINDOWS), key="hist_window")
         with header_cols[1]:
             if st.button("🗑️ Reset History", type="secondary", key="reset_hist_btn"):
                 st.session_state.confirm_reset_history = True
@@ -628,17 +846,16 @@ if st.session_state.admin_auth:
             conf_cols = st.columns(2)
             with conf_cols[0]:
                 if st.button("✅ Yes, Delete All", type="primary", key="confirm_hist_yes", use_container_width=True):
-                    if repo:
+                    if store:
                         try:
-                            h_content = repo.get_contents("history.json")
-                            repo.update_file(h_content.path, "Reset history", json.dumps([]), h_content.sha)
+                            store.reset_history()
                             st.session_state.confirm_reset_history = False
                             st.success("✅ History cleared!")
                             st.rerun()
                         except Exception as e:
                             st.error(f"Error: {e}")
                     else:
-                        st.error("GitHub not connected")
+                        st.error("Storage not connected")
             with conf_cols[1]:
                 if st.button("❌ Cancel", key="cancel_hist", use_container_width=True):
                     st.session_state.confirm_reset_history = False
@@ -646,13 +863,12 @@ if st.session_state.admin_auth:
             st.markdown('</div>', unsafe_allow_html=True)
         
         try:
-            if repo:
-                contents = repo.get_contents("history.json")
-                history_data = json.loads(contents.decoded_content.decode())
+            if store:
+                history_df, _ = load_history_view(hist_window)
                 
-                if history_data and len(history_data) > 0:
-                    df = pd.DataFrame(history_data)
-                    df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d %H:%M')
+                if len(history_df) > 0:
+                    # New frame for display; the shared history frame is never modified
+                    df = history_df.assign(date=history_df['date'].dt.strftime('%Y-%m-%d %H:%M'))
                     
                     column_mapping = {
                         'date': 'Date/Time',
@@ -678,36 +894,44 @@ if st.session_state.admin_auth:
                 else:
                     st.info("📭 No history records found.")
             else:
-                st.error("❌ GitHub not connected")
+                st.error("❌ Storage not connected")
         except Exception as e:
             st.info(f"📭 History empty or error: {str(e)}")
     
+    mark("admin_history")
+
     # TAB 4: CHARTS
     with tabs[3]:
         st.markdown("### 📈 Price Trends")
         
-        ctrl_col1, ctrl_col2, ctrl_col3 = st.columns([2, 2, 1])
+        ctrl_col1, ctrl_col2, ctrl_col3, ctrl_col4 = st.columns([2, 2, 2, 1])
         
         with ctrl_col1:
             chart_metal = st.selectbox("Select Metal:", ["Gold", "Silver"], key="chart_sel")
         
         with ctrl_col2:
-            chart_type = st.selectbox("Chart Type:", ["Line", "Area"], key="type_sel")
+            chart_type = st.selectbox("Chart Type:", ["Line", "Area", "Candles"], key="type_sel")
         
         with ctrl_col3:
+            chart_window = st.selectbox("Range:", list(HISTORY_WINDOWS), key="chart_window")
+        
+        with ctrl_col4:
             if st.button("🗑️ Reset", type="secondary", key="reset_chart"):
                 st.session_state.confirm_reset_chart = True
         
+        chart_interval = "1h"
+        if chart_type == "Candles":
+            chart_interval = st.radio("Candle Interval:", list(CHART_INTERVALS), index=2, horizontal=True, key="chart_interval")
+        
         if st.session_state.confirm_reset_chart:
             st.markdown('<div class="reset-container">', unsafe_allow_html=True)
             st.markdown("⚠️ **Warning:** Delete all chart data?")
             c1, c2 = st.columns(2)
             with c1:
                 if st.button("✅ Delete", type="primary", key="confirm_chart_yes", use_container_width=True):
-                    if repo:
+                    if store:
                         try:
-                            h_content = repo.get_contents("history.json")
-                            repo.update_file(h_content.path, "Reset", json.dumps([]), h_content.sha)
+                            store.reset_history()
                             st.session_state.confirm_reset_chart = False
                             st.success("✅ Cleared!")
                             st.rerun()
@@ -722,47 +946,51 @@ if st.session_state.admin_auth:
             st.markdown('</div>', unsafe_allow_html=True)
         
         try:
-            if repo:
-                contents = repo.get_contents("history.json")
-                history_data = json.loads(contents.decoded_content.decode())
+            if store:
+                history_df, version = load_history_view(chart_window)
                 
-                if history_data and len(history_data) > 1:
-                    df = pd.DataFrame(history_data)
-                    df['date'] = pd.to_datetime(df['date'])
-                    df['gold_pk'] = pd.to_numeric(df.get('gold_pk', 0), errors='coerce')
-                    df['silver_pk'] = pd.to_numeric(df.get('silver_pk', 0), errors='coerce')
-                    df = df.dropna(subset=['date'])
-                    
-                    if chart_metal == "Gold":
-                        df_chart = df.dropna(subset=['gold_pk'])
-                        y_col = 'gold_pk'
-                        color = '#d4af37'
-                        title = "Gold Price History"
-                    else:
-                        df_chart = df.dropna(subset=['silver_pk'])
-                        y_col = 'silver_pk'
-                        color = '#71797E'
-                        title = "Silver Price History"
+                if len(history_df) > 1:
+                    y_col = 'gold_pk' if chart_metal == "Gold" else 'silver_pk'
+                    color = '#d4af37' if chart_metal == "Gold" else '#71797E'
+                    title = f"{chart_metal} Price History"
+                    df_chart, chart_stats = chart_series(history_df, version, y_col, chart_type, chart_interval)
                     
-                    if len(df_chart) < 2:
+                    if chart_stats["count"] < 2:
                         st.info("📊 Not enough data points.")
                     else:
-                        base = alt.Chart(df_chart).encode(
-                            x=alt.X('date:T', title='Date', axis=alt.Axis(format='%d %b %H:%M')),
-                            y=alt.Y(f'{y_col}:Q', title='Price (PKR)', scale=alt.Scale(zero=False)),
-                            tooltip=[
-                                alt.Tooltip('date:T', title='Date', format='%Y-%m-%d %H:%M'),
-                                alt.Tooltip(f'{y_col}:Q', title='Rate', format='Rs ,.0f')
-                            ]
-                        )
-                        
-                        if chart_type == "Area":
-                            chart = (base.mark_area(color=color, opacity=0.3) + 
-                                    base.mark_line(color=color, strokeWidth=3) + 
-                                    base.mark_point(filled=True, color=color, size=60, stroke='white', strokeWidth=2))
+                        if chart_type == "Candles":
+                            base = alt.Chart(df_chart).encode(
+                                x=alt.X('date:T', title='Date', axis=alt.Axis(format='%d %b %H:%M')),
+                                color=alt.condition('datum.open <= datum.close', alt.value('#1e8e3e'), alt.value('#dc3545')),
+                                tooltip=[
+                                    alt.Tooltip('date:T', title='From', format='%Y-%m-%d %H:%M'),
+                                    alt.Tooltip('open:Q', title='Open', format='Rs ,.0f'),
+                                    alt.Tooltip('high:Q', title='High', format='Rs ,.0f'),
+                                    alt.Tooltip('low:Q', title='Low', format='Rs ,.0f'),
+                                    alt.Tooltip('close:Q', title='Close', format='Rs ,.0f'),
+                                    alt.Tooltip('count:Q', title='Records')
+                                ]
+                            )
+                            chart = (base.mark_rule().encode(y=alt.Y('low:Q', title='Price (PKR)', scale=alt.Scale(zero=False)), y2='high:Q') +
+                                    base.mark_bar(size=8).encode(y='open:Q', y2='close:Q'))
                         else:
-                            chart = (base.mark_line(color=color, strokeWidth=3) + 
-                                    base.mark_point(filled=True, color=color, size=60, stroke='white', strokeWidth=2))
+                            base = alt.Chart(df_chart).encode(
+                                x=alt.X('date:T', title='Date', axis=alt.Axis(format='%d %b %H:%M')),
+                                y=alt.Y(f'{y_col}:Q', title='Price (PKR)', scale=alt.Scale(zero=False)),
+                                tooltip=[
+                                    alt.Tooltip('date:T', title='Date', format='%Y-%m-%d %H:%M'),
+                                    alt.Tooltip(f'{y_col}:Q', title='Rate', format='Rs ,.0f')
+                                ]
+                            )
+                            
+                            if chart_type == "Area":
+                                chart = (base.mark_area(color=color, opacity=0.3) + 
+                                        base.mark_line(color=color, strokeWidth=3))
+                            else:
+                                chart = base.mark_line(color=color, strokeWidth=3)
+                            # Point markers only while they are readable
+                            if len(df_chart) <= 100:
+                                chart = chart + base.mark_point(filled=True, color=color, size=60, stroke='white', strokeWidth=2)
                         
                         final_chart = chart.properties(
                             title=title,
@@ -780,22 +1008,50 @@ if st.session_state.admin_auth:
                             anchor='middle'
                         )
                         
-                        st.altair_chart(final_chart, use_container_width=True)
+                        with span("render", section="altair_chart"):
+                            st.altair_chart(final_chart, use_container_width=True)
                         
                         c1, c2, c3, c4 = st.columns(4)
-                        c1.metric("📈 High", f"Rs {df_chart[y_col].max():,.0f}")
-                        c2.metric("📉 Low", f"Rs {df_chart[y_col].min():,.0f}")
-                        c3.metric("📊 Avg", f"Rs {df_chart[y_col].mean():,.0f}")
-                        c4.metric("📝 Count", len(df_chart))
+                        c1.metric("📈 High", f"Rs {chart_stats['high']:,.0f}")
+                        c2.metric("📉 Low", f"Rs {chart_stats['low']:,.0f}")
+                        c3.metric("📊 Avg", f"Rs {chart_stats['avg']:,.0f}")
+                        c4.metric("📝 Count", chart_stats["count"])
                 else:
                     st.info("📊 Need 2+ records.")
         except Exception as e:
             st.error(f"Chart error: {str(e)}")
 
+        # Every quote the poller fetched today (see tick_recorder.py), not only published rates
+        with st.expander("⏱️ Today's Live Quotes", expanded=False):
+            try:
+                from chart_data import downsample, tick_frame
+                day_start = datetime.now(pytz.timezone("Asia/Karachi")).replace(hour=0, minute=0, second=0, microsecond=0)
+                ticks = tick_frame(get_tick_recorder().load(day_start.timestamp()))
+                metal = chart_metal.lower()
+                line = downsample(ticks[['date', f'{metal}_ounce']], f'{metal}_ounce')
+                if len(line) > 1:
+                    tick_chart = alt.Chart(line).mark_line(color='#d4af37' if metal == "gold" else '#71797E').encode(
+                        x=alt.X('date:T', title='Time', axis=alt.Axis(format='%H:%M')),
+                        y=alt.Y(f'{metal}_ounce:Q', title='USD / oz', scale=alt.Scale(zero=False)),
+                        tooltip=[alt.Tooltip('date:T', title='Time', format='%H:%M:%S'),
+                                 alt.Tooltip(f'{metal}_ounce:Q', title='USD / oz', format='$,.2f')])
+                    st.altair_chart(tick_chart.properties(height=250), use_container_width=True)
+                    sources = ticks[f'src_{metal}'].value_counts().rename_axis("source").reset_index(name="quotes")
+                    st.caption(f"{len(ticks)} quotes fetched since midnight (PKT); source audit:")
+                    st.dataframe(sources, hide_index=True, use_container_width=True)
+                else:
+                    st.info("📊 No live quotes recorded today yet.")
+            except Exception as e:
+                st.error(f"Tick error: {str(e)}")
+    mark("admin_charts")
+
 # 14. FOOTER
-st.markdown("""
+st.markdown(f"""
 <div class="footer">
-<strong>Islam Jewellery</strong> website shows approximate gold prices.<br>
+<strong>{html.escape(shop.name)}</strong> website shows approximate gold prices.<br>
 ⚠️ <strong>Disclaimer:</strong> Verify with shop before buying.
 </div>
 """, unsafe_allow_html=True)
+
+mark("footer")
+observe("rerun", time.perf_counter() - _T0, page="admin" if st.session_state.admin_auth else "public")
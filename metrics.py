@@ -0,0 +1,135 @@
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# TIMING SPANS + HISTOGRAMS
+# span("storage", backend="github", call="load_history") times a block and files
+# the duration under (operation, labels). Every series keeps a Prometheus-style
+# cumulative histogram (for /metrics) plus a small ring of recent samples for the
+# p50/p95 shown in the admin Latency panel. Process-wide, thread-safe, no
+# dependencies: the poller thread, the API server and every rerun feed the same
+# registry.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RECENT = 512              # samples kept per series for percentiles
+PREFIX = "swissgold"
+
+
+class _Series:
+    __slots__ = ("counts", "total", "count", "errors", "recent")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+        self.errors = 0
+        self.recent = deque(maxlen=RECENT)
+
+
+_series = {}
+_lock = threading.Lock()
+
+
+def observe(op, seconds, error=False, **labels):
+    key = (op, tuple(sorted((k, str(v)) for k, v in labels.items())))
+    with _lock:
+        s = _series.get(key)
+        if s is None:
+            s = _series[key] = _Series()
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                s.counts[i] += 1
+                break
+        s.total += seconds
+        s.count += 1
+        s.errors += bool(error)
+        s.recent.append(seconds)
+
+
+@contextmanager
+def span(op, **labels):
+    """Time the block; an exception is recorded as an error and re-raised."""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        observe(op, time.perf_counter() - start, error=error, **labels)
+
+
+def timed(op, **labels):
+    """Decorator form of span()."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(op, **labels):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def _quantile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def summary():
+    """One row per series for the Latency panel, slowest p95 first."""
+    with _lock:
+        items = [(op, labels, s.count, s.errors, sorted(s.recent)) for (op, labels), s in _series.items()]
+    rows = [{
+        "operation": op,
+        "labels": ", ".join(f"{k}={v}" for k, v in labels),
+        "calls": count,
+        "errors": errors,
+        "p50 ms": round(1000 * _quantile(recent, 0.5), 1),
+        "p95 ms": round(1000 * _quantile(recent, 0.95), 1),
+        "max ms": round(1000 * recent[-1], 1) if recent else 0.0,
+    } for op, labels, count, errors, recent in items]
+    return sorted(rows, key=lambda r: r["p95 ms"], reverse=True)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render_prometheus():
+    """Text exposition format: one histogram family per operation, plus an error counter."""
+    with _lock:
+        snapshot = sorted(((op, labels, list(s.counts), s.total, s.count, s.errors)
+                           for (op, labels), s in _series.items()))
+    lines = []
+    seen = set()
+    for op, labels, counts, total, count, errors in snapshot:
+        name = f"{PREFIX}_{op}_seconds"
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# TYPE {name} histogram")
+        running = 0
+        for bound, n in zip(BUCKETS, counts):
+            running += n
+            lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', repr(bound))])} {running}")
+        lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {count}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {total:.6f}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+    errors_name = f"{PREFIX}_errors_total"
+    lines.append(f"# TYPE {errors_name} counter")
+    for op, labels, _, _, _, errors in snapshot:
+        lines.append(f"{errors_name}{_fmt_labels([('operation', op)] + list(labels))} {errors}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _series.clear()
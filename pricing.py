@@ -0,0 +1,70 @@
+import numpy as np
+
+# PRICING ENGINE
+# The one place the ounce -> tola formula lives. Everything is NumPy and
+# broadcasts, so the same call prices the live snapshot (scalars) or a whole
+# history column (arrays) in one vector operation.
+#
+# Premium is the shop's PKR markup per 24K tola; for other weights and karats it
+# scales with the gold content, the same way the base price does.
+
+OUNCE_GRAMS = 31.1035
+TOLA_GRAMS = 11.66
+UNITS = {
+    "tola": TOLA_GRAMS,
+    "10 gram": 10.0,
+    "gram": 1.0,
+    "masha": TOLA_GRAMS / 12,
+    "ratti": TOLA_GRAMS / 96,
+}
+KARATS = {"24K": 24, "22K": 22, "21K": 21, "18K": 18}
+CURRENCIES = ("PKR", "AED")
+PREMIUM = ("without", "with")
+
+_GRAMS = np.array(list(UNITS.values()))
+_PURITY = np.array(list(KARATS.values())) / 24.0
+
+
+def _scalar(out):
+    return float(out) if np.ndim(out) == 0 else out
+
+
+def tola_rate(ounce_usd, fx_rate, premium=0.0):
+    """24K price per tola in the fx_rate currency (+ premium). 0 where a quote is missing."""
+    ounce_usd = np.asarray(ounce_usd, dtype=np.float64)
+    fx_rate = np.asarray(fx_rate, dtype=np.float64)
+    base = (ounce_usd / OUNCE_GRAMS) * TOLA_GRAMS * fx_rate
+    out = np.where((ounce_usd > 0) & (fx_rate > 0), base + np.asarray(premium, dtype=np.float64), 0.0)
+    return _scalar(out)
+
+
+def price_matrix(ounce_usd, usd_pkr, aed_per_usd, premium=0.0):
+    """Full rate card.
+
+    Inputs broadcast against each other (scalars for one snapshot, arrays for
+    history). The result has shape input_shape + (2, 2, 4, 5), indexed as
+    [..., CURRENCIES, PREMIUM, KARATS, UNITS]. AED prices get the premium
+    converted at the PKR/AED cross rate.
+    """
+    ounce_usd, usd_pkr, aed_per_usd, premium = np.broadcast_arrays(
+        *(np.asarray(v, dtype=np.float64) for v in (ounce_usd, usd_pkr, aed_per_usd, premium)))
+    valid = (ounce_usd > 0) & (usd_pkr > 0)
+    per_gram_usd = np.where(valid, ounce_usd / OUNCE_GRAMS, 0.0)
+    premium_gram_pkr = np.where(valid, premium / TOLA_GRAMS, 0.0)
+    pkr_to_aed = np.divide(aed_per_usd, usd_pkr, out=np.zeros_like(usd_pkr), where=usd_pkr > 0)
+
+    # per 24K gram: [currency, premium flag]
+    pkr = per_gram_usd * usd_pkr
+    aed = per_gram_usd * aed_per_usd
+    gram = np.stack([
+        np.stack([pkr, pkr + premium_gram_pkr], axis=-1),
+        np.stack([aed, aed + premium_gram_pkr * pkr_to_aed], axis=-1),
+    ], axis=-2)
+    return gram[..., None, None] * _PURITY[:, None] * _GRAMS
+
+
+def rate_card(ounce_usd, usd_pkr, aed_per_usd, premium=0.0, currency="PKR", with_premium=True):
+    """One snapshot as {karat: {unit: price}} for tables and exports."""
+    m = price_matrix(ounce_usd, usd_pkr, aed_per_usd, premium)
+    m = m[CURRENCIES.index(currency), int(with_premium)]
+    return {k: dict(zip(UNITS, map(float, m[i]))) for i, k in enumerate(KARATS)}
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import observe
+
+# BACKGROUND PUBLISH QUEUE
+# PUBLISH RATE only queues the new premiums and returns; one worker thread per
+# process does the storage write. Publishes that arrive within DEBOUNCE seconds
+# of each other are merged (the latest premiums win) into a single
+# store.publish(), so a burst of nudges and re-publishes becomes one commit.
+# MAX_DELAY caps how long a steady stream of clicks can hold a write back.
+# Each click gets a ticket; sessions poll status(ticket) to show progress.
+
+DEBOUNCE = 4              # seconds of quiet before a queued publish is written
+MAX_DELAY = 20            # ...but never later than this after the first click
+KEEP_TICKETS = 100        # finished tickets remembered for status()
+
+
+class PublishQueue:
+    def __init__(self, store, fetch_quotes, make_record, debounce=DEBOUNCE, max_delay=MAX_DELAY):
+        # fetch_quotes() -> fresh quote snapshot; make_record(settings, quotes) -> history record
+        self.store = store
+        self.fetch_quotes = fetch_quotes
+        self.make_record = make_record
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.stats = {"submitted": 0, "written": 0, "failed": 0}
+        self._pending = None
+        self._tickets = OrderedDict()
+        self._next_ticket = 0
+        self._listeners = []
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="publish-queue", daemon=True)
+
+    def subscribe(self, fn):
+        """Call fn(settings) on the worker thread after every successful write."""
+        self._listeners.append(fn)
+        return self
+
+    def start(self):
+        if not self._thread.is_alive():
+            self._thread.start()
+        return self
+
+    def submit(self, premiums):
+        """Queue new premiums; returns a ticket for status()."""
+        now = time.monotonic()
+        with self._cond:
+            self._next_ticket += 1
+            ticket = self._next_ticket
+            if self._pending is None:
+                self._pending = {"premiums": {}, "tickets": [], "first": now}
+            self._pending["premiums"].update(premiums)
+            self._pending["tickets"].append(ticket)
+            self._pending["last"] = now
+            self._tickets[ticket] = {"state": "queued", "merged": len(self._pending["tickets"]), "error": None}
+            while len(self._tickets) > KEEP_TICKETS:
+                self._tickets.popitem(last=False)
+            self.stats["submitted"] += 1
+            self._cond.notify_all()
+        return ticket
+
+    def _due(self, pending):
+        return min(pending["last"] + self.debounce, pending["first"] + self.max_delay)
+
+    def status(self, ticket):
+        """{"state": queued|publishing|done|failed, "merged", "error", "eta"} or None if unknown."""
+        with self._cond:
+            info = self._tickets.get(ticket)
+            if info is None:
+                return None
+            info = dict(info)
+            if info["state"] == "queued" and self._pending and ticket in self._pending["tickets"]:
+                info["merged"] = len(self._pending["tickets"])
+                info["eta"] = max(0.0, self._due(self._pending) - time.monotonic())
+            return info
+
+    def _mark(self, tickets, **fields):
+        for ticket in tickets:
+            if ticket in self._tickets:
+                self._tickets[ticket].update(fields)
+
+    def _run(self):
+        while True:
+            self._write(self._next_batch())
+
+    def _next_batch(self):
+        """Block until the pending batch is due, then take it."""
+        with self._cond:
+            while self._pending is None or time.monotonic() < self._due(self._pending):
+                self._cond.wait(None if self._pending is None
+                                else self._due(self._pending) - time.monotonic())
+            batch, self._pending = self._pending, None
+            self._mark(batch["tickets"], state="publishing", merged=len(batch["tickets"]))
+            return batch
+
+    def _write(self, batch):
+        settings = None
+        try:
+            # Quotes are taken at write time, so the history record matches what customers see
+            quotes = self.fetch_quotes()
+            if not quotes.get("gold") or not quotes.get("usd"):
+                raise RuntimeError("Cannot publish: APIs are offline.")
+            # Last-good fallbacks keep the page up, but a days-old quote must not be
+            # written to history under today's date
+            cached = [inst for inst in ("gold", "usd") if inst in (quotes.get("stale") or {})]
+            if cached:
+                raise RuntimeError(f"Cannot publish: no live {' / '.join(cached).upper()} quote (cached only).")
+            settings = dict(batch["premiums"], last_update=int(time.time()))
+            self.store.publish(settings, self.make_record(settings, quotes))
+            error = None
+        except Exception as e:
+            error = str(e)
+        observe("publish_queue", time.monotonic() - batch["first"], error=error is not None)
+        with self._cond:
+            self.stats["failed" if error else "written"] += 1
+            self._mark(batch["tickets"], state="failed" if error else "done", error=error,
+                       last_update=settings and settings["last_update"])
+        if error is None:
+            for fn in self._listeners:
+                try:
+                    fn(settings)
+                except Exception:
+                    pass
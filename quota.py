@@ -0,0 +1,147 @@
+import threading
+from datetime import datetime, timedelta
+
+# QUOTA SCHEDULER
+# Metered providers (TwelveData, ExchangeRate-API) get a daily credit budget,
+# spent through a token bucket whose refill rate follows Karachi market hours:
+# ACTIVE_SHARE of the day's credits is spread over the active hours (the same
+# window as active_mode), the rest over the night. A source whose bucket is
+# empty is left out of the race until the next credit arrives, so the free
+# tiers last the whole day and the credits go where viewers are.
+#
+# The poller itself follows the same clock: every ACTIVE_INTERVAL seconds in
+# active hours, NIGHT_INTERVAL at night (Yahoo is unmetered, so that is what
+# keeps the night page fresh).
+
+ACTIVE_HOURS = range(7, 24)       # 07:00-23:59 Karachi
+ACTIVE_SHARE = 0.85               # of each daily budget spent in active hours
+BURST = 3                         # credits a bucket can save up
+ACTIVE_INTERVAL = 15              # poller cadence, seconds
+NIGHT_INTERVAL = 300
+DAILY_BUDGETS = {
+    "TwelveData": 800,            # free plan: 800 credits/day, one credit per symbol
+    "ExchangeRate-API": 50,       # free plan: 1,500 requests/month
+}
+
+
+def is_active(dt):
+    return dt.hour in ACTIVE_HOURS
+
+
+def allowance(budget, start, end):
+    """Credits the schedule releases between two aware datetimes."""
+    total = 0.0
+    t = start
+    while t < end:
+        nxt = min(end, t.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1))
+        if t.hour in ACTIVE_HOURS:
+            share = ACTIVE_SHARE / len(ACTIVE_HOURS)
+        else:
+            share = (1 - ACTIVE_SHARE) / (24 - len(ACTIVE_HOURS))
+        total += budget * share * (nxt - t).total_seconds() / 3600
+        t = nxt
+    return total
+
+
+class _Bucket:
+    def __init__(self, budget, now):
+        self.budget = budget
+        self.tokens = 1.0         # one call right after boot, then whatever the schedule releases
+        self.last = now
+        self.day = now.date()
+        self.used = 0
+        self.day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        self.since = now          # start of the accounting window: boot, then each midnight
+
+    def refill(self, now):
+        if now.date() != self.day:
+            self.day, self.used = now.date(), 0
+            self.day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            self.since = self.day_start
+        self.tokens = min(BURST, self.tokens + allowance(self.budget, self.last, now))
+        self.last = now
+
+
+class QuotaScheduler:
+    def __init__(self, tz, budgets=None):
+        self.tz = tz
+        self._budgets = dict(DAILY_BUDGETS if budgets is None else budgets)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _now(self):
+        return datetime.now(self.tz)
+
+    def _bucket(self, provider, now):
+        budget = self._budgets.get(provider)
+        if not budget:
+            return None   # unmetered
+        bucket = self._buckets.get(provider)
+        if bucket is None or bucket.budget != budget:
+            bucket = self._buckets[provider] = _Bucket(budget, now)
+        bucket.refill(now)
+        return bucket
+
+    def set_budget(self, provider, credits_per_day):
+        with self._lock:
+            self._budgets[provider] = credits_per_day
+
+    def available(self, provider, cost=1):
+        with self._lock:
+            bucket = self._bucket(provider, self._now())
+            return bucket is None or bucket.tokens >= cost
+
+    def spend(self, provider, cost=1):
+        # Called when the request really goes out; hedged calls may dip the bucket below zero
+        with self._lock:
+            bucket = self._bucket(provider, self._now())
+            if bucket is not None:
+                bucket.tokens -= cost
+                bucket.used += cost
+
+    def wait(self, provider, cost=1):
+        """Seconds until the provider can be called again (0 when it can now)."""
+        with self._lock:
+            now = self._now()
+            bucket = self._bucket(provider, now)
+            if bucket is None or bucket.tokens >= cost:
+                return 0.0
+            # Step through the schedule a minute at a time; at worst a night-time gap
+            t, needed = now, cost - bucket.tokens
+            while needed > 0 and t < now + timedelta(days=1):
+                step = t + timedelta(minutes=1)
+                needed -= allowance(bucket.budget, t, step)
+                t = step
+            return (t - now).total_seconds()
+
+    def paced(self):
+        """(provider, seconds to next credit) for every metered provider that is out of credits."""
+        waits = [(provider, self.wait(provider)) for provider in list(self._budgets)]
+        return [(provider, w) for provider, w in waits if w > 0]
+
+    def poll_interval(self):
+        return ACTIVE_INTERVAL if is_active(self._now()) else NIGHT_INTERVAL
+
+    def report(self):
+        """Per metered provider: budget, used today and projected end-of-day use."""
+        rows = []
+        with self._lock:
+            now = self._now()
+            for provider, budget in self._budgets.items():
+                bucket = self._bucket(provider, now)
+                if bucket is None:
+                    continue
+                released = allowance(budget, bucket.since, now)
+                left = allowance(budget, now, bucket.day_start + timedelta(days=1))
+                # Extrapolate at today's rate of use relative to what the schedule released so far
+                utilisation = min(1.0, bucket.used / released) if released else 0.0
+                projected = bucket.used + left * utilisation
+                rows.append({
+                    "provider": provider,
+                    "budget/day": budget,
+                    "used today": bucket.used,
+                    "projected": round(projected),
+                    "projected %": round(100 * projected / budget),
+                    "credits now": round(bucket.tokens, 2),
+                })
+        return rows
@@ -0,0 +1,271 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+
+import pytz
+
+import http_client
+from metrics import timed
+from quota import QuotaScheduler, is_active
+from source_health import SourceHealth
+
+# QUOTE ENGINE
+# Every instrument has a chain of sources (primary first). All three chains start
+# at once; if the primary has not answered within HEDGE_AFTER seconds (or fails),
+# the backup is fired as well and whichever succeeds first wins. A refresh
+# therefore costs about one winning request instead of the sum of all of them.
+# Sources that live on the same upstream are batched: one Yahoo spark request
+# covers all three symbols and TwelveData is asked for XAU and XAG in one call.
+# Chains are ordered by source health (see source_health.py): a source with an
+# open circuit is skipped and the fastest healthy one goes first. Metered sources
+# are also skipped while their daily credit budget is paced out (see quota.py).
+
+TZ_KHI = pytz.timezone("Asia/Karachi")
+REQUEST_TIMEOUT = 5      # per upstream call (one attempt, see http_client.NO_RETRY); below CHAIN_DEADLINE
+HEDGE_AFTER = 1.5        # seconds before the backup source is also fired
+CHAIN_DEADLINE = 6       # hard cap for one chain
+YAHOO_SYMBOLS = ("XAUUSD=X", "XAGUSD=X", "PKR=X")
+
+# Shared by all reruns; threads stuck on a slow upstream are bounded by the timeouts above.
+# Races only wait on sources, so they get their own pool and can never starve the fetchers.
+_POOL = ThreadPoolExecutor(max_workers=12, thread_name_prefix="quote")
+_RACE_POOL = ThreadPoolExecutor(max_workers=6, thread_name_prefix="quote-race")
+HEALTH = SourceHealth(failure_penalty=REQUEST_TIMEOUT)
+QUOTA = QuotaScheduler(TZ_KHI)
+
+
+class SourceLimit(Exception):
+    """Upstream answered but refused (quota / plan limit)."""
+
+# --- SOURCES ---
+@timed("upstream", source="TwelveData")
+def _twelvedata_prices(symbols, api_key):
+    # Multi-symbol price endpoint: one round trip for every symbol requested
+    res = http_client.get("twelvedata", f"/price?symbol={','.join(symbols)}&apikey={api_key}",
+                          timeout=REQUEST_TIMEOUT)
+    res.raise_for_status()
+    data = res.json()
+    if data.get('status') == 'error':
+        raise SourceLimit(data.get('message'))
+    if len(symbols) == 1:
+        data = {symbols[0]: data}
+    prices = {}
+    for symbol in symbols:
+        item = data.get(symbol) or {}
+        prices[symbol] = float(item['price']) if 'price' in item else SourceLimit(item.get('message'))
+    return prices
+
+
+def _last_close(item):
+    # Spark answers either {"close": [...]} per symbol or a chart-style response
+    if "response" in item:
+        item = (item.get("response") or [{}])[0]
+        price = (item.get("meta") or {}).get("regularMarketPrice")
+        if price:
+            return float(price)
+        item = {"close": ((item.get("indicators") or {}).get("quote") or [{}])[0].get("close")}
+    closes = [c for c in item.get("close") or () if c]
+    return float(closes[-1]) if closes else None
+
+
+@timed("upstream", source="Yahoo Finance")
+def _yahoo_closes(tickers=YAHOO_SYMBOLS):
+    # Spark endpoint: one round trip for every symbol, only the last close of each is kept
+    res = http_client.get("yahoo", "/v8/finance/spark",
+                          params={"symbols": ",".join(tickers), "range": "1d", "interval": "1d"},
+                          timeout=REQUEST_TIMEOUT)
+    res.raise_for_status()
+    data = res.json()
+    if "spark" in data:
+        data = {item.get("symbol"): item for item in (data["spark"].get("result") or [])}
+    closes = {t: _last_close(data[t]) for t in tickers if isinstance(data.get(t), dict)}
+    closes = {t: v for t, v in closes.items() if v and v > 0}
+    if not closes:
+        raise ValueError("no data from Yahoo")
+    return closes
+
+
+@timed("upstream", source="ExchangeRate-API")
+def _exchangerate_usd(api_key):
+    res = http_client.get("exchangerate", f"/v6/{api_key}/latest/USD", timeout=REQUEST_TIMEOUT)
+    res.raise_for_status()
+    rates = res.json().get('conversion_rates', {})
+    usd = float(rates.get('PKR', 0))
+    if usd <= 0:
+        raise ValueError("PKR missing in response")
+    return {"usd": usd, "aed": float(rates.get('AED', 0))}
+
+
+class Batch:
+    """One upstream call shared by several chains within a single refresh.
+
+    The call goes out the first time any chain picks from it; every pick gets its
+    own future that resolves to that chain's payload.
+    """
+
+    def __init__(self, fn, pool):
+        self._fn = fn
+        self._pool = pool
+        self._future = None
+        self._lock = threading.Lock()
+
+    def pick(self, key, shape):
+        with self._lock:
+            if self._future is None:
+                self._future = self._pool.submit(self._fn)
+        picked = Future()
+
+        def resolve(fut):
+            try:
+                value = fut.result().get(key)
+                if value is None:
+                    raise ValueError(f"no data for {key}")
+                if isinstance(value, Exception):
+                    raise value
+                picked.set_result(shape(value))
+            except Exception as e:
+                picked.set_exception(e)
+
+        self._future.add_done_callback(resolve)
+        return picked
+
+
+def _price(value):
+    return {"price": value}
+
+
+def build_chains(keys, pool=None, health=None, quota=None):
+    # (source name, log label, starter) in priority order; a starter returns a Future.
+    # Starters only run once a race launches them, so the batches below can be set up last.
+    pool = pool or _POOL
+    td_key = keys.get("TWELVE_DATA_KEY")
+    curr_key = keys.get("CURR_KEY")
+
+    def metered(provider, cost, fn, *args):
+        # Credits are charged when the request really goes out
+        if quota:
+            quota.spend(provider, cost)
+        return fn(*args)
+
+    def td_pick(symbol):
+        if symbol in td_symbols:
+            return td.pick(symbol, _price)
+        return Batch(lambda: metered("TwelveData", 1, _twelvedata_prices, [symbol], td_key), pool).pick(symbol, _price)
+
+    gold, silver, usd = [], [], []
+
+    # 1. GOLD (Priority: TwelveData -> Yahoo)
+    if td_key:
+        gold.append(("TwelveData", "TD Gold", lambda: td_pick("XAU/USD")))
+    gold.append(("Yahoo Finance", "Yahoo Gold", lambda: yahoo.pick("XAUUSD=X", _price)))
+
+    # 2. SILVER (Priority: Yahoo -> TwelveData)
+    silver.append(("Yahoo Finance", "Yahoo Silver", lambda: yahoo.pick("XAGUSD=X", _price)))
+    if td_key:
+        silver.append(("TwelveData", "TD Silver", lambda: td_pick("XAG/USD")))
+
+    # 3. CURRENCY (Priority: Yahoo -> ExchangeRateAPI)
+    usd.append(("Yahoo Finance", "Yahoo USD", lambda: yahoo.pick("PKR=X", lambda v: {"usd": v, "aed": 3.67})))
+    if curr_key:
+        usd.append(("ExchangeRate-API", "Currency Backup",
+                    lambda: pool.submit(metered, "ExchangeRate-API", 1, _exchangerate_usd, curr_key)))
+
+    chains = {"gold": gold, "silver": silver, "usd": usd}
+    if quota:
+        chains = {name: [c for c in chain if quota.available(c[0])] for name, chain in chains.items()}
+    if health:
+        chains = {name: health.order(chain) for name, chain in chains.items()}
+    # Silver goes to TwelveData first -> ask for XAG in the same call as XAU
+    td_symbols = ("XAU/USD",)
+    if chains["silver"] and chains["silver"][0][0] == "TwelveData":
+        td_symbols = ("XAU/USD", "XAG/USD")
+    yahoo = Batch(_yahoo_closes, pool)
+    td = Batch(lambda: metered("TwelveData", len(td_symbols), _twelvedata_prices, list(td_symbols), td_key), pool)
+    return chains
+
+
+# --- HEDGED RACE ---
+def _log_failure(logs, label, exc):
+    if isinstance(exc, SourceLimit):
+        logs.append(f"{label} Limit: {exc}")
+    else:
+        logs.append(f"{label} Error: {str(exc)}")
+
+
+def race_chain(chain, logs, hedge_after=HEDGE_AFTER, deadline=CHAIN_DEADLINE, health=None):
+    """Run one source chain with hedging; returns (source name, payload) or ("OFFLINE", None)."""
+    started = time.monotonic()
+    queue = list(chain)
+    pending = {}
+
+    def launch_next():
+        name, label, start = queue.pop(0)
+        fut = start()
+        if health:
+            # Recorded when the call really ends, so slow losers of a race still count
+            launched = time.monotonic()
+
+            def report(f):
+                exc = f.exception()
+                health.record(label, name, exc is None, time.monotonic() - launched,
+                              error=exc, quota=isinstance(exc, SourceLimit))
+            fut.add_done_callback(report)
+        pending[fut] = (name, label)
+
+    if queue:
+        launch_next()
+    while pending:
+        remaining = deadline - (time.monotonic() - started)
+        if remaining <= 0:
+            for name, label in pending.values():
+                logs.append(f"{label} Error: no answer in {deadline}s")
+            break
+        done, _ = wait(pending, timeout=min(hedge_after, remaining) if queue else remaining,
+                       return_when=FIRST_COMPLETED)
+        for fut in done:
+            name, label = pending.pop(fut)
+            try:
+                return name, fut.result()
+            except Exception as e:
+                _log_failure(logs, label, e)
+        # Either the primary is slow (hedge) or it failed: bring in the next source
+        if queue:
+            launch_next()
+    return "OFFLINE", None
+
+
+@timed("quote_refresh")
+def fetch_live_rates(keys, pool=_POOL, health=HEALTH, quota=QUOTA):
+    """Fetch gold, silver and USD/PKR concurrently. Keeps the get_live_rates() output contract."""
+    now_khi = datetime.now(TZ_KHI)
+    is_active_hours = is_active(now_khi)
+    chains = build_chains(keys, pool, health, quota)
+    circuit_logs = [f"{label} Circuit Open: skipped for {left:.0f}s"
+                    for label, left in (health.open_circuits() if health else [])]
+    circuit_logs += [f"{provider} Paced: next credit in {left:.0f}s"
+                     for provider, left in (quota.paced() if quota else [])]
+
+    # Each chain runs its own race on the pool so all three go out at the same time
+    chain_logs = {name: [] for name in chains}
+    races = {name: _RACE_POOL.submit(race_chain, chain, chain_logs[name], health=health)
+             for name, chain in chains.items()}
+    results = {name: fut.result() for name, fut in races.items()}
+
+    src_gold, gold = results["gold"]
+    src_silver, silver = results["silver"]
+    src_usd, usd = results["usd"]
+    debug_logs = circuit_logs + chain_logs["gold"] + chain_logs["silver"] + chain_logs["usd"]
+
+    done_khi = datetime.now(TZ_KHI)
+    return {
+        "gold": gold["price"] if gold else 0.0,
+        "silver": silver["price"] if silver else 0.0,
+        "usd": usd["usd"] if usd else 0.0,
+        "aed": usd["aed"] if usd else 0.0,
+        "src_gold": src_gold, "src_silver": src_silver, "src_usd": src_usd,
+        "debug": debug_logs,
+        "time": done_khi.strftime("%I:%M:%S %p"),
+        "full_date": done_khi.strftime("%Y-%m-%d %H:%M:%S"),
+        "active_mode": is_active_hours
+    }
@@ -0,0 +1,104 @@
+import threading
+import time
+from datetime import datetime
+from types import MappingProxyType
+
+from quota import is_active
+from quote_engine import TZ_KHI, CHAIN_DEADLINE
+
+# BACKGROUND QUOTE POLLER
+# One per process. A daemon thread refreshes the quotes on its own schedule and
+# swaps in a new read-only snapshot; page reruns only read the current snapshot,
+# so render time never waits on Yahoo/TwelveData and upstream calls stay flat
+# however many sessions are open.
+
+POLL_INTERVAL = 15       # seconds between scheduled refreshes
+MIN_REFRESH_GAP = 5      # manual refreshes younger than this reuse the snapshot
+
+
+def offline_snapshot(reason):
+    now_khi = datetime.now(TZ_KHI)
+    return {"gold": 0, "silver": 0, "usd": 0, "aed": 0,
+            "src_gold": "ERR", "src_silver": "ERR", "src_usd": "ERR",
+            "debug": [reason], "time": now_khi.strftime("%I:%M:%S %p"),
+            "full_date": "Error", "active_mode": is_active(now_khi)}
+
+
+def freeze(data, version):
+    snap = dict(data)
+    snap["debug"] = tuple(snap.get("debug", ()))
+    snap["version"] = version
+    snap.setdefault("fetched_at", time.time())
+    return MappingProxyType(snap)
+
+
+class QuotePoller:
+    def __init__(self, fetch, interval=POLL_INTERVAL, initial=None):
+        # interval: seconds, or a callable returning them (e.g. a market-hours schedule).
+        # initial: snapshot served until the first fetch lands (e.g. last known good quotes).
+        self._fetch = fetch
+        self.interval = interval
+        self._snapshot = freeze(initial, 0) if initial else None
+        self._version = 0
+        self._fetching = False
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._listeners = []
+        self._thread = threading.Thread(target=self._run, name="quote-poller", daemon=True)
+
+    def subscribe(self, fn):
+        """Call fn(snapshot) on the poller thread after every fetch."""
+        self._listeners.append(fn)
+        return self
+
+    def start(self):
+        if not self._thread.is_alive():
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            with self._cond:
+                self._fetching = True
+            try:
+                data = self._fetch()
+            except Exception as e:
+                data = offline_snapshot(f"Crash: {e}")
+            with self._cond:
+                self._version += 1
+                self._snapshot = freeze(data, self._version)
+                self._fetching = False
+                self._cond.notify_all()
+                snap = self._snapshot
+            for fn in self._listeners:
+                try:
+                    fn(snap)
+                except Exception:
+                    pass
+            self._wake.wait(self.interval() if callable(self.interval) else self.interval)
+
+    def _wait_for(self, version, timeout):
+        with self._cond:
+            self._cond.wait_for(lambda: self._version >= version, timeout)
+            return self._snapshot
+
+    def snapshot(self, timeout=CHAIN_DEADLINE + 2):
+        """Latest quotes; only blocks on the very first fetch after boot, and only without an initial snapshot."""
+        snap = self._snapshot
+        if snap is not None:
+            return snap
+        snap = self._wait_for(1, timeout)
+        return snap if snap is not None else freeze(offline_snapshot("Poller warming up"), 0)
+
+    def refresh_now(self, max_age=MIN_REFRESH_GAP, timeout=CHAIN_DEADLINE + 2):
+        """Ask for a fetch and wait for it. Concurrent callers share the same fetch."""
+        snap = self._snapshot
+        if snap is not None and time.time() - snap["fetched_at"] < max_age:
+            return snap
+        with self._cond:
+            # A fetch already in flight may have started before this call
+            target = self._version + (2 if self._fetching else 1)
+        self._wake.set()
+        snap = self._wait_for(target, timeout)
+        return snap if snap is not None else self.snapshot()
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import queue
+import threading
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import metrics
+from pricing import tola_rate
+
+# JSON PRICE API
+# GET /api/rates returns the same computed snapshot the page shows (premiums
+# included). quoted_at holds each instrument's quote time (epoch seconds) and
+# cached lists the instruments served from an older last good quote. The body
+# and its ETag are rebuilt only when the quote or the settings change, so a
+# request is a dictionary lookup plus a socket write; clients that send
+# If-None-Match get an empty 304.
+#
+# GET /api/stream is a Server-Sent Events channel: one "snapshot" event on
+# connect, then a small "delta" event (only the fields that moved) whenever a
+# price, premium or source actually changes. Nothing is sent between changes
+# except a keep-alive comment.
+#
+# In multi-shop mode (see shops.py) ?shop=<slug> picks that shop's feed for
+# /api/rates and /api/stream; without it the default shop is served.
+#
+# api_app is a plain WSGI callable: it runs on a side port next to Streamlit
+# (API_PORT) or under any WSGI server.
+#
+# GET /metrics (Prometheus text exposition of the timing histograms, see
+# metrics.py) is a separate app, metrics_app, so it is never exposed on the
+# public API port; main.py serves it on localhost only (METRICS_PORT).
+
+CACHE_CONTROL = "public, max-age=5"
+KEEPALIVE = 15            # seconds between SSE keep-alive comments
+CLIENT_QUEUE = 50         # undelivered events per stream before the client is dropped
+
+
+def build_payload(snap, settings):
+    gold = float(snap.get("gold", 0))
+    silver = float(snap.get("silver", 0))
+    usd = float(snap.get("usd", 0))
+    aed = float(snap.get("aed", 0))
+    gold_premium = float(settings.get("gold_premium", 0))
+    silver_premium = float(settings.get("silver_premium", 0))
+    gold_tola = tola_rate(gold, usd, gold_premium)
+    # Instruments served from the last good quote (see last_good.py) keep their own quote time
+    stale = snap.get("stale") or {}
+    fetched_at = snap.get("fetched_at")
+    quoted_at = {inst: int(stale.get(inst, fetched_at)) if stale.get(inst, fetched_at) else None
+                 for inst in ("gold", "silver", "usd")}
+    return {
+        "as_of": snap.get("full_date"),
+        "quoted_at": quoted_at,
+        "cached": sorted(stale),
+        "active_mode": bool(snap.get("active_mode", True)),
+        "gold": {
+            "tola_pkr": round(gold_tola),
+            "dubai_tola_aed": round(tola_rate(gold, aed)) if gold_tola > 0 else 0,
+            "ounce_usd": gold,
+            "premium_pkr": gold_premium,
+            "source": snap.get("src_gold"),
+        },
+        "silver": {
+            "tola_pkr": round(tola_rate(silver, usd, silver_premium)),
+            "ounce_usd": silver,
+            "premium_pkr": silver_premium,
+            "source": snap.get("src_silver"),
+        },
+        "usd_pkr": usd,
+        "aed_per_usd": aed,
+        "usd_source": snap.get("src_usd"),
+        "last_update": settings.get("last_update", 0),
+    }
+
+
+def diff(old, new):
+    """Fields of new that differ from old (nested dicts are diffed per key)."""
+    out = {}
+    for key, value in new.items():
+        if isinstance(value, dict):
+            sub = diff(old.get(key) or {}, value)
+            if sub:
+                out[key] = sub
+        elif old.get(key) != value:
+            out[key] = value
+    return out
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+class RateFeed:
+    """Current payload + ETag, rebuilt from the latest quote snapshot and settings."""
+
+    def __init__(self, load_settings):
+        self._load_settings = load_settings
+        self._snap = {}
+        self._lock = threading.Lock()
+        self.payload = {}
+        self.body = b"{}"
+        self.etag = '"empty"'
+        self.version = 0
+        self._clients = set()
+        self._listeners = []
+
+    def subscribe(self, fn):
+        """Call fn(payload) whenever the payload changes (on the thread that called update)."""
+        self._listeners.append(fn)
+        return self
+
+    def update(self, snap=None):
+        if self._update(snap):
+            for fn in self._listeners:
+                try:
+                    fn(self.payload)
+                except Exception:
+                    pass  # a broken subscriber must not stop the feed
+            return True
+        return False
+
+    def _update(self, snap):
+        try:
+            settings = self._load_settings()
+        except Exception:
+            settings = {}
+        with self._lock:
+            if snap is not None:
+                self._snap = snap
+            payload = build_payload(self._snap, settings)
+            if payload == self.payload:
+                return False
+            # as_of / quoted_at move on every fetch; only real changes are pushed to streams
+            changes = diff(self.payload, payload)
+            changes.pop("as_of", None)
+            changes.pop("quoted_at", None)
+            body = json.dumps(payload, separators=(",", ":")).encode()
+            self.payload, self.body = payload, body
+            self.etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+            if not changes:
+                return True
+            self.version += 1
+            message = sse("delta", {"version": self.version, "as_of": payload["as_of"], "changes": changes})
+            for q in list(self._clients):
+                try:
+                    q.put_nowait(message)
+                except queue.Full:
+                    self._clients.discard(q)
+        return True
+
+    def stream(self, keepalive=KEEPALIVE):
+        """SSE byte chunks for one client; ends when the client goes away or falls too far behind."""
+        q = queue.Queue(maxsize=CLIENT_QUEUE)
+        with self._lock:
+            self._clients.add(q)
+            first = sse("snapshot", {"version": self.version, "rates": self.payload})
+        try:
+            yield first
+            while q in self._clients:
+                try:
+                    yield q.get(timeout=keepalive)
+                except queue.Empty:
+                    yield b": ping\n\n"
+        finally:
+            self._clients.discard(q)
+
+    @property
+    def listeners(self):
+        return len(self._clients)
+
+
+def make_api_app(feed, shops=None, default=None):
+    # shops: {slug: RateFeed}, looked up on every request so feeds can be added later;
+    # default: slug served without ?shop= (instead of a fixed feed)
+    def api_app(environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        slug = parse_qs(environ.get("QUERY_STRING", "")).get("shop", [default])[0]
+        selected = (shops or {}).get(slug) if slug else feed
+        if selected is None:
+            start_response("404 Not Found", [("Content-Type", "text/plain")])
+            return [b"unknown shop"]
+        if path in ("/api/stream", "/api/stream/"):
+            start_response("200 OK", [("Content-Type", "text/event-stream"), ("Cache-Control", "no-cache"),
+                                      ("Access-Control-Allow-Origin", "*"), ("X-Accel-Buffering", "no")])
+            return selected.stream()
+        if path not in ("/api/rates", "/api/rates/"):
+            start_response("404 Not Found", [("Content-Type", "text/plain")])
+            return [b"not found"]
+        body, etag = selected.body, selected.etag
+        headers = [("ETag", etag), ("Cache-Control", CACHE_CONTROL), ("Access-Control-Allow-Origin", "*")]
+        if environ.get("HTTP_IF_NONE_MATCH") == etag:
+            start_response("304 Not Modified", headers)
+            return [b""]
+        start_response("200 OK", headers + [("Content-Type", "application/json"),
+                                             ("Content-Length", str(len(body)))])
+        return [body]
+    return api_app
+
+
+def metrics_app(environ, start_response):
+    if environ.get("PATH_INFO", "") != "/metrics":
+        start_response("404 Not Found", [("Content-Type", "text/plain")])
+        return [b"not found"]
+    body = metrics.render_prometheus().encode()
+    start_response("200 OK", [("Content-Type", "text/plain; version=0.0.4"),
+                              ("Content-Length", str(len(body)))])
+    return [body]
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve_in_background(app, port, host="0.0.0.0", name="rate-api"):
+    server = make_server(host, int(port), app, server_class=_ThreadingWSGIServer, handler_class=_QuietHandler)
+    threading.Thread(target=server.serve_forever, name=name, daemon=True).start()
+    return server
@@ -0,0 +1,94 @@
+import base64
+import json
+import threading
+from types import MappingProxyType
+
+import http_client
+
+# SETTINGS SYNC
+# Keeps manual.json in memory and polls GitHub with If-None-Match. Unchanged
+# polls come back as 304 Not Modified, which GitHub does not count against the
+# API rate limit, so premiums stay in sync every few seconds for free. When the
+# file does change the new values replace the in-process settings, and the
+# last_update / last_seen_update check in main.py picks them up on the next rerun.
+
+DEFAULT_SETTINGS = {"gold_premium": 0, "silver_premium": 0, "last_update": 0}
+SYNC_INTERVAL = 10
+
+
+def with_defaults(data):
+    data = dict(data) if isinstance(data, dict) else {}
+    for key in DEFAULT_SETTINGS:
+        data.setdefault(key, DEFAULT_SETTINGS[key])
+    return data
+
+
+class SettingsSync:
+    def __init__(self, token, repo_name, path="manual.json", interval=SYNC_INTERVAL):
+        self.token = token
+        self.repo_name = repo_name
+        self.path = path
+        self.interval = interval
+        self.etag = None
+        self.sha = None
+        self.last_error = None
+        self.stats = {"polls": 0, "not_modified": 0, "changed": 0}
+        self._settings = MappingProxyType(with_defaults({}))
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="settings-sync", daemon=True)
+
+    def start(self):
+        if self.token and not self._thread.is_alive():
+            self.poll()
+            self._thread.start()
+        return self
+
+    def current(self):
+        return dict(self._settings)
+
+    def push(self, data, sha=None):
+        """Apply settings we just wrote ourselves without waiting for the next poll."""
+        with self._lock:
+            self._settings = MappingProxyType(with_defaults(data))
+            if sha:
+                self.sha = sha
+                # Our own write changed the file; the old ETag no longer matches
+                self.etag = None
+
+    def poll(self):
+        """Conditional GET of the contents API. Returns True when the settings changed."""
+        headers = {"Authorization": f"token {self.token}", "Accept": "application/vnd.github+json"}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        self.stats["polls"] += 1
+        try:
+            res = http_client.get("github", f"/repos/{self.repo_name}/contents/{self.path}",
+                                  headers=headers, timeout=5)
+            if res.status_code == 304:
+                self.stats["not_modified"] += 1
+                return False
+            res.raise_for_status()
+            body = res.json()
+            data = json.loads(base64.b64decode(body["content"]).decode())
+        except Exception as e:
+            self.last_error = str(e)
+            return False
+        self.last_error = None
+        with self._lock:
+            self.etag = res.headers.get("ETag")
+            self.sha = body.get("sha")
+            changed = dict(self._settings) != with_defaults(data)
+            self._settings = MappingProxyType(with_defaults(data))
+        if changed:
+            self.stats["changed"] += 1
+        return changed
+
+    def refresh_now(self):
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.poll()
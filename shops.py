@@ -0,0 +1,99 @@
+import logging
+import os
+import re
+
+# SHOP PROFILES (multi-shop mode)
+# One process serves several counters / partner shops. Each shop has its own
+# premiums, history and branding; quotes come from the one shared poller, so an
+# extra shop adds no upstream traffic. Shops are configured in secrets:
+#
+#   [shops.dha]
+#   name = "Islam Jewellery DHA"
+#   subtitle = "DHA Phase 6 • Premium Gold"
+#   phone = "03001234567"
+#   whatsapp = "923001234567"
+#   admin_password = "..."          # required; only [shops.main] may fall back to ADMIN_PASSWORD
+#
+# and selected with ?shop=dha. The default shop keeps the original layout
+# (manual.json and history/ at the repo root, the SQLITE_PATH database, the
+# SNAPSHOT_DIR root); every other shop lives under shops/<slug>/ in the repo,
+# <db>-<slug>.db next to the database and <SNAPSHOT_DIR>/<slug>/.
+# A misconfigured partner shop is left out (and logged); it never takes the
+# other shops down with it.
+
+DEFAULT_SHOP = "main"
+DEFAULT_PROFILE = {
+    "name": "Islam Jewellery",
+    "subtitle": "Sarafa Bazar • Premium Gold",
+    "phone": "03492114166",
+    "whatsapp": "923492114166",
+}
+SLUG = re.compile(r"^[a-z0-9][a-z0-9-]{0,31}$")
+
+log = logging.getLogger(__name__)
+
+
+class Shop:
+    def __init__(self, slug, name, subtitle="", phone="", whatsapp="", admin_password=None):
+        self.slug = slug
+        self.name = name
+        self.subtitle = subtitle
+        self.phone = phone
+        self.whatsapp = whatsapp
+        self.admin_password = admin_password
+
+    @property
+    def is_default(self):
+        return self.slug == DEFAULT_SHOP
+
+    @property
+    def prefix(self):
+        """Repo path prefix for this shop's manual.json and history."""
+        return "" if self.is_default else f"shops/{self.slug}/"
+
+    def sqlite_path(self, base):
+        if self.is_default:
+            return base
+        root, ext = os.path.splitext(base)
+        return f"{root}-{self.slug}{ext or '.db'}"
+
+    def snapshot_dir(self, base):
+        return base if self.is_default else os.path.join(base, self.slug)
+
+    def __repr__(self):
+        return f"Shop({self.slug!r}, {self.name!r})"
+
+
+def parse_shop(slug, profile):
+    """Shop from one [shops.<slug>] table; ValueError when it cannot be served safely."""
+    slug = str(slug).lower()
+    if not SLUG.match(slug):
+        raise ValueError(f"Invalid shop slug: {slug!r} (lowercase letters, digits and dashes)")
+    # Partner shops never inherit the default shop's name or phone numbers
+    fields = DEFAULT_PROFILE if slug == DEFAULT_SHOP else {"name": slug.replace("-", " ").title()}
+    fields = dict(fields, **{k: v for k, v in dict(profile).items()
+                             if k in ("name", "subtitle", "phone", "whatsapp", "admin_password")})
+    if slug != DEFAULT_SHOP and not fields.get("admin_password"):
+        # Otherwise the main shop's password would unlock the partner's admin panel
+        raise ValueError(f"Shop {slug!r} needs its own admin_password")
+    return Shop(slug, **fields)
+
+
+def load_shops(config=None):
+    """{slug: Shop} from the [shops] secrets table; the default shop is always present.
+    Shops that fail parse_shop() are skipped with a logged warning."""
+    shops = {DEFAULT_SHOP: Shop(DEFAULT_SHOP, **DEFAULT_PROFILE)}
+    for slug, profile in dict(config or {}).items():
+        try:
+            shop = parse_shop(slug, profile)
+        except (TypeError, ValueError) as e:
+            log.warning("Shop %r disabled: %s", slug, e)
+            continue
+        shops[shop.slug] = shop
+    return shops
+
+
+def resolve(shops, requested=None):
+    """The Shop for a ?shop= value (None/empty -> default); None when it is not configured."""
+    slug = (requested or DEFAULT_SHOP).strip().lower()
+    return shops.get(slug)
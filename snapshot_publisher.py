@@ -0,0 +1,106 @@
+import json
+import os
+import time
+from html import escape
+
+from last_good import age_label
+
+# STATIC SNAPSHOT PUBLISHER
+# Writes the final public rates (premiums included) as rates.json plus a
+# self-contained index.html card into a folder that any CDN or plain file
+# server can host. Files are rewritten only when a rate moves by more than the
+# threshold, a premium or source changes, or the snapshot gets too old, and
+# every write is atomic (temp file + rename) so readers never see half a file.
+
+MIN_CHANGE_PKR = {"gold": 100, "silver": 10}   # per-tola moves smaller than this are ignored
+MAX_AGE = 600                                  # rewrite at least this often (seconds) while live
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def render_html(payload, shop="Islam Jewellery", subtitle="Sarafa Bazar • Premium Gold", now=None):
+    gold, silver = payload.get("gold", {}), payload.get("silver", {})
+    now = now or time.time()
+    quoted_at = payload.get("quoted_at") or {}
+
+    def cached(inst):
+        # Age of a last-good quote, shown so an old price is never passed off as current
+        if inst not in payload.get("cached", ()) or not quoted_at.get(inst):
+            return ""
+        return f'<div class="stale">CACHED QUOTE &middot; {age_label(now - quoted_at[inst])} OLD</div>'
+
+    def card(label, item, inst, extra=""):
+        if not item.get("tola_pkr"):
+            return f'<div class="card off"><div class="price">{escape(label)} OFFLINE</div></div>'
+        return (f'<div class="card">{cached(inst) or cached("usd")}<div class="price">Rs {item["tola_pkr"]:,.0f}</div>'
+                f'<div class="label">{escape(label)} Per Tola</div>'
+                f'<div class="meta">${item.get("ounce_usd", 0):,.2f} / oz{extra}</div></div>')
+
+    dubai = f' &middot; AED {gold["dubai_tola_aed"]:,.0f} Dubai/Tola' if gold.get("dubai_tola_aed") else ""
+    return f"""<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<meta http-equiv="refresh" content="60">
+<title>{escape(shop)} - Gold Rate</title>
+<style>
+body{{margin:0;background:#f8f9fa;font-family:'Outfit',system-ui,sans-serif;color:#333}}
+.wrap{{max-width:700px;margin:0 auto;padding:1rem}}
+.header{{text-align:center;padding:25px 0;background:linear-gradient(135deg,#1a1a1a 0%,#2d2d2d 100%);border-radius:12px;color:#fff}}
+.brand{{font-size:2.2rem;font-weight:800;color:#d4af37;text-transform:uppercase}}
+.sub{{font-size:.8rem;letter-spacing:3px;text-transform:uppercase;opacity:.8}}
+.card{{background:#fff;border-radius:16px;padding:15px;text-align:center;border:1px solid #eef0f2;margin-top:10px}}
+.card.off{{border-left:5px solid #dc3545;color:#dc3545}}
+.price{{font-size:2.6rem;font-weight:800;color:#222}}
+.off .price{{font-size:1.5rem;color:#dc3545}}
+.label{{font-size:.85rem;color:#666}}
+.meta,.foot{{font-size:.7rem;color:#999;margin-top:6px}}
+.stale{{display:inline-block;background:#fff3cd;color:#856404;border-radius:20px;padding:3px 10px;font-size:.7rem;font-weight:700}}
+</style></head>
+<body><div class="wrap">
+<div class="header"><div class="brand">{escape(shop)}</div><div class="sub">{escape(subtitle)}</div></div>
+{card("24K Gold", gold, "gold", dubai)}
+{card("24K Silver", silver, "silver")}
+<div class="foot">USD/PKR {payload.get("usd_pkr", 0):.2f} &middot; Data as of {escape(str(payload.get("as_of")))}<br>
+Approximate prices. Verify with shop before buying.</div>
+</div></body></html>
+""".encode()
+
+
+class SnapshotPublisher:
+    def __init__(self, out_dir="public", min_change=None, max_age=MAX_AGE, render=render_html):
+        self.out_dir = out_dir
+        self.min_change = min_change or MIN_CHANGE_PKR
+        self.max_age = max_age
+        self.render = render
+        self.published = None
+        self.published_at = 0
+        self.writes = 0
+        os.makedirs(out_dir, exist_ok=True)
+
+    def _significant(self, payload):
+        old = self.published
+        if old is None or time.time() - self.published_at >= self.max_age:
+            return True
+        for metal, threshold in self.min_change.items():
+            new_m, old_m = payload.get(metal, {}), old.get(metal, {})
+            if abs(new_m.get("tola_pkr", 0) - old_m.get("tola_pkr", 0)) >= threshold:
+                return True
+            if new_m.get("premium_pkr") != old_m.get("premium_pkr") or new_m.get("source") != old_m.get("source"):
+                return True
+        return payload.get("cached") != old.get("cached")
+
+    def publish(self, payload):
+        """Rewrite the static files if the payload differs enough. Returns True when written."""
+        if not payload or not self._significant(payload):
+            return False
+        _write_atomic(os.path.join(self.out_dir, "rates.json"),
+                      json.dumps(payload, separators=(",", ":")).encode())
+        _write_atomic(os.path.join(self.out_dir, "index.html"), self.render(payload))
+        self.published, self.published_at = payload, time.time()
+        self.writes += 1
+        return True
@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import deque
+
+# SOURCE HEALTH + CIRCUIT BREAKERS
+# Every upstream attempt (hedged losers included) is recorded per chain entry
+# ("TD Gold", "Yahoo Silver", ...): rolling latency, error rate and quota hits.
+# A chain entry that keeps failing opens its circuit for a cooldown and is left
+# out of the race, so a dead source stops costing a timeout on every refresh.
+# After the cooldown one trial call is let through (half-open): success closes
+# the circuit, failure re-opens it with a doubled cooldown.
+#
+# A quota refusal (SourceLimit) is an account-wide condition, so it opens the
+# circuit of every entry of that source at once.
+
+WINDOW = 20               # outcomes kept per entry
+HORIZON = 900             # seconds an outcome counts towards latency / error rate
+FAIL_THRESHOLD = 3        # consecutive failures that open the circuit
+COOLDOWN = 60             # first open, seconds; doubles on each re-open
+MAX_COOLDOWN = 900
+QUOTA_COOLDOWN = 300      # after a quota refusal
+
+
+class _Entry:
+    def __init__(self, source):
+        self.source = source
+        self.outcomes = deque(maxlen=WINDOW)   # (ok, seconds, recorded at)
+        self.calls = 0
+        self.failures = 0
+        self.streak = 0
+        self.open_until = 0.0
+        self.cooldown = COOLDOWN
+        self.quota = False
+        self.last_error = ""
+
+    def recent(self, now):
+        return [(ok, s) for ok, s, at in self.outcomes if now - at < HORIZON]
+
+    def latencies(self, now):
+        return sorted(s for ok, s in self.recent(now) if ok)
+
+    def error_rate(self, now):
+        recent = self.recent(now)
+        return sum(1 for ok, _ in recent if not ok) / len(recent) if recent else 0.0
+
+    def score(self, penalty, now):
+        # Expected seconds to an answer: typical latency plus the timeout paid on each failure.
+        # No recent samples scores 0, which is also how a demoted source gets probed again.
+        lat = self.latencies(now)
+        return (lat[len(lat) // 2] if lat else 0.0) + self.error_rate(now) * penalty
+
+
+class SourceHealth:
+    def __init__(self, failure_penalty=5.0):
+        self.failure_penalty = failure_penalty
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, label, source):
+        entry = self._entries.get(label)
+        if entry is None:
+            entry = self._entries[label] = _Entry(source)
+        return entry
+
+    def record(self, label, source, ok, seconds, error=None, quota=False):
+        now = time.time()
+        with self._lock:
+            entry = self._entry(label, source)
+            entry.calls += 1
+            entry.outcomes.append((ok, seconds, now))
+            if ok:
+                entry.streak = 0
+                entry.open_until = 0.0
+                entry.cooldown = COOLDOWN
+                entry.quota = False
+                return
+            entry.failures += 1
+            entry.streak += 1
+            entry.last_error = str(error or "")[:120]
+            if quota:
+                for other in self._entries.values():
+                    if other.source == source:
+                        other.quota = True
+                        other.open_until = max(other.open_until, now + QUOTA_COOLDOWN)
+            elif entry.streak >= FAIL_THRESHOLD and entry.open_until <= now:
+                # Half-open trial failed (or threshold just reached): open again, longer
+                if entry.streak > FAIL_THRESHOLD:
+                    entry.cooldown = min(entry.cooldown * 2, MAX_COOLDOWN)
+                entry.open_until = now + entry.cooldown
+
+    def open_circuits(self):
+        """(label, seconds left) for every entry currently kept out of the races."""
+        now = time.time()
+        with self._lock:
+            return [(label, e.open_until - now) for label, e in sorted(self._entries.items())
+                    if e.open_until > now]
+
+    def order(self, chain):
+        """Chain entries worth trying, fastest healthy first; configured order breaks ties.
+
+        Entries with an open circuit are dropped, unless every entry is open: then
+        the chain is tried as configured rather than giving up on the quote.
+        """
+        now = time.time()
+        with self._lock:
+            ranked = []
+            for pos, item in enumerate(chain):
+                entry = self._entries.get(item[1])
+                if entry and entry.open_until > now:
+                    continue
+                ranked.append((entry.score(self.failure_penalty, now) if entry else 0.0, pos, item))
+        if not ranked:
+            return list(chain)
+        return [item for _, _, item in sorted(ranked, key=lambda r: r[:2])]
+
+    def stats(self):
+        """One row per chain entry for the Source Monitor."""
+        now = time.time()
+        rows = []
+        with self._lock:
+            for label, e in sorted(self._entries.items()):
+                lat = e.latencies(now)
+                if e.open_until > now:
+                    state = f"open {e.open_until - now:.0f}s"
+                elif e.streak >= FAIL_THRESHOLD:
+                    state = "half-open"
+                else:
+                    state = "closed"
+                rows.append({
+                    "source": label,
+                    "state": state,
+                    "quota": "hit" if e.quota else "ok",
+                    "calls": e.calls,
+                    "errors %": round(100 * e.error_rate(now)),
+                    "p50 ms": round(1000 * lat[len(lat) // 2]) if lat else None,
+                    "p95 ms": round(1000 * lat[min(len(lat) - 1, int(len(lat) * 0.95))]) if lat else None,
+                    "last error": e.last_error,
+                })
+        return rows
@@ -0,0 +1,401 @@
+import base64
+import functools
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+import http_client
+from metrics import span
+from settings_sync import SettingsSync, with_defaults
+
+# STORAGE BACKENDS
+# Everything persistent (manual.json premiums, history.json records) goes
+# through one of these. GitHubStorage is what the hosted app has always used;
+# SQLiteStorage keeps the same data in a local WAL-mode database so reads are
+# local and the app can run self-hosted or fully offline.
+#
+# History is append-only and uncapped. Reads take a window (start/end dates as
+# "YYYY-MM-DD HH:MM:SS" strings, plus an optional "last N" limit) so the tabs
+# only pull what they show.
+#
+# A publish (new premiums + the matching history record) goes through publish(),
+# so a backend can write both in one step: one SQLite transaction, or one Git
+# commit on GitHub.
+
+HISTORY_FIELDS = ("date", "gold_pk", "silver_pk", "gold_ounce", "silver_ounce", "usd")
+SEGMENT_DIR = "history"
+LISTING_TTL = 5           # seconds a segment listing is trusted before re-checking
+PUBLISH_ATTEMPTS = 10     # head moved under us -> rebuild the commit on the new head
+
+
+def segment_name(date):
+    # One segment per month: "2026-02-04 01:27:53" -> history/2026-02.jsonl
+    return f"{SEGMENT_DIR}/{date[:7]}.jsonl"
+
+
+def in_window(records, start=None, end=None, limit=None):
+    records = [r for r in records
+               if (start is None or r.get("date", "") >= start) and (end is None or r.get("date", "") <= end)]
+    records.sort(key=lambda r: r.get("date", ""))
+    return records[-limit:] if limit else records
+
+
+def blob_sha(data):
+    # Git's object id for a file body, so our own writes need no read-back
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def _timed(method):
+    # storage{backend, call} span around every public backend call
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with span("storage", backend=self.name, call=method.__name__):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class Storage:
+    name = "base"
+
+    def load_settings(self):
+        raise NotImplementedError
+
+    def save_settings(self, data):
+        raise NotImplementedError
+
+    def load_history(self, start=None, end=None, limit=None):
+        """Records with start <= date <= end, oldest first; limit keeps only the newest N."""
+        raise NotImplementedError
+
+    def append_history(self, record):
+        raise NotImplementedError
+
+    def publish(self, settings, record):
+        """Save new settings and append the history record that goes with them."""
+        self.save_settings(settings)
+        self.append_history(record)
+
+    def reset_history(self):
+        raise NotImplementedError
+
+    def history_version(self):
+        """Cheap token that changes whenever history is appended to or reset."""
+        raise NotImplementedError
+
+    def refresh(self):
+        """Ask the backend to pick up outside changes (no-op when reads are local)."""
+
+
+class GitHubStorage(Storage):
+    name = "github"
+
+    def __init__(self, token, repo_name, prefix=""):
+        # prefix: folder of this shop's files in the repo ("" = repo root, see shops.py)
+        self.token, self.repo_name, self.prefix = token, repo_name, prefix
+        self.settings_path = f"{prefix}manual.json"
+        self._repo = None
+        self._repo_lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self._branch = None
+        self._last_commit = None   # (sha, tree sha, segment path, segment text) of our last publish
+        self.sync = SettingsSync(token, repo_name, path=self.settings_path).start()
+        # Shared by every session's script thread: listing and segment cache go through _cache_lock
+        self._cache_lock = threading.Lock()
+        self._segment_cache = {}
+        self._listing = []
+        self._listing_etag = None
+        self._listing_checked = 0
+        self._writes = 0
+
+    @property
+    def repo(self):
+        # PyGithub (import + get_repo round trip) is only paid on the first write or
+        # history read; public page views get by on the conditional settings poll.
+        if self._repo is None:
+            with self._repo_lock:
+                if self._repo is None:
+                    from github import Github
+                    # Same base URL as the pooled client, so UPSTREAM_MOCK_URL covers PyGithub too
+                    self._repo = Github(self.token, base_url=http_client.base_url("github")).get_repo(self.repo_name)
+        return self._repo
+
+    @_timed
+    def load_settings(self):
+        return self.sync.current()
+
+    @_timed
+    def save_settings(self, data):
+        try:
+            c = self.repo.get_contents(self.settings_path)
+            written = self.repo.update_file(c.path, "Update", json.dumps(data), c.sha)
+        except Exception:
+            written = self.repo.create_file(self.settings_path, "Init", json.dumps(data))
+        self.sync.push(data, sha=written["content"].sha)
+
+    def _api_headers(self):
+        return {"Authorization": f"token {self.token}", "Accept": "application/vnd.github+json"}
+
+    def _segments(self):
+        # Directory listing is the timestamp index, names sort by month. It is fetched
+        # with If-None-Match, so checking for new publishes is a free 304 most of the time.
+        # Held across the fetch: concurrent reruns wait for one check instead of each sending one.
+        with self._cache_lock:
+            if time.time() - self._listing_checked < LISTING_TTL:
+                return self._listing
+            headers = self._api_headers()
+            if self._listing_etag:
+                headers["If-None-Match"] = self._listing_etag
+            res = http_client.get("github", f"/repos/{self.repo_name}/contents/{self.prefix}{SEGMENT_DIR}",
+                                  headers=headers, timeout=5)
+            if res.status_code == 404:
+                self._listing, self._listing_etag = [], None
+            elif res.status_code != 304:
+                res.raise_for_status()
+                self._listing = sorted((SimpleNamespace(name=f["name"], path=f["path"], sha=f["sha"])
+                                        for f in res.json() if f["name"].endswith(".jsonl")), key=lambda f: f.name)
+                self._listing_etag = res.headers.get("ETag")
+            self._listing_checked = time.time()
+            return self._listing
+
+    def _invalidate(self):
+        with self._cache_lock:
+            self._writes += 1
+            self._listing_checked = 0
+            self._listing_etag = None
+
+    @_timed
+    def history_version(self):
+        # Local write count covers the legacy history.json, which is not in the listing
+        return (self._writes,) + tuple(seg.sha for seg in self._segments())
+
+    def _read_segment(self, sha):
+        # Closed months never change, so decoded segments are kept per blob sha. The blob
+        # is fetched outside the lock; two threads racing on a new sha decode the same data.
+        with self._cache_lock:
+            records = self._segment_cache.get(sha)
+        if records is None:
+            raw = base64.b64decode(self.repo.get_git_blob(sha).content).decode()
+            records = [json.loads(line) for line in raw.splitlines() if line.strip()]
+            with self._cache_lock:
+                records = self._segment_cache.setdefault(sha, records)
+        return records
+
+    def _legacy(self):
+        # history.json from before segments existed; read-only, oldest data
+        try:
+            contents = self.repo.get_contents(f"{self.prefix}history.json")
+            data = json.loads(contents.decoded_content.decode())
+            return data if isinstance(data, list) else []
+        except Exception:
+            return []
+
+    @_timed
+    def load_history(self, start=None, end=None, limit=None):
+        segments = self._segments()
+        # Drop decoded copies of segment versions that have since been rewritten
+        live = {seg.sha for seg in segments}
+        with self._cache_lock:
+            for sha in [sha for sha in self._segment_cache if sha not in live]:
+                del self._segment_cache[sha]
+        records = []
+        for seg in reversed(segments):
+            month = seg.name[:-len(".jsonl")]
+            if end is not None and month > end[:7]:
+                continue
+            if start is not None and month < start[:7]:
+                break
+            records = self._read_segment(seg.sha) + records
+            if limit and start is None and len(records) >= limit:
+                return in_window(records, start, end, limit)
+        else:
+            records = self._legacy() + records
+        return in_window(records, start, end, limit)
+
+    @_timed
+    def append_history(self, record):
+        # Only the current month's segment is rewritten, never the whole history
+        from github import UnknownObjectException
+        path = self.prefix + segment_name(record["date"])
+        line = json.dumps(record) + "\n"
+        try:
+            c = self.repo.get_contents(path)
+            self.repo.update_file(path, "Hist", c.decoded_content.decode() + line, c.sha)
+        except UnknownObjectException:
+            self.repo.create_file(path, "Hist", line)
+        self._invalidate()
+
+    def _git(self, method, path, **kwargs):
+        # Git Data API over the pooled session. PyGithub spaces writes a second apart,
+        # which would add two seconds to every publish's tree/commit/ref sequence.
+        return http_client.request("github", method, f"/repos/{self.repo_name}{path}",
+                                   headers=self._api_headers(), timeout=10, **kwargs)
+
+    def _head_state(self, head, path):
+        # (tree sha, segment text) at head. Right after our own publish we already
+        # know both, so a lone admin's next publish skips the two reads.
+        if self._last_commit and self._last_commit[0] == head and self._last_commit[2] == path:
+            return self._last_commit[1], self._last_commit[3]
+        commit = self._git("GET", f"/git/commits/{head}")
+        commit.raise_for_status()
+        res = self._git("GET", f"/contents/{path}", params={"ref": head})
+        if res.status_code == 404:
+            return commit.json()["tree"]["sha"], ""
+        res.raise_for_status()
+        body = res.json()
+        if not body.get("content"):
+            # Files over 1 MB come back without content; fetch the blob instead
+            body = self._git("GET", f"/git/blobs/{body['sha']}").json()
+        return commit.json()["tree"]["sha"], base64.b64decode(body["content"]).decode()
+
+    @_timed
+    def publish(self, settings, record):
+        # manual.json and the month's segment land in a single commit made with the
+        # Git Data API on top of the branch head. The ref update is not forced, so if
+        # another publish moved the head first it is refused and the append is rebuilt
+        # on the new head instead of overwriting it.
+        path = self.prefix + segment_name(record["date"])
+        body = json.dumps(settings)
+        with self._publish_lock:
+            if self._branch is None:
+                res = self._git("GET", "")
+                res.raise_for_status()
+                self._branch = res.json()["default_branch"]
+            for attempt in range(PUBLISH_ATTEMPTS):
+                ref = self._git("GET", f"/git/ref/heads/{self._branch}")
+                ref.raise_for_status()
+                head = ref.json()["object"]["sha"]
+                base_tree, segment = self._head_state(head, path)
+                segment += json.dumps(record) + "\n"
+                tree = self._git("POST", "/git/trees", json={"base_tree": base_tree, "tree": [
+                    {"path": self.settings_path, "mode": "100644", "type": "blob", "content": body},
+                    {"path": path, "mode": "100644", "type": "blob", "content": segment},
+                ]})
+                tree.raise_for_status()
+                commit = self._git("POST", "/git/commits", json={
+                    "message": "Publish rate", "tree": tree.json()["sha"], "parents": [head]})
+                commit.raise_for_status()
+                commit_sha = commit.json()["sha"]
+                res = self._git("PATCH", f"/git/refs/heads/{self._branch}", json={"sha": commit_sha})
+                # 422 "not a fast forward" (409 on some proxies): someone else published
+                if res.status_code in (409, 422) and attempt < PUBLISH_ATTEMPTS - 1:
+                    self._last_commit = None
+                    time.sleep(random.uniform(0.05, 0.25) * (attempt + 1))
+                    continue
+                res.raise_for_status()
+                self._last_commit = (commit_sha, tree.json()["sha"], path, segment)
+                break
+        self.sync.push(settings, sha=blob_sha(body.encode()))
+        self._invalidate()
+
+    @_timed
+    def reset_history(self):
+        from github import UnknownObjectException
+        for seg in self._segments():
+            self.repo.delete_file(seg.path, "Reset history", seg.sha)
+        try:
+            h_content = self.repo.get_contents(f"{self.prefix}history.json")
+            self.repo.update_file(h_content.path, "Reset history", json.dumps([]), h_content.sha)
+        except UnknownObjectException:
+            pass
+        with self._cache_lock:
+            self._segment_cache.clear()
+        self._invalidate()
+
+    def refresh(self):
+        self.sync.refresh_now()
+
+
+class SQLiteStorage(Storage):
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS documents (name TEXT PRIMARY KEY, body TEXT NOT NULL)")
+            db.execute("""CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                date TEXT NOT NULL, gold_pk REAL, silver_pk REAL,
+                gold_ounce REAL, silver_ounce REAL, usd REAL)""")
+            db.execute("CREATE INDEX IF NOT EXISTS history_date ON history (date)")
+
+    def _conn(self):
+        # One connection per thread; WAL lets the poller threads read while a publish writes
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @_timed
+    def load_settings(self):
+        row = self._conn().execute("SELECT body FROM documents WHERE name = 'manual.json'").fetchone()
+        return with_defaults(json.loads(row[0]) if row else {})
+
+    @_timed
+    def save_settings(self, data):
+        with self._conn() as db:
+            db.execute("INSERT OR REPLACE INTO documents (name, body) VALUES ('manual.json', ?)",
+                       (json.dumps(data),))
+
+    @_timed
+    def load_history(self, start=None, end=None, limit=None):
+        rows = self._conn().execute(
+            f"SELECT {', '.join(HISTORY_FIELDS)} FROM history WHERE date >= ? AND date <= ? "
+            "ORDER BY date DESC LIMIT ?",
+            (start or "", end or "9999", limit or -1),
+        ).fetchall()
+        return [dict(zip(HISTORY_FIELDS, row)) for row in reversed(rows)]
+
+    @_timed
+    def append_history(self, record):
+        with self._conn() as db:
+            db.execute(f"INSERT INTO history ({', '.join(HISTORY_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                       tuple(record.get(f) for f in HISTORY_FIELDS))
+            self._bump_version(db)
+
+    @_timed
+    def publish(self, settings, record):
+        with self._conn() as db:
+            db.execute("INSERT OR REPLACE INTO documents (name, body) VALUES ('manual.json', ?)",
+                       (json.dumps(settings),))
+            db.execute(f"INSERT INTO history ({', '.join(HISTORY_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                       tuple(record.get(f) for f in HISTORY_FIELDS))
+            self._bump_version(db)
+
+    @_timed
+    def reset_history(self):
+        with self._conn() as db:
+            db.execute("DELETE FROM history")
+            self._bump_version(db)
+
+    def _bump_version(self, db):
+        db.execute("INSERT INTO documents (name, body) VALUES ('history_version', '1') "
+                   "ON CONFLICT (name) DO UPDATE SET body = CAST(body AS INTEGER) + 1")
+
+    @_timed
+    def history_version(self):
+        row = self._conn().execute("SELECT body FROM documents WHERE name = 'history_version'").fetchone()
+        return int(row[0]) if row else 0
+
+
+def open_storage(backend, token=None, repo_name=None, sqlite_path="data/swiss_gold.db", prefix=""):
+    """backend: "github", "sqlite" or None (GitHub when a token is configured, else SQLite).
+    prefix places a shop's files in a folder of the repo; SQLite shops get their own sqlite_path."""
+    backend = (backend or ("github" if token else "sqlite")).lower()
+    if backend == "github":
+        if not token:
+            raise ValueError("GIT_TOKEN is required for the github storage backend")
+        return GitHubStorage(token, repo_name, prefix)
+    if backend == "sqlite":
+        return SQLiteStorage(sqlite_path)
+    raise ValueError(f"Unknown storage backend: {backend}")
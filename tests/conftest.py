@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The app is a set of flat modules at the repo root; the GitHub mock lives in bench/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "bench")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from chart_data import downsample, lttb_indices, ohlc
+
+
+def test_lttb_keeps_everything_under_threshold():
+    x = np.arange(10, dtype=float)
+    assert list(lttb_indices(x, x, 10)) == list(range(10))
+    assert list(lttb_indices(x, x, 2)) == list(range(10))
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[123], y[777] = 50.0, -40.0
+    keep = lttb_indices(x, y, 20)
+    assert len(keep) == 20
+    assert keep[0] == 0 and keep[-1] == 999
+    assert np.all(np.diff(keep) > 0)
+    assert 123 in keep and 777 in keep
+
+
+def test_downsample_returns_frame_rows():
+    df = pd.DataFrame({"date": pd.date_range("2026-01-01", periods=50, freq="1h"),
+                       "gold_pk": np.arange(50.0)})
+    assert len(downsample(df, "gold_pk", budget=100)) == 50
+    small = downsample(df, "gold_pk", budget=10)
+    assert len(small) == 10
+    assert small["date"].iloc[0] == df["date"].iloc[0] and small["date"].iloc[-1] == df["date"].iloc[-1]
+
+
+def test_ohlc_buckets():
+    df = pd.DataFrame({
+        "date": pd.to_datetime(["2026-01-01 10:05", "2026-01-01 10:20", "2026-01-01 10:50",
+                                "2026-01-01 12:10", "2026-01-01 12:30"]),
+        "gold_pk": [100.0, 120.0, 90.0, 200.0, None],
+    })
+    candles = ohlc(df, "gold_pk", "1h")
+    # The empty 11:00 bucket is dropped and the missing 12:30 price is ignored
+    assert list(candles["date"]) == list(pd.to_datetime(["2026-01-01 10:00", "2026-01-01 12:00"]))
+    assert candles.iloc[0][["open", "high", "low", "close", "count"]].tolist() == [100, 120, 90, 90, 3]
+    assert candles.iloc[1][["open", "high", "low", "close", "count"]].tolist() == [200, 200, 200, 200, 1]
+
+
+def test_history_frame_types():
+    from chart_data import history_frame
+    df = history_frame([
+        {"date": "2026-01-02 10:00:00", "gold_pk": 250000, "silver_pk": 3000, "usd": 280},
+        {"date": "not a date", "gold_pk": 1},
+        {"date": "2026-01-01 10:00:00", "gold_pk": "249900", "silver_pk": None, "usd": 280.5},
+    ])
+    assert list(df["date"]) == list(pd.to_datetime(["2026-01-01 10:00", "2026-01-02 10:00"]))
+    for col in ("gold_pk", "silver_pk", "gold_ounce", "silver_ounce", "usd"):
+        assert df[col].dtype == np.float64, col
+    assert list(df["gold_pk"]) == [249900.0, 250000.0]
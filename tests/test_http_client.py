@@ -0,0 +1,38 @@
+import pytest
+
+import http_client
+from mock_upstream import MockUpstreams, Profile
+
+DOWN = Profile(latency=0, jitter=0, error_rate=1.0)
+SERVICES = ("twelvedata", "exchangerate", "yahoo", "github")
+
+
+@pytest.fixture
+def mock():
+    mock = MockUpstreams({service: DOWN for service in SERVICES}).start()
+    for service in SERVICES:
+        http_client.set_base_url(service, f"{mock.url}/{service}")
+    yield mock
+    for service in SERVICES:
+        http_client.set_base_url(service)
+    mock.stop()
+
+
+@pytest.mark.parametrize("service", ["twelvedata", "exchangerate", "yahoo"])
+def test_quote_services_are_called_once(mock, service):
+    # The hedged race is their retry; metered credits must not be spent behind the quota's back
+    res = http_client.get(service, "/price", timeout=5)
+    assert res.status_code == 503
+    assert mock.totals() == {service: 1}
+
+
+def test_github_reads_are_retried(mock):
+    res = http_client.get("github", "/repos/a/b", timeout=5)
+    assert res.status_code == 503
+    assert mock.totals() == {"github": 1 + http_client.RETRY.total}
+
+
+def test_writes_are_never_replayed(mock):
+    res = http_client.request("github", "POST", "/repos/a/b/git/trees", json={}, timeout=5)
+    assert res.status_code == 503
+    assert mock.totals() == {"github": 1}
@@ -0,0 +1,73 @@
+import json
+import time
+
+from last_good import MAX_STALE, LastGood, age_label
+
+LIVE = {"gold": 2400.0, "silver": 30.0, "usd": 280.0, "aed": 3.6725, "src_gold": "TwelveData",
+        "src_silver": "Yahoo Finance", "src_usd": "ExchangeRate-API", "debug": []}
+FAILED = {"gold": 0.0, "silver": 0.0, "usd": 0.0, "aed": 0.0, "src_gold": "OFFLINE", "src_silver": "OFFLINE",
+          "src_usd": "OFFLINE", "debug": ["Yahoo Gold Error: down"]}
+
+
+def store(tmp_path, **kwargs):
+    return LastGood(str(tmp_path / "last_good.json"), seed_path=str(tmp_path / "missing.json"), **kwargs)
+
+
+def test_age_label():
+    assert [age_label(s) for s in (-5, 45, 600, 7200, 3 * 86400)] == ["0s", "45s", "10m", "2h", "3d"]
+
+
+def test_failed_instruments_are_filled_and_marked(tmp_path):
+    lg = store(tmp_path)
+    fetched = time.time() - 7200
+    lg.remember(dict(LIVE, fetched_at=fetched))
+    data = lg.fill(dict(FAILED, silver=31.0, src_silver="Yahoo Finance"))
+    assert (data["gold"], data["usd"], data["aed"], data["silver"]) == (2400.0, 280.0, 3.6725, 31.0)
+    assert data["src_gold"] == data["src_usd"] == "Cached" and data["src_silver"] == "Yahoo Finance"
+    assert data["stale"] == {"gold": fetched, "usd": fetched}
+    assert data["debug"][0] == "Yahoo Gold Error: down"
+    assert "Gold Cached: last good TwelveData quote, 2h old" in data["debug"]
+
+
+def test_live_fetch_is_left_alone(tmp_path):
+    lg = store(tmp_path)
+    lg.remember(dict(LIVE, fetched_at=time.time()))
+    data = lg.fill(dict(LIVE, gold=2401.0))
+    assert data["gold"] == 2401.0 and data["stale"] == {}
+
+
+def test_cached_and_offline_values_are_not_remembered(tmp_path):
+    lg = store(tmp_path)
+    lg.remember(dict(LIVE, src_gold="Cached", fetched_at=time.time()))
+    lg.remember(dict(FAILED, fetched_at=time.time()))
+    assert set(lg.entries) == {"silver", "usd"}
+
+
+def test_quotes_older_than_max_stale_go_offline(tmp_path):
+    lg = store(tmp_path)
+    lg.remember(dict(LIVE, fetched_at=time.time() - MAX_STALE - 1))
+    data = lg.fill(FAILED)
+    assert data["gold"] == 0.0 and data["stale"] == {}
+    assert lg.snapshot() is None
+
+
+def test_entries_survive_a_restart(tmp_path):
+    lg = store(tmp_path)
+    lg.remember(dict(LIVE, fetched_at=time.time() - 60))
+    lg.flush()
+    boot = store(tmp_path).snapshot()
+    assert boot["gold"] == 2400.0 and boot["src_gold"] == "Cached"
+    # The boot snapshot never counts as a fresh fetch
+    assert boot["fetched_at"] == min(boot["stale"].values())
+
+
+def test_seeded_from_prices_json(tmp_path):
+    stamp = time.gmtime(time.time() - 7200)
+    (tmp_path / "prices.json").write_text(json.dumps({
+        "timestamp": time.strftime("%d %b | %H:%M UTC", stamp),
+        "price_ounce_usd": 2390.5, "usd_to_pkr": 279.5, "usd_to_aed": 3.6725}))
+    lg = LastGood(str(tmp_path / "last_good.json"), seed_path=str(tmp_path / "prices.json"))
+    data = lg.fill(FAILED)
+    assert (data["gold"], data["usd"]) == (2390.5, 279.5)
+    assert data["silver"] == 0.0 and set(data["stale"]) == {"gold", "usd"}
+    assert time.time() - data["stale"]["gold"] < 3 * 3600
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from pricing import CURRENCIES, KARATS, PREMIUM, UNITS, price_matrix, rate_card, tola_rate
+
+USD_PKR, AED_PER_USD = 280.25, 3.6725
+METALS = {"gold": (2412.35, 5000.0), "silver": (30.87, 200.0)}
+
+
+def old_tola(ounce, fx, premium=0):
+    # The formula main.py used inline before pricing.py existed
+    return ((ounce / 31.1035) * 11.66 * fx) + premium
+
+
+@pytest.mark.parametrize("metal", METALS)
+def test_tola_rate_matches_old_formula(metal):
+    ounce, premium = METALS[metal]
+    assert tola_rate(ounce, USD_PKR, premium) == pytest.approx(old_tola(ounce, USD_PKR, premium), rel=1e-12)
+    assert tola_rate(ounce, AED_PER_USD) == pytest.approx(old_tola(ounce, AED_PER_USD), rel=1e-12)
+
+
+def test_tola_rate_is_zero_without_a_quote():
+    assert tola_rate(0, USD_PKR, 5000) == 0.0
+    assert tola_rate(2400, 0, 5000) == 0.0
+    assert list(tola_rate(np.array([2400.0, 0.0]), USD_PKR, 100)) == [pytest.approx(old_tola(2400, USD_PKR, 100)), 0.0]
+
+
+@pytest.mark.parametrize("metal", METALS)
+def test_price_matrix_matches_old_formula_everywhere(metal):
+    ounce, premium = METALS[metal]
+    m = price_matrix(ounce, USD_PKR, AED_PER_USD, premium)
+    assert m.shape == (len(CURRENCIES), len(PREMIUM), len(KARATS), len(UNITS))
+    # 24K tola in each currency, without / with premium; AED premium converted at the PKR/AED cross rate
+    tola = {
+        ("PKR", "without"): old_tola(ounce, USD_PKR),
+        ("PKR", "with"): old_tola(ounce, USD_PKR, premium),
+        ("AED", "without"): old_tola(ounce, AED_PER_USD),
+        ("AED", "with"): old_tola(ounce, AED_PER_USD, premium * AED_PER_USD / USD_PKR),
+    }
+    for c, currency in enumerate(CURRENCIES):
+        for p, flag in enumerate(PREMIUM):
+            for k, karat in enumerate(KARATS.values()):
+                for u, grams in enumerate(UNITS.values()):
+                    expected = tola[currency, flag] / 11.66 * grams * karat / 24
+                    assert m[c, p, k, u] == pytest.approx(expected, rel=1e-12), (currency, flag, karat, grams)
+
+
+def test_aed_premium_conversion():
+    m = price_matrix(2400.0, USD_PKR, AED_PER_USD, 5000.0)
+    aed = CURRENCIES.index("AED")
+    added = m[aed, 1, 0, 0] - m[aed, 0, 0, 0]
+    assert added == pytest.approx(5000.0 / (USD_PKR / AED_PER_USD))
+    # Premium scales with gold content: 18K gets three quarters of it
+    assert m[aed, 1, 3, 0] - m[aed, 0, 3, 0] == pytest.approx(added * 18 / 24)
+
+
+def test_price_matrix_broadcasts_history_and_zeroes_missing_quotes():
+    ounces = np.array([2400.0, 0.0, 2410.0])
+    m = price_matrix(ounces, np.array([280.0, 280.0, 0.0]), AED_PER_USD, 5000.0)
+    assert m.shape == (3, 2, 2, 4, 5)
+    assert m[0, 0, 1, 0, 0] == pytest.approx(old_tola(2400.0, 280.0, 5000.0))
+    assert not m[1].any() and not m[2].any()
+
+
+def test_rate_card_matches_tola_rate():
+    card = rate_card(2400.0, USD_PKR, AED_PER_USD, 5000.0)
+    assert list(card) == list(KARATS) and list(card["24K"]) == list(UNITS)
+    assert card["24K"]["tola"] == pytest.approx(tola_rate(2400.0, USD_PKR, 5000.0))
+    assert card["22K"]["10 gram"] == pytest.approx(tola_rate(2400.0, USD_PKR, 5000.0) / 11.66 * 10 * 22 / 24)
+    aed = rate_card(2400.0, USD_PKR, AED_PER_USD, 5000.0, currency="AED", with_premium=False)
+    assert aed["24K"]["tola"] == pytest.approx(tola_rate(2400.0, AED_PER_USD))
@@ -0,0 +1,122 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import publish_queue
+from publish_queue import PublishQueue
+
+LIVE = {"gold": 2400.0, "silver": 30.0, "usd": 280.0, "full_date": "2026-03-01 10:00:00"}
+
+
+class FakeStore:
+    def __init__(self):
+        self.writes = []
+
+    def publish(self, settings, record):
+        self.writes.append((settings, record))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(publish_queue, "time", SimpleNamespace(monotonic=lambda: clock.now, time=lambda: clock.now))
+    return clock
+
+
+def make_queue(quotes=LIVE, debounce=4, max_delay=20):
+    store = FakeStore()
+    queue = PublishQueue(store, lambda: dict(quotes), lambda settings, q: {"date": q["full_date"], **settings},
+                         debounce=debounce, max_delay=max_delay)
+    return queue, store
+
+
+def test_submits_inside_debounce_make_one_write(clock):
+    queue, store = make_queue()
+    first = queue.submit({"gold_premium": 100})
+    clock.now += 2
+    second = queue.submit({"gold_premium": 200, "silver_premium": 5})
+    assert queue.status(first)["merged"] == 2
+    assert queue.status(first)["eta"] == pytest.approx(4)
+
+    clock.now += 4
+    queue._write(queue._next_batch())
+    assert len(store.writes) == 1
+    settings, record = store.writes[0]
+    assert settings == {"gold_premium": 200, "silver_premium": 5, "last_update": 1006}
+    assert record["date"] == LIVE["full_date"]
+    for ticket in (first, second):
+        assert queue.status(ticket)["state"] == "done"
+        assert queue.status(ticket)["last_update"] == 1006
+    assert queue.stats == {"submitted": 2, "written": 1, "failed": 0}
+
+
+def test_max_delay_caps_a_stream_of_submits(clock):
+    queue, store = make_queue(debounce=4, max_delay=20)
+    ticket = queue.submit({"gold_premium": 0})
+    for i in range(1, 7):
+        clock.now += 3
+        queue.submit({"gold_premium": i})
+    # Last click at +18 would be due at +22; the first click caps it at +20
+    assert queue._due(queue._pending) == 1020
+    assert queue.status(ticket)["eta"] == pytest.approx(2)
+    clock.now = 1020
+    queue._write(queue._next_batch())
+    assert [s["gold_premium"] for s, _ in store.writes] == [6]
+    assert queue.status(ticket)["merged"] == 7
+
+
+@pytest.mark.parametrize("stale, message", [
+    ({"gold": 1.0}, "no live GOLD quote"),
+    ({"usd": 1.0}, "no live USD quote"),
+    ({"gold": 1.0, "usd": 1.0}, "no live GOLD / USD quote"),
+])
+def test_cached_gold_or_usd_is_refused(clock, stale, message):
+    queue, store = make_queue(quotes=dict(LIVE, stale=stale))
+    ticket = queue.submit({"gold_premium": 100})
+    clock.now += 4
+    queue._write(queue._next_batch())
+    assert store.writes == []
+    status = queue.status(ticket)
+    assert status["state"] == "failed" and message in status["error"]
+
+
+def test_cached_silver_alone_still_publishes(clock):
+    queue, store = make_queue(quotes=dict(LIVE, stale={"silver": 1.0}))
+    queue.submit({"silver_premium": 5})
+    clock.now += 4
+    queue._write(queue._next_batch())
+    assert len(store.writes) == 1
+
+
+def test_offline_quotes_are_refused(clock):
+    queue, store = make_queue(quotes=dict(LIVE, gold=0.0))
+    ticket = queue.submit({"gold_premium": 100})
+    clock.now += 4
+    queue._write(queue._next_batch())
+    assert queue.status(ticket)["error"] == "Cannot publish: APIs are offline."
+    assert queue.stats["failed"] == 1
+
+
+def test_listeners_run_after_a_successful_write(clock):
+    queue, _ = make_queue()
+    seen = []
+    queue.subscribe(seen.append).subscribe(lambda settings: 1 / 0)   # a failing listener is ignored
+    queue.submit({"gold_premium": 7})
+    clock.now += 4
+    queue._write(queue._next_batch())
+    assert seen == [{"gold_premium": 7, "last_update": 1004}]
+
+
+def test_unknown_ticket_has_no_status():
+    queue, _ = make_queue()
+    assert queue.status(12345) is None
+
+
+def test_worker_thread_writes_in_the_background():
+    queue, store = make_queue(debounce=0.05, max_delay=1)
+    written = threading.Event()
+    queue.subscribe(lambda settings: written.set()).start()
+    ticket = queue.submit({"gold_premium": 1})
+    assert written.wait(5)
+    assert queue.status(ticket)["state"] == "done" and len(store.writes) == 1
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from quota import ACTIVE_HOURS, ACTIVE_SHARE, QuotaScheduler, allowance
+
+TZ = pytz.timezone("Asia/Karachi")
+
+
+def at(hour, minute=0, day=2):
+    return TZ.localize(datetime(2026, 3, day, hour, minute))
+
+
+class FixedClock(QuotaScheduler):
+    def __init__(self, now, budgets):
+        super().__init__(TZ, budgets)
+        self.now = now
+
+    def _now(self):
+        return self.now
+
+
+def test_allowance_spreads_the_whole_budget_over_a_day():
+    assert allowance(800, at(0), at(0, day=3)) == pytest.approx(800)
+    assert allowance(800, at(ACTIVE_HOURS.start), at(0, day=3)) == pytest.approx(800 * ACTIVE_SHARE)
+
+
+def test_allowance_is_higher_in_active_hours():
+    day_hour = allowance(800, at(12), at(13))
+    night_hour = allowance(800, at(3), at(4))
+    assert day_hour == pytest.approx(800 * ACTIVE_SHARE / len(ACTIVE_HOURS))
+    assert night_hour < day_hour
+    # Partial hours are pro rata
+    assert allowance(800, at(12, 15), at(12, 45)) == pytest.approx(day_hour / 2)
+
+
+def test_unmetered_provider_never_waits():
+    quota = FixedClock(at(12), {"TwelveData": 800})
+    quota.spend("Yahoo Finance", 100)
+    assert quota.available("Yahoo Finance")
+    assert quota.wait("Yahoo Finance") == 0.0
+
+
+def test_wait_follows_the_schedule():
+    quota = FixedClock(at(12), {"TwelveData": 800})
+    assert quota.wait("TwelveData") == 0.0      # one credit right after boot
+    quota.spend("TwelveData")
+    assert not quota.available("TwelveData")
+    # 40 credits/hour in active hours: the next one is 90 s away, rounded up to the minute
+    assert quota.wait("TwelveData") == 120
+    quota.now += timedelta(seconds=90)
+    assert quota.available("TwelveData")
+    assert quota.wait("TwelveData") == 0.0
+
+
+def test_night_credits_come_slower():
+    quota = FixedClock(at(2), {"TwelveData": 800})
+    quota.spend("TwelveData")
+    assert quota.wait("TwelveData") == 240      # 17.1 credits/hour -> 210 s
@@ -0,0 +1,70 @@
+from concurrent.futures import Future
+
+from quote_engine import SourceLimit, race_chain
+
+
+def resolved(value):
+    fut = Future()
+    fut.set_result(value)
+    return fut
+
+
+def failed(exc):
+    fut = Future()
+    fut.set_exception(exc)
+    return fut
+
+
+class Starter:
+    """Chain starter that hands back a prepared future and remembers it was launched."""
+
+    def __init__(self, fut):
+        self.fut = fut
+        self.launched = False
+
+    def __call__(self):
+        self.launched = True
+        return self.fut
+
+
+def test_primary_answer_wins_without_hedging():
+    primary, backup = Starter(resolved({"price": 1})), Starter(resolved({"price": 2}))
+    logs = []
+    assert race_chain([("A", "A Gold", primary), ("B", "B Gold", backup)], logs) == ("A", {"price": 1})
+    assert not backup.launched
+    assert logs == []
+
+
+def test_failed_primary_falls_through_to_backup():
+    backup = Starter(resolved({"price": 2}))
+    logs = []
+    chain = [("A", "A Gold", Starter(failed(ValueError("boom")))), ("B", "B Gold", backup)]
+    assert race_chain(chain, logs) == ("B", {"price": 2})
+    assert logs == ["A Gold Error: boom"]
+
+
+def test_slow_primary_is_hedged():
+    slow, backup = Starter(Future()), Starter(resolved({"price": 2}))
+    result = race_chain([("A", "A Gold", slow), ("B", "B Gold", backup)], [], hedge_after=0.01, deadline=1)
+    assert result == ("B", {"price": 2})
+    assert backup.launched
+
+
+def test_everything_failing_is_offline():
+    logs = []
+    chain = [("A", "A Gold", Starter(failed(SourceLimit("out of credits")))),
+             ("B", "B Gold", Starter(failed(ValueError("down"))))]
+    assert race_chain(chain, logs) == ("OFFLINE", None)
+    assert logs == ["A Gold Limit: out of credits", "B Gold Error: down"]
+
+
+def test_deadline_gives_up_on_hung_sources():
+    logs = []
+    result = race_chain([("A", "A Gold", Starter(Future()))], logs, hedge_after=0.01, deadline=0.05)
+    assert result == ("OFFLINE", None)
+    assert logs == ["A Gold Error: no answer in 0.05s"]
+
+
+def test_empty_chain_is_offline():
+    assert race_chain([], []) == ("OFFLINE", None)
+
@@ -0,0 +1,146 @@
+import json
+from wsgiref.util import setup_testing_defaults
+
+import pytest
+
+from pricing import tola_rate
+from rate_api import RateFeed, build_payload, make_api_app, metrics_app
+
+SNAP = {"gold": 2400.0, "silver": 30.0, "usd": 280.0, "aed": 3.6725, "full_date": "2026-03-01 10:00:00",
+        "fetched_at": 1_772_341_200, "src_gold": "TwelveData", "src_silver": "Yahoo Finance",
+        "src_usd": "Yahoo Finance", "active_mode": True}
+SETTINGS = {"gold_premium": 5000, "silver_premium": 100, "last_update": 1_772_340_000}
+
+
+def call(app, path="/api/rates", query="", **headers):
+    environ = {"PATH_INFO": path, "QUERY_STRING": query}
+    environ.update({f"HTTP_{k.upper()}": v for k, v in headers.items()})
+    setup_testing_defaults(environ)
+    out = {}
+
+    def start_response(status, response_headers):
+        out["status"], out["headers"] = status, dict(response_headers)
+
+    body = b"".join(app(environ, start_response))
+    return out["status"], out["headers"], body
+
+
+@pytest.fixture
+def feed():
+    feed = RateFeed(lambda: dict(SETTINGS))
+    feed.update(dict(SNAP))
+    return feed
+
+
+def test_payload_prices(feed):
+    p = feed.payload
+    assert p["gold"]["tola_pkr"] == round(tola_rate(2400.0, 280.0, 5000))
+    assert p["gold"]["dubai_tola_aed"] == round(tola_rate(2400.0, 3.6725))
+    assert p["silver"]["tola_pkr"] == round(tola_rate(30.0, 280.0, 100))
+    assert p["quoted_at"] == {"gold": SNAP["fetched_at"], "silver": SNAP["fetched_at"], "usd": SNAP["fetched_at"]}
+    assert p["cached"] == []
+
+
+def test_cached_instruments_keep_their_quote_time():
+    p = build_payload(dict(SNAP, stale={"gold": 1_772_000_000}), SETTINGS)
+    assert p["cached"] == ["gold"]
+    assert p["quoted_at"]["gold"] == 1_772_000_000 and p["quoted_at"]["usd"] == SNAP["fetched_at"]
+
+
+def test_rates_etag_and_304(feed):
+    app = make_api_app(feed)
+    status, headers, body = call(app)
+    assert status == "200 OK"
+    assert json.loads(body) == feed.payload
+    assert headers["Access-Control-Allow-Origin"] == "*"
+    status, headers, body = call(app, if_none_match=headers["ETag"])
+    assert status.startswith("304") and body == b""
+    status, _, _ = call(app, if_none_match='"stale"')
+    assert status == "200 OK"
+
+
+def test_etag_changes_only_with_the_payload(feed):
+    etag = feed.etag
+    assert not feed.update(dict(SNAP))
+    assert feed.etag == etag
+    assert feed.update(dict(SNAP, gold=2410.0))
+    assert feed.etag != etag
+
+
+def test_shop_selection_and_unknown_shop(feed):
+    other = RateFeed(lambda: dict(SETTINGS, gold_premium=0))
+    other.update(dict(SNAP))
+    app = make_api_app(None, {"main": feed, "dha": other}, default="main")
+    assert json.loads(call(app)[2])["gold"]["premium_pkr"] == 5000
+    assert json.loads(call(app, query="shop=dha")[2])["gold"]["premium_pkr"] == 0
+    status, _, body = call(app, query="shop=nope")
+    assert status.startswith("404") and body == b"unknown shop"
+
+
+def test_default_shop_without_a_feed_is_404():
+    assert call(make_api_app(None, {}, default="main"))[0].startswith("404")
+
+
+def test_unknown_path_and_no_public_metrics(feed):
+    app = make_api_app(feed)
+    assert call(app, "/nope")[0].startswith("404")
+    assert call(app, "/metrics")[0].startswith("404")
+    status, headers, body = call(metrics_app, "/metrics")
+    assert status == "200 OK" and headers["Content-Type"].startswith("text/plain")
+
+
+
+def events(chunks):
+    out = []
+    for chunk in chunks:
+        event, data = chunk.decode().strip().split("\n")
+        out.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return out
+
+
+def call_stream(app):
+    environ = {"PATH_INFO": "/api/stream", "QUERY_STRING": ""}
+    setup_testing_defaults(environ)
+    seen = {}
+    chunks = app(environ, lambda status, headers: seen.update(status=status, headers=dict(headers)))
+    it = iter(chunks)
+    assert seen["status"] == "200 OK" and seen["headers"]["Content-Type"] == "text/event-stream"
+    return it
+
+
+def test_sse_snapshot_then_delta(feed):
+    stream = call_stream(make_api_app(feed))
+    (kind, first), = events([next(stream)])
+    assert kind == "snapshot" and first["rates"] == feed.payload and first["version"] == feed.version
+
+    feed.update(dict(SNAP, gold=2410.0))
+    (kind, delta), = events([next(stream)])
+    assert kind == "delta" and delta["version"] == first["version"] + 1
+    # Only what moved is sent
+    assert delta["changes"] == {"gold": {"tola_pkr": feed.payload["gold"]["tola_pkr"],
+                                         "dubai_tola_aed": feed.payload["gold"]["dubai_tola_aed"],
+                                         "ounce_usd": 2410.0}}
+    stream.close()
+    assert feed.listeners == 0
+
+
+def test_sse_skips_fetches_that_change_nothing(feed):
+    stream = feed.stream(keepalive=0.01)
+    next(stream)
+    version = feed.version
+    # A new fetch time alone rebuilds the body but is not pushed
+    assert feed.update(dict(SNAP, full_date="2026-03-01 10:00:15", fetched_at=SNAP["fetched_at"] + 15))
+    assert feed.version == version
+    assert next(stream) == b": ping\n\n"
+    stream.close()
+
+
+def test_sse_drops_clients_that_fall_behind(feed, monkeypatch):
+    import rate_api
+    monkeypatch.setattr(rate_api, "CLIENT_QUEUE", 2)
+    stream = feed.stream()
+    next(stream)
+    for i in range(4):
+        feed.update(dict(SNAP, gold=2401.0 + i))
+    assert feed.listeners == 0
+    stream.close()
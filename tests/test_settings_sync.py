@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+import http_client
+from mock_upstream import MockUpstreams, Profile
+from settings_sync import DEFAULT_SETTINGS, SettingsSync, with_defaults
+
+REPO = "tests/swiss-gold-live"
+
+
+@pytest.fixture
+def mock():
+    mock = MockUpstreams({"github": Profile(latency=0, jitter=0)},
+                         github_files={"manual.json": json.dumps({"gold_premium": 500, "silver_premium": 20,
+                                                                  "last_update": 1})}).start()
+    http_client.set_base_url("github", f"{mock.url}/github")
+    yield mock
+    http_client.set_base_url("github")
+    mock.stop()
+
+
+def test_with_defaults():
+    assert with_defaults(None) == DEFAULT_SETTINGS
+    assert with_defaults({"gold_premium": 5}) == dict(DEFAULT_SETTINGS, gold_premium=5)
+
+
+def test_unchanged_polls_are_304(mock):
+    sync = SettingsSync("token", REPO)
+    assert sync.poll()
+    assert sync.current() == {"gold_premium": 500, "silver_premium": 20, "last_update": 1}
+    assert not sync.poll()
+    assert not sync.poll()
+    assert sync.stats == {"polls": 3, "not_modified": 2, "changed": 1}
+
+
+def test_changes_by_another_process_are_picked_up(mock):
+    sync = SettingsSync("token", REPO)
+    sync.poll()
+    mock.repo.commit_files("Update", dict(mock.repo.files, **{"manual.json": b'{"gold_premium": 700}'}))
+    assert sync.poll()
+    assert sync.current() == dict(DEFAULT_SETTINGS, gold_premium=700)
+    assert not sync.poll()
+
+
+def test_push_after_own_write(mock):
+    sync = SettingsSync("token", REPO)
+    sync.poll()
+    etag = sync.etag
+    written = {"gold_premium": 900, "silver_premium": 20, "last_update": 2}
+    mock.repo.commit_files("Update", dict(mock.repo.files, **{"manual.json": json.dumps(written).encode()}))
+    sync.push(written, sha="abc")
+    # Applied at once, and the stale ETag is dropped so the next poll revalidates in full
+    assert sync.current() == written
+    assert sync.etag is None and sync.sha != etag
+    assert not sync.poll()
+    assert sync.stats["not_modified"] == 0 and sync.etag
+    assert not sync.poll() and sync.stats["not_modified"] == 1
+
+
+def test_poll_errors_keep_the_last_settings(mock):
+    sync = SettingsSync("token", REPO)
+    sync.poll()
+    http_client.set_base_url("github", "http://127.0.0.1:9")   # nothing listens there
+    assert not sync.poll()
+    assert sync.last_error
+    assert sync.current()["gold_premium"] == 500
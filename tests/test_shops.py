@@ -0,0 +1,31 @@
+from shops import DEFAULT_SHOP, load_shops, resolve
+
+
+def test_default_shop_is_always_present():
+    shops = load_shops(None)
+    assert list(shops) == [DEFAULT_SHOP]
+    assert resolve(shops, None) is shops[DEFAULT_SHOP]
+    assert resolve(shops, " MAIN ") is shops[DEFAULT_SHOP]
+
+
+def test_partner_shops_get_their_own_profile_and_paths():
+    shops = load_shops({"dha-6": {"admin_password": "secret", "phone": "0300", "ignored": 1}})
+    dha = shops["dha-6"]
+    assert (dha.name, dha.phone, dha.whatsapp, dha.admin_password) == ("Dha 6", "0300", "", "secret")
+    assert dha.prefix == "shops/dha-6/"
+    assert dha.sqlite_path("data/swiss_gold.db") == "data/swiss_gold-dha-6.db"
+    assert shops[DEFAULT_SHOP].prefix == ""
+
+
+def test_misconfigured_shops_are_skipped_not_fatal(caplog):
+    shops = load_shops({"dha": {"name": "No password"}, "Bad Slug!": {"admin_password": "x"},
+                        "ok": {"admin_password": "x"}})
+    assert sorted(shops) == [DEFAULT_SHOP, "ok"]
+    assert resolve(shops, "dha") is None
+    assert "needs its own admin_password" in caplog.text
+
+
+def test_default_shop_may_use_the_global_password():
+    shops = load_shops({DEFAULT_SHOP: {"name": "Counter 1"}})
+    assert shops[DEFAULT_SHOP].name == "Counter 1"
+    assert shops[DEFAULT_SHOP].admin_password is None
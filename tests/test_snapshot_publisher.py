@@ -0,0 +1,90 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import snapshot_publisher
+from snapshot_publisher import MAX_AGE, SnapshotPublisher, render_html
+
+
+def payload(gold=250_000, silver=3_000, **extra):
+    return dict({"as_of": "2026-03-01 10:00:00", "usd_pkr": 280.0, "cached": [],
+                 "gold": {"tola_pkr": gold, "ounce_usd": 2400.0, "premium_pkr": 5000, "source": "TwelveData",
+                          "dubai_tola_aed": 3300},
+                 "silver": {"tola_pkr": silver, "ounce_usd": 30.0, "premium_pkr": 100, "source": "Yahoo Finance"}},
+                **extra)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(snapshot_publisher, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def test_first_payload_is_written(tmp_path, clock):
+    pub = SnapshotPublisher(str(tmp_path))
+    assert pub.publish(payload())
+    assert json.loads((tmp_path / "rates.json").read_text()) == payload()
+    assert b"Rs 250,000" in (tmp_path / "index.html").read_bytes()
+    assert not pub.publish({})
+
+
+@pytest.mark.parametrize("change, written", [
+    ({"gold": 250_099}, False),          # gold threshold is Rs 100
+    ({"gold": 250_100}, True),
+    ({"gold": 249_900}, True),
+    ({"silver": 3_009}, False),          # silver threshold is Rs 10
+    ({"silver": 3_010}, True),
+])
+def test_thresholds(tmp_path, clock, change, written):
+    pub = SnapshotPublisher(str(tmp_path))
+    pub.publish(payload())
+    assert pub.publish(payload(**change)) is written
+
+
+def test_premium_source_and_cached_changes_are_written(tmp_path, clock):
+    pub = SnapshotPublisher(str(tmp_path))
+    pub.publish(payload())
+    p = payload()
+    p["gold"]["premium_pkr"] = 5001
+    assert pub.publish(p)
+    p = json.loads(json.dumps(p))
+    p["silver"]["source"] = "TwelveData"
+    assert pub.publish(p)
+    assert pub.publish(dict(p, cached=["usd"]))
+    assert pub.writes == 4
+
+
+def test_max_age_forces_a_rewrite(tmp_path, clock):
+    pub = SnapshotPublisher(str(tmp_path))
+    pub.publish(payload())
+    clock.now += MAX_AGE - 1
+    assert not pub.publish(payload(gold=250_001))
+    clock.now += 1
+    assert pub.publish(payload(gold=250_001))
+
+
+def test_failed_write_leaves_the_old_file(tmp_path, clock, monkeypatch):
+    pub = SnapshotPublisher(str(tmp_path))
+    pub.publish(payload())
+    before = (tmp_path / "rates.json").read_bytes()
+
+    def broken_replace(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr(snapshot_publisher.os, "replace", broken_replace)
+    with pytest.raises(OSError):
+        pub.publish(payload(gold=260_000))
+    assert (tmp_path / "rates.json").read_bytes() == before
+    # Nothing was recorded as published, so the next call tries again
+    monkeypatch.undo()
+    assert pub.publish(payload(gold=260_000))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["index.html", "rates.json"]
+
+
+def test_render_marks_cached_quotes():
+    html = render_html(dict(payload(), cached=["gold"], quoted_at={"gold": 1_000_000 - 2 * 86400}),
+                       shop="A & B", now=1_000_000).decode()
+    assert "A &amp; B" in html
+    assert html.count("CACHED QUOTE") == 1 and "2d OLD" in html
+    assert "OFFLINE" in render_html(payload(gold=0)).decode()
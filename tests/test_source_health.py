@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+import pytest
+
+import source_health
+from quote_engine import SourceLimit, race_chain
+from source_health import COOLDOWN, FAIL_THRESHOLD, QUOTA_COOLDOWN, SourceHealth
+from test_quote_engine import Starter, failed, resolved
+
+CHAIN = [("TwelveData", "TD Gold", None), ("Yahoo Finance", "Yahoo Gold", None)]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(source_health, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def labels(chain):
+    return [item[1] for item in chain]
+
+
+def test_unknown_sources_keep_configured_order(clock):
+    assert labels(SourceHealth().order(CHAIN)) == ["TD Gold", "Yahoo Gold"]
+
+
+def test_faster_source_goes_first(clock):
+    health = SourceHealth()
+    health.record("TD Gold", "TwelveData", True, 0.9)
+    health.record("Yahoo Gold", "Yahoo Finance", True, 0.2)
+    assert labels(health.order(CHAIN)) == ["Yahoo Gold", "TD Gold"]
+
+
+def test_failures_cost_the_penalty(clock):
+    health = SourceHealth(failure_penalty=5)
+    health.record("TD Gold", "TwelveData", True, 0.1)
+    health.record("TD Gold", "TwelveData", False, 5, error="timeout")
+    health.record("Yahoo Gold", "Yahoo Finance", True, 0.5)
+    # TD: 0.1 s + 50% x 5 s penalty
+    assert labels(health.order(CHAIN)) == ["Yahoo Gold", "TD Gold"]
+
+
+def test_circuit_opens_after_threshold_and_half_opens_after_cooldown(clock):
+    health = SourceHealth()
+    for _ in range(FAIL_THRESHOLD):
+        health.record("TD Gold", "TwelveData", False, 1, error="down")
+    assert labels(health.order(CHAIN)) == ["Yahoo Gold"]
+    assert health.open_circuits() == [("TD Gold", COOLDOWN)]
+
+    clock.now += COOLDOWN + 1
+    assert "TD Gold" in labels(health.order(CHAIN))
+    # Failed trial: open again for twice as long
+    health.record("TD Gold", "TwelveData", False, 1, error="down")
+    assert health.open_circuits() == [("TD Gold", 2 * COOLDOWN)]
+
+    clock.now += 2 * COOLDOWN + 1
+    health.record("TD Gold", "TwelveData", True, 0.1)
+    assert health.open_circuits() == []
+
+
+def test_quota_refusal_opens_every_entry_of_the_source(clock):
+    health = SourceHealth()
+    health.record("TD Silver", "TwelveData", True, 0.1)
+    health.record("TD Gold", "TwelveData", False, 0.1, error="credits", quota=True)
+    assert health.open_circuits() == [("TD Gold", QUOTA_COOLDOWN), ("TD Silver", QUOTA_COOLDOWN)]
+
+
+def test_all_open_falls_back_to_configured_chain(clock):
+    health = SourceHealth()
+    for label, source, _ in CHAIN:
+        for _ in range(FAIL_THRESHOLD):
+            health.record(label, source, False, 1)
+    assert labels(health.order(CHAIN)) == ["TD Gold", "Yahoo Gold"]
+
+
+def test_race_outcomes_are_recorded(clock):
+    health = SourceHealth()
+    chain = [("A", "A Gold", Starter(failed(SourceLimit("limit")))), ("B", "B Gold", Starter(resolved({"price": 2})))]
+    race_chain(chain, [], health=health)
+    rows = {row["source"]: row for row in health.stats()}
+    assert rows["A Gold"]["quota"] == "hit" and rows["A Gold"]["errors %"] == 100
+    assert rows["B Gold"]["calls"] == 1 and rows["B Gold"]["errors %"] == 0
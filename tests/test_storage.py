@@ -0,0 +1,97 @@
+import json
+import threading
+
+import pytest
+
+import http_client
+from mock_upstream import MockUpstreams, Profile
+from storage import GitHubStorage
+
+REPO = "tests/swiss-gold-live"
+
+
+@pytest.fixture
+def mock():
+    mock = MockUpstreams({"github": Profile(latency=0.005, jitter=0.002)},
+                         github_files={"manual.json": json.dumps({"gold_premium": 0, "silver_premium": 0})}).start()
+    http_client.set_base_url("github", f"{mock.url}/github")
+    yield mock
+    http_client.set_base_url("github")
+    mock.stop()
+
+
+def record(writer, i):
+    return {"date": f"2026-03-01 10:{writer:02d}:{i:02d}", "gold_pk": 1000 * writer + i,
+            "silver_pk": 0, "gold_ounce": 0, "silver_ounce": 0, "usd": 280}
+
+
+def test_concurrent_publishes_keep_every_record(mock):
+    # One storage per writer, like separate app processes: only the ref update can
+    # serialise them, and a refused fast-forward must be rebuilt, not dropped
+    writers, per_writer = 4, 3
+    stores = [GitHubStorage("token", REPO) for _ in range(writers)]
+    start = threading.Barrier(writers)
+    errors = []
+
+    def publish_all(w):
+        start.wait()
+        for i in range(per_writer):
+            try:
+                stores[w].publish({"gold_premium": w, "silver_premium": i}, record(w, i))
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=publish_all, args=(w,)) for w in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    lines = mock.repo.files["history/2026-03.jsonl"].decode().splitlines()
+    kept = sorted(json.loads(line)["gold_pk"] for line in lines)
+    assert kept == sorted(1000 * w + i for w in range(writers) for i in range(per_writer))
+    # Every publish is one commit touching both files
+    assert len(mock.repo.ancestors(mock.repo.head)) == 1 + writers * per_writer
+    assert json.loads(mock.repo.files["manual.json"])["gold_premium"] in range(writers)
+    assert mock.calls.get(("github", "PATCH repos/tests/swiss-gold-live/git"), 0) >= writers * per_writer
+
+
+def test_publish_writes_under_shop_prefix(mock):
+    store = GitHubStorage("token", REPO, prefix="shops/dha/")
+    store.publish({"gold_premium": 5}, record(1, 1))
+    files = mock.repo.files
+    assert json.loads(files["shops/dha/manual.json"]) == {"gold_premium": 5}
+    assert json.loads(files["shops/dha/history/2026-03.jsonl"])["gold_pk"] == 1001
+    assert json.loads(files["manual.json"])["gold_premium"] == 0
+
+
+def test_concurrent_readers_share_one_listing(mock):
+    # A cached store serves every session's script thread at once
+    GitHubStorage("token", REPO).publish({"gold_premium": 1}, record(1, 1))
+    store = GitHubStorage("token", REPO)
+    readers = 8
+    start = threading.Barrier(readers)
+    listings, histories, errors = [], [], []
+
+    def read():
+        start.wait()
+        try:
+            listings.append([seg.sha for seg in store._segments()])
+            histories.append(store.load_history())
+        except Exception as e:
+            errors.append(e)
+
+    mock.calls.clear()
+    threads = [threading.Thread(target=read) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert len({tuple(shas) for shas in listings}) == 1 and listings[0]
+    assert all([r["gold_pk"] for r in h] == [1001] for h in histories)
+    # The listing TTL check is atomic: one fetch serves every reader
+    listing_gets = mock.calls[("github", f"GET repos/{REPO}/contents")] - readers   # the rest read legacy history.json
+    assert listing_gets == 1
@@ -0,0 +1,64 @@
+import time
+
+import numpy as np
+
+import tick_recorder
+from chart_data import tick_frame
+from tick_recorder import TickRecorder
+
+
+def snap(ts, gold=2400.0, src="TwelveData"):
+    return {"fetched_at": ts, "gold": gold, "silver": 30.0, "usd": 280.0, "aed": 3.67,
+            "src_gold": src, "src_silver": "Yahoo Finance", "src_usd": "Yahoo Finance"}
+
+
+def failing_open(*args, **kwargs):
+    raise OSError("disk full")
+
+
+def test_flush_and_load_roundtrip(tmp_path):
+    rec = TickRecorder(str(tmp_path), flush_every=100)
+    now = time.time()
+    for i in range(3):
+        rec.record(snap(now - 30 + i, gold=2400.0 + i))
+    assert rec.flush() == 3
+    assert rec.flush() == 0
+    ticks = rec.load(now - 60)
+    assert list(ticks["gold"]) == [2400.0, 2401.0, 2402.0]
+
+
+def test_failed_write_keeps_the_batch(tmp_path, monkeypatch):
+    rec = TickRecorder(str(tmp_path), flush_every=100)
+    now = time.time()
+    for i in range(3):
+        rec.record(snap(now - 30 + i))
+    monkeypatch.setattr(tick_recorder, "open", failing_open, raising=False)
+    try:
+        rec.flush()
+    except OSError:
+        pass
+    # Nothing reached the disk, but the rows are still served and still queued
+    assert len(rec.load(now - 60)) == 3
+    monkeypatch.undo()
+    assert rec.flush() == 3
+    assert len(rec.load(now - 60)) == 3
+    assert rec.flush() == 0
+
+
+def test_ring_keeps_newest_rows_when_it_laps(tmp_path):
+    rec = TickRecorder(str(tmp_path), capacity=4, flush_every=100)
+    now = time.time()
+    for i in range(6):
+        rec.record(snap(now - 30 + i, gold=float(i + 1)))
+    assert list(rec.recent()["gold"]) == [3.0, 4.0, 5.0, 6.0]
+
+
+def test_tick_frame_names_sources_and_blanks_offline_prices(tmp_path):
+    rec = TickRecorder(str(tmp_path), flush_every=100)
+    now = time.time()
+    rec.record(snap(now - 2))
+    rec.record(snap(now - 1, gold=0.0, src="OFFLINE"))
+    df = tick_frame(rec.load(now - 60))
+    assert list(df["src_gold"]) == ["TwelveData", "OFFLINE"]
+    assert df["gold_ounce"].iloc[0] == 2400.0 and np.isnan(df["gold_ounce"].iloc[1])
+    assert df["date"].dt.tz is None
@@ -0,0 +1,121 @@
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from quote_engine import TZ_KHI
+
+# TICK RECORDER
+# Every quote snapshot the poller fetches goes into a fixed-size in-memory ring.
+# Rows are flushed in batches to one append-only binary file per Karachi day
+# (fixed-width numpy records, no header), so a flush is a single sequential
+# write and any day can be opened later with np.memmap without parsing.
+# Rows only count as flushed once their write succeeded; until then they stay
+# in the ring (and in load()) and the next flush tries again. The Charts tab
+# reads today's ticks back through load() (see chart_data.tick_frame).
+
+TICK_DTYPE = np.dtype([
+    ("ts", "<f8"),            # epoch seconds
+    ("gold", "<f8"), ("silver", "<f8"), ("usd", "<f8"), ("aed", "<f8"),
+    ("src_gold", "u1"), ("src_silver", "u1"), ("src_usd", "u1"),
+])
+SOURCE_CODES = {"OFFLINE": 0, "ERR": 0, "TwelveData": 1, "Yahoo Finance": 2, "ExchangeRate-API": 3, "Cached": 4}
+SOURCE_NAMES = {0: "OFFLINE", 1: "TwelveData", 2: "Yahoo Finance", 3: "ExchangeRate-API", 4: "Cached"}
+
+RING_SIZE = 5760          # one day of 15 s polls
+FLUSH_EVERY = 40          # rows per batch write
+FLUSH_INTERVAL = 600      # ...or at least every 10 minutes
+
+
+def day_file(directory, ts):
+    return os.path.join(directory, datetime.fromtimestamp(ts, TZ_KHI).strftime("%Y-%m-%d") + ".ticks")
+
+
+class TickRecorder:
+    def __init__(self, directory="data/ticks", capacity=RING_SIZE, flush_every=FLUSH_EVERY,
+                 flush_interval=FLUSH_INTERVAL):
+        self.directory = directory
+        self.capacity = capacity
+        self.flush_every = min(flush_every, capacity)
+        self.flush_interval = flush_interval
+        self._ring = np.zeros(capacity, dtype=TICK_DTYPE)
+        self._written = 0          # total rows ever recorded
+        self._flushed = 0          # total rows already on disk
+        self._last_flush = time.time()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()   # one writer at a time, so no batch is appended twice
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(self.flush)
+
+    def record(self, snap):
+        with self._lock:
+            row = self._ring[self._written % self.capacity]
+            row["ts"] = snap.get("fetched_at", time.time())
+            for field in ("gold", "silver", "usd", "aed"):
+                row[field] = float(snap.get(field, 0) or 0)
+            for field in ("src_gold", "src_silver", "src_usd"):
+                row[field] = SOURCE_CODES.get(snap.get(field), 0)
+            self._written += 1
+            due = (self._written - self._flushed >= self.flush_every
+                   or time.time() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def _slice(self, start, stop):
+        idx = np.arange(start, stop) % self.capacity
+        return self._ring[idx].copy()
+
+    def recent(self, n=None):
+        """Ticks still in memory, oldest first."""
+        with self._lock:
+            count = min(self._written, self.capacity, n or self.capacity)
+            return self._slice(self._written - count, self._written)
+
+    def flush(self):
+        """Append unflushed rows to their day files; returns rows written. Raises OSError
+        when the disk write fails, leaving the failed rows queued for the next flush."""
+        with self._flush_lock:
+            with self._lock:
+                # If the disk was unwritable long enough for the ring to lap, the oldest rows are gone
+                start = max(self._flushed, self._written - self.capacity)
+                batch = self._slice(start, self._written)
+                self._last_flush = time.time()
+            # One append per day file touched by this batch (normally exactly one). Rows are in
+            # time order, so each day is a contiguous run and is marked flushed once it is on disk.
+            days = [day_file(self.directory, ts) for ts in batch["ts"]]
+            done = 0
+            while done < len(batch):
+                run = done
+                while run < len(batch) and days[run] == days[done]:
+                    run += 1
+                with open(days[done], "ab") as f:
+                    size = f.tell()
+                    try:
+                        batch[done:run].tofile(f)
+                        f.flush()
+                    except OSError:
+                        f.truncate(size)   # no torn record left behind for np.memmap
+                        raise
+                done = run
+                with self._lock:
+                    self._flushed = max(self._flushed, start + done)
+            return len(batch)
+
+    def load(self, start_ts, end_ts=None):
+        """All ticks in [start_ts, end_ts] from disk plus the unflushed tail, oldest first."""
+        end_ts = end_ts or time.time()
+        parts = []
+        day = start_ts
+        while day <= end_ts + 86400:
+            path = day_file(self.directory, day)
+            if os.path.exists(path) and os.path.getsize(path):
+                parts.append(np.memmap(path, dtype=TICK_DTYPE, mode="r"))
+            day += 86400
+        with self._lock:
+            parts.append(self._slice(max(self._flushed, self._written - self.capacity), self._written))
+        ticks = np.concatenate(parts) if parts else np.zeros(0, dtype=TICK_DTYPE)
+        ticks = ticks[(ticks["ts"] >= start_ts) & (ticks["ts"] <= end_ts)]
+        return np.sort(ticks, order="ts")